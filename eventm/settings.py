@@ -53,12 +53,15 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap5'
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 MIDDLEWARE = [
+    'events.metrics.PerformanceMiddleware',  # First, so it times everything below
+    'events.querywatch.QueryInspectionMiddleware',  # Only active with EVENTS_QUERY_INSPECTION
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise here
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'events.profiling.ProfilingMiddleware',  # Needs request.user for the staff trigger
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,7 +70,7 @@ ROOT_URLCONF = 'eventm.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'events.metrics.TimedDjangoTemplates',  # DjangoTemplates plus render timing
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,10 +90,25 @@ WSGI_APPLICATION = 'eventm.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 # For development, using SQLite (switch to MySQL for production)
+# WAL lets readers run alongside the single writer; synchronous=NORMAL is
+# safe under WAL and skips an fsync per commit; busy_timeout makes a writer
+# wait for the lock instead of failing; mmap_size reads pages straight from
+# the OS page cache. Connections are kept open between requests.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+}
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -103,6 +121,8 @@ DATABASES = {
 #         'PASSWORD': 'your_mysql_password',
 #         'HOST': 'localhost',
 #         'PORT': '3306',
+#         'CONN_MAX_AGE': 600,
+#         'CONN_HEALTH_CHECKS': True,
 #     }
 # }
 
@@ -170,4 +190,113 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
 WHITENOISE_USE_FINDERS = True
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Rate limiting for public endpoints (see events/ratelimit.py).
+# Sliding-window counters are kept in this cache alias and fall back to process memory.
+EVENTS_RATE_LIMIT_ENABLED = True
+EVENTS_RATE_LIMIT_CACHE = 'default'
+EVENTS_RATE_LIMIT_TRUST_FORWARDED = False
+EVENTS_RATE_LIMITS = {
+    # endpoint: {scope: (requests, per this many seconds)}
+    'event_registration': {'ip': (60, 60), 'participant': (5, 300)},
+    'event_qa': {'ip': (120, 60), 'participant': (10, 60)},
+    'vote_question': {'methods': ['POST'], 'ip': (120, 60), 'participant': (60, 60)},
+    'event_chat': {'methods': ['POST'], 'ip': (30, 60)},
+}
+
+# Background jobs (see events/tasks.py), run by `manage.py run_workers`.
+# queue -> worker processes per supervisor; each supervisor runs at most that
+# many jobs of the queue at once, so two supervisors run twice as many.
+EVENTS_JOB_QUEUES = {
+    'default': 1,
+    'qr': 2,
+    'email': 1,
+    'insights': 1,
+    'rollups': 1,
+}
+EVENTS_JOB_TIMEOUT = 15 * 60  # Running jobs without a heartbeat for this long are handed back
+EVENTS_JOB_RETENTION_DAYS = 7
+
+# Run background jobs inline after commit instead of queueing them
+EVENTS_BACKGROUND_TASKS_EAGER = False
+
+# Attendee insights are regenerated after this many new registrations
+EVENTS_INSIGHTS_BATCH_SIZE = 25
+
+# Event chat (see events/chat.py). Common questions are answered from the
+# database; the backend only sees other questions, with a trimmed context.
+EVENTS_CHAT_BACKEND = 'events.chat.LocalChatBackend'  # or 'events.chat.OpenAIChatBackend'
+EVENTS_CHAT_MODEL = 'gpt-4o-mini'
+EVENTS_CHAT_CONTEXT_TOKENS = 1500
+EVENTS_CHAT_CACHE_TIMEOUT = 60 * 60
+
+# Caches. Public pages are cached under version tokens that change on every
+# write (see events/caching.py), so any backend works; use a shared one such
+# as Redis or Memcached when running several processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eventm-default',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    #     'LOCATION': BASE_DIR / 'cache',
+    # },
+}
+EVENTS_PAGE_CACHE = 'default'
+EVENTS_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Public address used in QR codes and other links that leave the site
+EVENTS_PUBLIC_BASE_URL = 'http://localhost:8000'
+
+# Processes used to render QR codes when a host downloads badge sheets
+# (the generate_badges command defaults to one per CPU)
+EVENTS_BADGE_WORKERS = 1
+
+# Per-request timings (see events/metrics.py). Server-Timing headers show
+# query, template and cache figures to every client, so they are only sent
+# in development; /metrics is readable by staff, or by a scraper sending
+# "Authorization: Bearer <token>".
+EVENTS_SERVER_TIMING = DEBUG
+EVENTS_METRICS_TOKEN = ''  # Set this in environment variables
+
+# Slow-query log and N+1 detector (see events/querywatch.py). Development
+# and staging only: it captures a stack trace for every reported query.
+EVENTS_QUERY_INSPECTION = False
+EVENTS_SLOW_QUERY_MS = 100
+EVENTS_N_PLUS_ONE_THRESHOLD = 5
+EVENTS_N_PLUS_ONE_RAISE = False
+
+# Request profiling (see events/profiling.py). Staff trigger it with
+# ?_profile=1 or a token header from /profiles/; a sample rate above zero
+# also profiles that fraction of all requests.
+EVENTS_PROFILING = True
+EVENTS_PROFILE_DIR = BASE_DIR / 'profiles'
+EVENTS_PROFILE_SAMPLE_RATE = 0.0
+EVENTS_PROFILE_KEEP = 50
+
+# Outbound email (see events/outbox.py). Messages wait in the outbox and are
+# sent by the 'email' job queue in batches over one SMTP connection. To watch
+# them locally, run an SMTP sink (`python -m aiosmtpd -n -l localhost:1025`)
+# and switch to 'django.core.mail.backends.smtp.EmailBackend' with
+# EMAIL_HOST = 'localhost' and EMAIL_PORT = 1025.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'events@localhost'
+EVENTS_EMAIL_BATCH_SIZE = 200
+EVENTS_EMAIL_DRAIN_SECONDS = 60  # A drain job hands over to a fresh one after this
+EVENTS_EMAIL_MAX_ATTEMPTS = 5
+EVENTS_EMAIL_DOMAIN_RATE = 1000  # Messages per recipient domain per minute; 0 for no limit
+EVENTS_EMAIL_DOMAIN_RATES = {}  # Per-domain overrides, e.g. {'example.com': 100}
+
+# Archiving completed events (see events/archive.py and the archive_events
+# command). Rows are deleted this many at a time, in separate transactions,
+# with an optional pause so other writers get the database in between.
+EVENTS_PURGE_BATCH_SIZE = 500
+EVENTS_PURGE_PAUSE = 0.0
+
+# Store each participant's onboarding answers packed into one column instead
+# of a QuestionResponse row per question (see events/answers.py). Existing
+# answers are converted with `manage.py pack_answers` (`--unpack` reverts).
+EVENTS_PACKED_ANSWERS = False
@@ -1,8 +1,12 @@
 from django.contrib import admin
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+from .caching import bump_event_versions
+from .search import remove_event
 from .models import (
-    Host, Event, EventTemplate, OnboardingQuestion, Participant, 
-    QuestionResponse, PublicQuestion, QuestionVote, ParticipantMatch,
-    EventInsight, ChatQuery
+    Host, Event, EventRollup, EventStats, EventTemplate, OnboardingQuestion, Participant, 
+    ParticipantTag, QuestionResponse, PublicQuestion, QuestionVote, ParticipantMatch,
+    EventInsight, ChatQuery, OutboundEmail, EventArchive
 )
 
 
@@ -27,15 +31,37 @@ class OnboardingQuestionInline(admin.TabularInline):
     fields = ['question_text', 'question_type', 'is_mandatory', 'order', 'maps_to_field']
 
 
+class EventStatsInline(admin.StackedInline):
+    model = EventStats
+    can_delete = False
+    readonly_fields = [
+        'registered_count', 'waitlisted_count', 'cancelled_count', 'attended_count',
+        'question_count', 'vote_count', 'last_registration_at', 'updated_at'
+    ]
+
+
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['title', 'host', 'date', 'status', 'participant_count', 'created_at']
+    list_display = ['title', 'host', 'date', 'status', 'registered', 'created_at']
+    list_select_related = ['host', 'stats']
     list_filter = ['status', 'date', 'enable_qa', 'enable_matchmaking']
     search_fields = ['title', 'description', 'host__name']
     readonly_fields = ['created_at', 'updated_at', 'participant_count', 'waitlist_count']
-    inlines = [OnboardingQuestionInline]
+    inlines = [EventStatsInline, OnboardingQuestionInline]
     date_hierarchy = 'date'
     
+    @admin.display(description='Registered', ordering='stats__registered_count')
+    def registered(self, obj):
+        return obj.participant_count
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip Event.delete(), so drop search rows and cached pages here
+        event_ids = list(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        for event_id in event_ids:
+            remove_event(event_id)
+        bump_event_versions(event_ids)
+
     fieldsets = (
         ('Basic Information', {
             'fields': ('host', 'title', 'description', 'location')
@@ -59,6 +85,7 @@ class EventAdmin(admin.ModelAdmin):
 @admin.register(OnboardingQuestion)
 class OnboardingQuestionAdmin(admin.ModelAdmin):
     list_display = ['question_text', 'event', 'question_type', 'is_mandatory', 'order']
+    list_select_related = ['event']
     list_filter = ['question_type', 'is_mandatory', 'event']
     search_fields = ['question_text', 'event__title']
     list_editable = ['order', 'is_mandatory']
@@ -67,9 +94,10 @@ class OnboardingQuestionAdmin(admin.ModelAdmin):
 @admin.register(Participant)
 class ParticipantAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'email', 'event', 'status', 'role', 'industry', 'registered_at']
+    list_select_related = ['event']
     list_filter = ['status', 'event', 'industry', 'experience_years']
     search_fields = ['first_name', 'last_name', 'email', 'role', 'skills']
-    readonly_fields = ['registered_at', 'updated_at']
+    readonly_fields = ['registered_at', 'updated_at', 'registration_answers']
     
     fieldsets = (
         ('Personal Information', {
@@ -81,16 +109,68 @@ class ParticipantAdmin(admin.ModelAdmin):
         ('Profile Information', {
             'fields': ('role', 'company', 'industry', 'experience_years', 'skills', 'interests', 'bio')
         }),
+        ('Registration Answers', {
+            'fields': ('registration_answers',),
+        }),
         ('Timestamps', {
             'fields': ('registered_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
 
+    @admin.display(description='Answers')
+    def registration_answers(self, obj):
+        # Packed or stored as rows; see Participant.get_answers()
+        answers = obj.get_answers()
+        questions = OnboardingQuestion.objects.filter(pk__in=answers).order_by('order')
+        return format_html_join(
+            mark_safe('<br>'), '<strong>{}</strong>: {}',
+            ((question.question_text, answers[question.pk]) for question in questions),
+        ) or '-'
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip Participant.delete(), so recount the affected events
+        event_ids = set(queryset.values_list('event_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for event_id in event_ids:
+            EventStats.rebuild(event_id)
+
+
+@admin.register(EventStats)
+class EventStatsAdmin(admin.ModelAdmin):
+    list_display = ['event', 'registered_count', 'waitlisted_count', 'attended_count', 'question_count', 'vote_count', 'last_registration_at']
+    list_select_related = ['event']
+    readonly_fields = EventStatsInline.readonly_fields
+    actions = ['reconcile']
+
+    @admin.action(description='Recount selected event stats')
+    def reconcile(self, request, queryset):
+        for event_id in queryset.values_list('event_id', flat=True):
+            EventStats.rebuild(event_id)
+        self.message_user(request, f'Reconciled {queryset.count()} event stats.')
+
+
+@admin.register(EventRollup)
+class EventRollupAdmin(admin.ModelAdmin):
+    list_display = ['event_title', 'host', 'event_date', 'registered_count', 'attended_count', 'returning_count', 'computed_at']
+    list_filter = ['host', 'event_date']
+    list_select_related = ['host']
+    search_fields = ['event_title', 'host__name']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(ParticipantTag)
+class ParticipantTagAdmin(admin.ModelAdmin):
+    list_display = ['label', 'kind', 'participant', 'event']
+    list_select_related = ['participant__event', 'event']
+    list_filter = ['kind']
+    search_fields = ['value', 'participant__email']
+
 
 @admin.register(QuestionResponse)
 class QuestionResponseAdmin(admin.ModelAdmin):
-    list_display = ['participant', 'question', 'answer', 'created_at']
+    list_display = ['participant', 'question', 'answer', 'value', 'created_at']
+    list_select_related = ['participant__event', 'question']
     list_filter = ['question__question_type', 'created_at']
     search_fields = ['participant__first_name', 'participant__last_name', 'answer']
 
@@ -98,20 +178,29 @@ class QuestionResponseAdmin(admin.ModelAdmin):
 @admin.register(PublicQuestion)
 class PublicQuestionAdmin(admin.ModelAdmin):
     list_display = ['question_text', 'event', 'votes', 'is_answered', 'created_at']
+    list_select_related = ['event']
     list_filter = ['is_answered', 'event', 'created_at']
     search_fields = ['question_text', 'answer']
     readonly_fields = ['votes', 'created_at']
 
+    def delete_queryset(self, request, queryset):
+        event_ids = set(queryset.values_list('event_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for event_id in event_ids:
+            EventStats.rebuild(event_id)
+
 
 @admin.register(QuestionVote)
 class QuestionVoteAdmin(admin.ModelAdmin):
     list_display = ['participant', 'question', 'created_at']
+    list_select_related = ['participant__event', 'question']
     list_filter = ['created_at']
 
 
 @admin.register(ParticipantMatch)
 class ParticipantMatchAdmin(admin.ModelAdmin):
     list_display = ['participant1', 'participant2', 'match_score', 'is_mutual', 'created_at']
+    list_select_related = ['participant1__event', 'participant2__event']
     list_filter = ['is_mutual', 'event', 'created_at']
     search_fields = ['participant1__first_name', 'participant2__first_name', 'match_reasons']
     readonly_fields = ['created_at']
@@ -120,6 +209,7 @@ class ParticipantMatchAdmin(admin.ModelAdmin):
 @admin.register(EventInsight)
 class EventInsightAdmin(admin.ModelAdmin):
     list_display = ['event', 'insight_type', 'title', 'generated_at']
+    list_select_related = ['event']
     list_filter = ['insight_type', 'generated_at']
     search_fields = ['title', 'content']
     readonly_fields = ['generated_at']
@@ -128,6 +218,25 @@ class EventInsightAdmin(admin.ModelAdmin):
 @admin.register(ChatQuery)
 class ChatQueryAdmin(admin.ModelAdmin):
     list_display = ['user', 'event', 'query', 'query_type', 'created_at']
+    list_select_related = ['user', 'event']
     list_filter = ['query_type', 'created_at']
     search_fields = ['query', 'response', 'user__username']
     readonly_fields = ['created_at']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['to_email', 'kind', 'event', 'status', 'attempts', 'created_at', 'sent_at']
+    list_select_related = ['event']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['to_email', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'claimed_by', 'claimed_at']
+
+
+@admin.register(EventArchive)
+class EventArchiveAdmin(admin.ModelAdmin):
+    list_display = ['event_title', 'host', 'event_date', 'status', 'size_bytes', 'created_at', 'purged_at']
+    list_select_related = ['host']
+    list_filter = ['status', 'created_at']
+    search_fields = ['event_title']
+    readonly_fields = ['original_event_id', 'row_counts', 'deleted_counts', 'created_at', 'purged_at']
@@ -0,0 +1,217 @@
+"""Storage of participants' onboarding answers.
+
+Answers are stored either as one ``QuestionResponse`` row per question or,
+with ``EVENTS_PACKED_ANSWERS``, packed into ``Participant.answers`` as
+``{question id: answer}``. Packing cuts a registration's writes from one
+row per question to none beyond the participant itself. Fields that
+questions map to (role, skills, ...) are denormalized onto the participant
+either way, so filtering and insights never read the answers.
+``Participant.get_answers()`` reads both forms.
+
+Answers to rating and number questions always keep their row, with the
+parsed number in ``QuestionResponse.value``, so ``question_summary`` can
+count, average, bucket and rank them in the database through the
+(question, value) index instead of parsing every answer in Python.
+``backfill_values`` fills the column in for rows written before it existed.
+
+``pack_answers`` and ``unpack_answers`` convert existing participants
+between the two, one chunk per transaction, so they can run on a live site
+and be stopped and rerun at any point.
+"""
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Value
+from django.db.models.functions import Floor, Least
+
+from .models import OnboardingQuestion, Participant, QuestionResponse
+
+DEFAULT_CHUNK_SIZE = 500
+# Number questions with more distinct answers than this are bucketed
+MAX_DISTRIBUTION_BUCKETS = 20
+PERCENTILES = (25, 50, 75, 90)
+
+
+def _chunks(queryset, chunk_size):
+    """Primary keys of ``queryset`` in ascending chunks"""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def pack_answers(participants, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Move ``participants``' QuestionResponse rows into their packed answers; returns rows packed"""
+    packed_rows = 0
+    with_rows = participants.filter(pk__in=QuestionResponse.objects.exclude(
+        question__question_type__in=OnboardingQuestion.NUMERIC_TYPES,
+    ).values('participant_id'))
+    for pks in _chunks(with_rows, chunk_size):
+        with transaction.atomic():
+            answers = defaultdict(dict)
+            responses = QuestionResponse.objects.filter(participant_id__in=pks).values_list(
+                'participant_id', 'question_id', 'answer',
+            )
+            for participant_id, question_id, answer in responses:
+                answers[participant_id][str(question_id)] = answer
+                packed_rows += 1
+            # Packed answers already stored win over leftover rows
+            current = dict(Participant.objects.filter(pk__in=pks).values_list('pk', 'answers'))
+            Participant.objects.bulk_update([
+                Participant(pk=pk, answers={**packed, **(current.get(pk) or {})})
+                for pk, packed in answers.items()
+            ], ['answers'])
+            # Numeric rows stay, for question_summary
+            QuestionResponse.objects.filter(participant_id__in=pks).exclude(
+                question__question_type__in=OnboardingQuestion.NUMERIC_TYPES,
+            ).delete()
+        if progress:
+            progress(pks[-1], packed_rows)
+    return packed_rows
+
+
+def unpack_answers(participants, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Turn ``participants``' packed answers back into QuestionResponse rows; returns rows written"""
+    unpacked_rows = 0
+    for pks in _chunks(participants.exclude(answers={}), chunk_size):
+        with transaction.atomic():
+            packed = Participant.objects.filter(pk__in=pks).values_list('pk', 'answers')
+            rows = [
+                QuestionResponse(participant_id=pk, question_id=int(question_id), answer=answer)
+                for pk, answers in packed
+                for question_id, answer in answers.items()
+            ]
+            # Answers to questions deleted since are dropped, as rows would have been
+            question_types = dict(OnboardingQuestion.objects.filter(
+                pk__in={row.question_id for row in rows}
+            ).values_list('pk', 'question_type'))
+            rows = [row for row in rows if row.question_id in question_types]
+            # Numeric answers keep their row while packed
+            existing = set(QuestionResponse.objects.filter(participant_id__in=pks).values_list(
+                'participant_id', 'question_id',
+            ))
+            rows = [row for row in rows if (row.participant_id, row.question_id) not in existing]
+            for row in rows:
+                if question_types[row.question_id] in OnboardingQuestion.NUMERIC_TYPES:
+                    row.value = QuestionResponse.parse_value(row.answer)
+            QuestionResponse.objects.bulk_create(rows, ignore_conflicts=True)
+            Participant.objects.filter(pk__in=pks).update(answers={})
+            unpacked_rows += len(rows)
+        if progress:
+            progress(pks[-1], unpacked_rows)
+    return unpacked_rows
+
+
+def backfill_values(questions, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Give every answer to the numeric ``questions`` a row with its parsed ``value``; returns rows written
+
+    Rows that lack a value get one parsed from their answer, and answers
+    that were packed without a row get one. Answers that are not numbers
+    keep a null value and are looked at again by later runs, which is cheap
+    as long as there are few of them.
+    """
+    written = 0
+    numeric = list(questions.filter(question_type__in=OnboardingQuestion.NUMERIC_TYPES).values_list('pk', flat=True))
+    missing = QuestionResponse.objects.filter(question_id__in=numeric, value__isnull=True)
+    for pks in _chunks(missing, chunk_size):
+        with transaction.atomic():
+            rows = list(QuestionResponse.objects.filter(pk__in=pks).only('pk', 'answer'))
+            for row in rows:
+                row.value = QuestionResponse.parse_value(row.answer)
+            rows = [row for row in rows if row.value is not None]
+            QuestionResponse.objects.bulk_update(rows, ['value'])
+            written += len(rows)
+        if progress:
+            progress('parsed', written)
+
+    packed = Participant.objects.filter(
+        pk__in=Participant.objects.filter(event__onboarding_questions__in=numeric).values('pk'),
+    ).exclude(answers={})
+    keys = {str(question_id): question_id for question_id in numeric}
+    for pks in _chunks(packed, chunk_size):
+        with transaction.atomic():
+            existing = set(QuestionResponse.objects.filter(
+                participant_id__in=pks, question_id__in=numeric,
+            ).values_list('participant_id', 'question_id'))
+            rows = [
+                QuestionResponse(
+                    participant_id=pk, question_id=keys[key], answer=answer,
+                    value=QuestionResponse.parse_value(answer),
+                )
+                for pk, answers in Participant.objects.filter(pk__in=pks).values_list('pk', 'answers')
+                for key, answer in answers.items()
+                if key in keys and (pk, keys[key]) not in existing
+            ]
+            QuestionResponse.objects.bulk_create(rows, ignore_conflicts=True)
+            written += len(rows)
+        if progress:
+            progress('unpacked', written)
+    return written
+
+
+def _distribution(values, summary):
+    """``values`` grouped by answer, or by equal-width bucket when there are many distinct answers"""
+    if summary['distinct'] <= MAX_DISTRIBUTION_BUCKETS:
+        groups = values.values_list('value').annotate(count=Count('pk')).order_by('value')
+        return [(_format(value), count) for value, count in groups]
+    low = summary['min']
+    width = (summary['max'] - low) / MAX_DISTRIBUTION_BUCKETS
+    # The maximum would start a bucket of its own; it closes the last one instead
+    index = Least(
+        Floor((F('value') - Value(low)) / Value(width)), Value(MAX_DISTRIBUTION_BUCKETS - 1),
+        output_field=FloatField(),
+    )
+    groups = (
+        values.annotate(bucket=index).values_list('bucket').annotate(count=Count('pk')).order_by('bucket')
+    )
+    return [
+        (f'{_format(low + bucket * width)}-{_format(low + (bucket + 1) * width)}', count)
+        for bucket, count in groups
+    ]
+
+
+def _format(value):
+    return f'{value:g}'
+
+
+def question_summary(question):
+    """Count, mean, range, distribution and percentiles of a numeric question's answers
+
+    Computed in the database: one aggregate, one grouped count and one
+    indexed lookup per percentile, however many people answered.
+    """
+    values = QuestionResponse.objects.filter(question=question, value__isnull=False).exclude(
+        participant__status='cancelled',
+    )
+    summary = values.aggregate(
+        count=Count('pk'), mean=Avg('value'), min=Min('value'), max=Max('value'),
+        distinct=Count('value', distinct=True),
+    )
+    result = {'question_id': question.pk, 'question': question.question_text, 'count': summary['count']}
+    if not summary['count']:
+        return {**result, 'mean': None, 'min': None, 'max': None, 'percentiles': {}, 'items': []}
+
+    count = summary['count']
+    ordered = values.order_by('value').values_list('value', flat=True)
+    # Nearest-rank percentiles, each a single OFFSET read along the index
+    percentiles = {
+        f'p{percentile}': ordered[max(math.ceil(percentile / 100 * count) - 1, 0)]
+        for percentile in PERCENTILES
+    }
+    return {
+        **result,
+        'mean': round(summary['mean'], 2),
+        'min': summary['min'],
+        'max': summary['max'],
+        'percentiles': percentiles,
+        'items': [
+            {'label': label, 'count': group_count, 'percent': round(100 * group_count / count, 1)}
+            for label, group_count in _distribution(values, summary)
+        ],
+    }
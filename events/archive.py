@@ -0,0 +1,163 @@
+"""Archive completed events, then purge their rows in small batches.
+
+``archive_event`` streams every row belonging to a completed event into a
+gzipped JSON Lines file in media storage, one ``{"model": ..., "fields":
+...}`` object per line with the event itself first, and records it as an
+``EventArchive``. The event's rollup is computed beforehand, so host
+analytics still count the event once its rows are gone. The archive row
+is created first, in the ``archiving`` state, and the file always has the
+same name, so a run that crashed or overlapped another is finished by
+running it again, which overwrites the file instead of adding a second.
+
+``purge_event`` then deletes those rows table by table, children first,
+``EVENTS_PURGE_BATCH_SIZE`` rows per short transaction. Only one batch of
+ids is in memory at a time and other writers get the database between
+batches, unlike ``Event.delete()``, which collects the whole tree and
+deletes it under one long write lock. A purge only ever deletes what is
+left, so an interrupted one is resumed by running it again.
+"""
+import gzip
+import json
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ChatQuery, Event, EventArchive, EventInsight, EventStats, Job, OnboardingQuestion, OutboundEmail,
+    Participant, ParticipantMatch, ParticipantTag, PublicQuestion, QuestionResponse, QuestionVote
+)
+from .rollups import build_event_rollup
+
+ARCHIVE_FORMAT = 1
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAUSE = 0.0
+READ_CHUNK_SIZE = 2000
+
+# Everything stored in an archive, parents before children, with the
+# lookup from each model to its event
+ARCHIVED_MODELS = [
+    (EventStats, 'event'),
+    (OnboardingQuestion, 'event'),
+    (Participant, 'event'),
+    (QuestionResponse, 'participant__event'),
+    (ParticipantTag, 'event'),
+    (PublicQuestion, 'event'),
+    (QuestionVote, 'question__event'),
+    (ParticipantMatch, 'event'),
+    (EventInsight, 'event'),
+    (ChatQuery, 'event'),
+]
+# Deleted in this order, so no batch cascades into another table
+PURGED_MODELS = [
+    (QuestionVote, 'question__event'),
+    (QuestionResponse, 'participant__event'),
+    (ParticipantTag, 'event'),
+    (ParticipantMatch, 'event'),
+    (OutboundEmail, 'event'),
+    (PublicQuestion, 'event'),
+    (Participant, 'event'),
+    (EventInsight, 'event'),
+    (ChatQuery, 'event'),
+    (OnboardingQuestion, 'event'),
+    (Job, 'event'),
+    (EventStats, 'event'),
+]
+
+
+def _write_row(output, model, fields):
+    line = json.dumps({'model': model._meta.label_lower, 'fields': fields}, cls=DjangoJSONEncoder)
+    output.write(line.encode() + b'\n')
+
+
+def archive_file_name(event_id):
+    return f'event-{event_id}.jsonl.gz'
+
+
+def archive_event(event, progress=None):
+    """Write ``event``'s rows to an archive file and return its ``EventArchive``"""
+    if event.status != 'completed':
+        raise ValueError(f'Only completed events can be archived; "{event}" is {event.status}')
+    archive, _ = EventArchive.objects.get_or_create(original_event_id=event.pk, defaults={
+        'event': event,
+        'host_id': event.host_id,
+        'event_title': event.title,
+        'event_date': event.date,
+        'status': 'archiving',
+    })
+    if archive.status != 'archiving':
+        return archive
+
+    build_event_rollup(event)
+    row_counts = {}
+    with tempfile.TemporaryFile() as raw:
+        # One read transaction gives a consistent snapshot of every table
+        with transaction.atomic(), gzip.GzipFile(fileobj=raw, mode='wb') as output:
+            output.write(json.dumps({'format': ARCHIVE_FORMAT}).encode() + b'\n')
+            _write_row(output, Event, Event.objects.filter(pk=event.pk).values().get())
+            for model, lookup in ARCHIVED_MODELS:
+                rows = model.objects.filter(**{lookup: event}).order_by('pk').values()
+                count = 0
+                for row in rows.iterator(chunk_size=READ_CHUNK_SIZE):
+                    _write_row(output, model, row)
+                    count += 1
+                row_counts[model._meta.label_lower] = count
+                if progress:
+                    progress('archived', model._meta.label_lower, count)
+        size = raw.tell()
+        raw.seek(0)
+        name = archive_file_name(event.pk)
+        # Replace the file an interrupted run left, rather than saving beside it
+        field = archive.archive_file.field
+        field.storage.delete(field.generate_filename(archive, name))
+        archive.archive_file.save(name, File(raw), save=False)
+    archive.size_bytes = size
+    archive.row_counts = row_counts
+    archive.status = 'archived'
+    archive.save()
+    return archive
+
+
+def purge_event(archive, batch_size=None, pause=None, progress=None):
+    """Delete the archived event's rows in batches, then the event itself"""
+    if archive.status == 'purged':
+        return archive
+    batch_size = batch_size or getattr(settings, 'EVENTS_PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    pause = getattr(settings, 'EVENTS_PURGE_PAUSE', DEFAULT_PAUSE) if pause is None else pause
+    if archive.status != 'purging':
+        archive.status = 'purging'
+        archive.save(update_fields=['status'])
+
+    counts = dict(archive.deleted_counts)
+    for model, lookup in PURGED_MODELS:
+        label = model._meta.label_lower
+        remaining = model.objects.filter(**{f'{lookup}_id': archive.original_event_id}).order_by('pk')
+        while True:
+            pks = list(remaining.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                _, deleted = model.objects.filter(pk__in=pks).delete()
+                counts[label] = counts.get(label, 0) + deleted.get(model._meta.label, 0)
+                EventArchive.objects.filter(pk=archive.pk).update(deleted_counts=counts)
+            if progress:
+                progress('deleted', label, counts[label])
+            if pause:
+                time.sleep(pause)
+
+    # Nothing refers to the event any more, so this is a single-row delete;
+    # its rollup and this archive stay, pointing nowhere
+    event = Event.objects.filter(pk=archive.original_event_id).first()
+    if event is not None:
+        event.delete()
+        counts['events.event'] = 1
+    archive.event = None
+    archive.deleted_counts = counts
+    archive.status = 'purged'
+    archive.purged_at = timezone.now()
+    archive.save()
+    return archive
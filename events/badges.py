@@ -0,0 +1,268 @@
+"""Printable name badges with personal check-in QR codes.
+
+Badges are laid out on A4 pages and written one page at a time, either as a
+multi-page PDF or as numbered PNG sheets, so memory holds at most one batch
+of pages however many people registered. The PDF is written in a single
+pass: appending page by page makes Pillow re-read the whole file each time,
+which grows quadratically with the page count. QR codes for each batch are rendered in a
+process pool while the fonts and layout are set up once per run.
+
+Hosts download badges as a stored file built by ``build_badge_file`` in the
+background, so no web worker renders pages. The file is named after a
+fingerprint of everything printed on it and rebuilt once that changes.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from PIL import Image, ImageDraw, ImageFont
+
+from .qr import checkin_token, checkin_url, public_base_url, render_qr_png
+
+BADGE_FORMATS = ('pdf', 'png')
+BADGE_DIRECTORY = 'badges'
+# What a download of each format is stored as
+BADGE_EXTENSIONS = {'pdf': 'pdf', 'png': 'zip'}
+
+# A4 at 150 DPI, two columns by four rows of badges
+DPI = 150
+PAGE_SIZE = (1240, 1754)
+COLUMNS = 2
+ROWS = 4
+MARGIN = 60
+QR_BOX_SIZE = 6
+BADGES_PER_PAGE = COLUMNS * ROWS
+# Pages whose QR codes are rendered together
+PAGES_PER_BATCH = 16
+
+FONT_NAMES = ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf')
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+class BadgeLayout:
+    """Badge geometry and fonts, computed once per run"""
+
+    def __init__(self):
+        self.badge_width = (PAGE_SIZE[0] - 2 * MARGIN) // COLUMNS
+        self.badge_height = (PAGE_SIZE[1] - 2 * MARGIN) // ROWS
+        self.padding = 30
+        self.name_font = get_font(40)
+        self.detail_font = get_font(26)
+        self.event_font = get_font(22)
+
+    def origin(self, index):
+        column, row = index % COLUMNS, index // COLUMNS
+        return MARGIN + column * self.badge_width, MARGIN + row * self.badge_height
+
+    def fit(self, draw, text, font, width):
+        """Truncate ``text`` with an ellipsis so it fits in ``width`` pixels"""
+        if draw.textlength(text, font=font) <= width:
+            return text
+        while text and draw.textlength(text + '…', font=font) > width:
+            text = text[:-1]
+        return text + '…'
+
+    def draw_badge(self, page, draw, index, badge, qr_png):
+        x, y = self.origin(index)
+        draw.rectangle(
+            [x + 8, y + 8, x + self.badge_width - 8, y + self.badge_height - 8],
+            outline='#9ca3af', width=2,
+        )
+        with Image.open(BytesIO(qr_png)) as qr_image:
+            qr_size = self.badge_height - 2 * self.padding - 40
+            qr_image = qr_image.resize((qr_size, qr_size))
+            page.paste(qr_image, (x + self.badge_width - qr_size - self.padding, y + self.padding + 20))
+
+        text_width = self.badge_width - qr_size - 3 * self.padding
+        left = x + self.padding
+        top = y + self.padding + 30
+        for line in badge['name']:
+            draw.text((left, top), self.fit(draw, line, self.name_font, text_width), font=self.name_font, fill='black')
+            top += 50
+        top -= 14
+        for line in badge['details']:
+            top += 36
+            draw.text((left, top), self.fit(draw, line, self.detail_font, text_width), font=self.detail_font, fill='#374151')
+        draw.text(
+            (left, y + self.badge_height - self.padding - 40),
+            self.fit(draw, badge['event'], self.event_font, text_width),
+            font=self.event_font, fill='#6b7280',
+        )
+
+    def compose(self, badges, qr_images):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        for index, (badge, qr_png) in enumerate(zip(badges, qr_images)):
+            self.draw_badge(page, draw, index, badge, qr_png)
+        return page
+
+
+def iter_badges(event, statuses=('registered',), base_url=None):
+    """Badge text and check-in payload for each participant, in name order"""
+    participants = (
+        event.participants
+        .filter(status__in=statuses)
+        .order_by('last_name', 'first_name', 'pk')
+        .values_list('pk', 'first_name', 'last_name', 'role', 'company')
+    )
+    for pk, first_name, last_name, role, company in participants.iterator(chunk_size=2000):
+        yield {
+            'name': [value for value in (first_name, last_name) if value],
+            'details': [value for value in (role, company) if value],
+            'event': event.title,
+            'payload': checkin_url(checkin_token(pk), base_url),
+        }
+
+
+def _render_badge_qr(payload):
+    return render_qr_png(payload, QR_BOX_SIZE)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BadgePages(Image.Image):
+    """A multi-page image whose pages are composed as the PDF writer reaches them
+
+    Pillow collects ``append_images`` into a list before writing anything,
+    so every page would be held in memory; frames of one image are visited
+    one at a time, and only the current page is kept.
+    """
+
+    def __init__(self, pages, page_count, blank):
+        super().__init__()
+        self._pages = pages
+        self._blank = blank
+        self.n_frames = page_count
+        self.is_animated = page_count > 1
+        self._frame = -1
+        self.seek(0)
+
+    def seek(self, frame):
+        if frame == self._frame:
+            return
+        if frame != self._frame + 1 or frame >= self.n_frames:
+            raise EOFError('Badge pages are written in order')
+        # Attendees who registered since the pages were counted wait for the next build
+        page = next(self._pages, None) or self._blank()
+        self.im, self._mode, self._size = page.im, page.mode, page.size
+        self._frame = frame
+
+    def tell(self):
+        return self._frame
+
+
+def write_badges(event, output, badge_format='pdf', workers=1, statuses=('registered',), base_url=None,
+                 progress=None):
+    """Write badge pages for ``event`` to ``output`` and return the page count.
+
+    ``output`` is a file path for PDF and a directory for PNG sheets, which
+    are named ``badges-0001.png`` and so on. ``progress`` is called with the
+    number of pages written so far.
+    """
+    if badge_format not in BADGE_FORMATS:
+        raise ValueError(f'Unsupported badge format: {badge_format}')
+    if badge_format == 'png':
+        os.makedirs(output, exist_ok=True)
+
+    layout = BadgeLayout()
+    base_url = public_base_url(base_url)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    render = executor.map if executor else map
+    written = 0
+
+    def pages():
+        nonlocal written
+        for batch in _batches(iter_badges(event, statuses, base_url), BADGES_PER_PAGE * PAGES_PER_BATCH):
+            qr_images = list(render(_render_badge_qr, [badge['payload'] for badge in batch]))
+            for start in range(0, len(batch), BADGES_PER_PAGE):
+                written += 1
+                if progress:
+                    progress(written)
+                yield layout.compose(batch[start:start + BADGES_PER_PAGE], qr_images[start:start + BADGES_PER_PAGE])
+
+    try:
+        if badge_format == 'pdf':
+            page_count = math.ceil(event.participants.filter(status__in=statuses).count() / BADGES_PER_PAGE)
+            if not page_count:
+                return 0
+            document = BadgePages(pages(), page_count, blank=lambda: layout.compose([], []))
+            document.save(output, 'PDF', save_all=True, resolution=DPI)
+            return page_count
+        for page in pages():
+            page.save(os.path.join(output, f'badges-{written:04d}.png'), 'PNG')
+            page.close()
+    finally:
+        if executor:
+            executor.shutdown()
+    return written
+
+
+def badge_fingerprint(event, badge_format, statuses=('registered',), base_url=None):
+    """``(badge count, fingerprint)``; the fingerprint changes whenever the badges would"""
+    badges = event.participants.filter(status__in=statuses).aggregate(count=Count('id'), updated=Max('updated_at'))
+    key = f'{badge_format}:{public_base_url(base_url)}:{event.updated_at}:{badges["count"]}:{badges["updated"]}'
+    return badges['count'], hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def badge_file_name(event_id, badge_format, fingerprint):
+    return f'{BADGE_DIRECTORY}/event-{event_id}-{fingerprint}.{BADGE_EXTENSIONS[badge_format]}'
+
+
+def build_badge_file(event_id, badge_format, fingerprint):
+    """Write ``event_id``'s badges to storage as a PDF or a zip of PNG sheets"""
+    from .models import Event
+
+    event = Event.objects.filter(pk=event_id).first()
+    name = badge_file_name(event_id, badge_format, fingerprint)
+    if event is None or default_storage.exists(name):
+        return
+    workdir = tempfile.mkdtemp(prefix='badges-')
+    try:
+        output = os.path.join(workdir, 'badges.pdf' if badge_format == 'pdf' else 'sheets')
+        write_badges(event, output, badge_format, workers=getattr(settings, 'EVENTS_BADGE_WORKERS', 1))
+        if badge_format == 'png':
+            archive = os.path.join(workdir, 'badges.zip')
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as bundle:
+                for sheet in sorted(os.listdir(output)):
+                    bundle.write(os.path.join(output, sheet), sheet)
+            output = archive
+        with open(output, 'rb') as badges:
+            default_storage.save(name, File(badges))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Earlier versions of this event's badges are never served again
+    _, files = default_storage.listdir(BADGE_DIRECTORY)
+    prefix, extension = f'event-{event_id}-', f'.{BADGE_EXTENSIONS[badge_format]}'
+    for stale in files:
+        path = f'{BADGE_DIRECTORY}/{stale}'
+        if stale.startswith(prefix) and stale.endswith(extension) and path != name:
+            default_storage.delete(path)
@@ -0,0 +1,170 @@
+"""Versioned caching for the public pages.
+
+Every cache key carries a version token: one global "catalog" token that
+changes whenever any event is created, edited or deleted, and one token per
+event that also changes when its registration counts move. Invalidation is
+therefore exact; the timeout only bounds how long unreachable entries linger.
+
+Rendered event cards and the public detail body are cached as fragments, so
+the per-user chrome around them is still rendered on every request.
+"""
+import bisect
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .metrics import record_cache
+
+DEFAULT_TIMEOUT = 60 * 60 * 24
+CATALOG_VERSION_KEY = 'pages:catalog:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'EVENTS_PAGE_CACHE', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'EVENTS_PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _new_token():
+    # Time-based so a token evicted from the cache is never reissued
+    return str(time.time_ns())
+
+
+def _event_version_key(event_id):
+    return f'pages:event:{event_id}:version'
+
+
+def catalog_version():
+    cache = get_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _new_token()
+        if not cache.add(CATALOG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def event_versions(event_ids):
+    """``{event_id: version}`` for every id, issuing tokens for new ones"""
+    cache = get_cache()
+    keys = {_event_version_key(event_id): event_id for event_id in event_ids}
+    found = cache.get_many(keys)
+    missing = {key: _new_token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {event_id: found[key] for key, event_id in keys.items()}
+
+
+def _bump(keys):
+    get_cache().set_many({key: _new_token() for key in keys}, timeout=None)
+
+
+def bump_versions(keys):
+    # Bump now so this transaction reads its own writes, and again on commit
+    # so a page cached by a concurrent reader before the commit is dropped
+    _bump(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_bump, keys))
+
+
+def bump_event_version(event_id, catalog=False):
+    """Invalidate one event's fragments, and the catalog if the listing changed"""
+    keys = [_event_version_key(event_id)]
+    if catalog:
+        keys.append(CATALOG_VERSION_KEY)
+    bump_versions(keys)
+
+
+def bump_event_versions(event_ids):
+    bump_versions([_event_version_key(event_id) for event_id in event_ids] + [CATALOG_VERSION_KEY])
+
+
+def upcoming_catalog():
+    """Sorted ``(timestamp, event_id)`` pairs for published events, cached per catalog version"""
+    from .models import Event
+
+    cache = get_cache()
+    key = f'pages:catalog:{catalog_version()}:upcoming'
+    entries = cache.get(key)
+    record_cache(hits=entries is not None, misses=entries is None)
+    if entries is None:
+        rows = (
+            Event.objects
+            .filter(status='published', date__gte=timezone.now())
+            .order_by('date', 'pk')
+            .values_list('date', 'pk')
+        )
+        entries = [(date.timestamp(), pk) for date, pk in rows]
+        cache.set(key, entries, get_timeout())
+    return entries
+
+
+def upcoming_event_ids(limit, after=None):
+    """Ids of the next ``limit`` upcoming events after a ``(timestamp, id)`` cursor,
+    and the cursor for the page after that (``None`` on the last page)"""
+    entries = upcoming_catalog()
+    start = bisect.bisect_left(entries, (timezone.now().timestamp(), 0))
+    if after is not None:
+        start = max(start, bisect.bisect_right(entries, after))
+    page = entries[start:start + limit + 1]
+    next_cursor = page[limit - 1] if len(page) > limit else None
+    return [pk for _, pk in page[:limit]], next_cursor
+
+
+def render_event_fragments(template_name, events=None, event_ids=None):
+    """Rendered ``template_name`` for each event, in order, reusing cached fragments.
+
+    Pass either loaded ``events`` or just ``event_ids``; in the latter case
+    only the events whose fragments are missing are read from the database.
+    """
+    from .models import Event
+
+    if events is not None:
+        event_ids = [event.pk for event in events]
+    versions = event_versions(event_ids)
+    keys = {
+        event_id: f'pages:fragment:{template_name}:{event_id}:{versions[event_id]}'
+        for event_id in event_ids
+    }
+    cache = get_cache()
+    cached = cache.get_many(list(keys.values()))
+    fragments = {event_id: cached[key] for event_id, key in keys.items() if key in cached}
+
+    missing = [event_id for event_id in event_ids if event_id not in fragments]
+    record_cache(hits=len(fragments), misses=len(missing))
+    if missing:
+        if events is not None:
+            loaded = {event.pk: event for event in events}
+        else:
+            loaded = Event.objects.select_related('host', 'template', 'stats').in_bulk(missing)
+        rendered = {}
+        for event_id in missing:
+            if event_id in loaded:
+                html = render_to_string(template_name, {'event': loaded[event_id]})
+                fragments[event_id] = rendered[keys[event_id]] = html
+        cache.set_many(rendered, get_timeout())
+
+    return [mark_safe(fragments[event_id]) for event_id in event_ids if event_id in fragments]
+
+
+def cached_event_page(event_id, build):
+    """Cached ``build(event_id)`` result for one event, or ``None`` if it returned ``None``"""
+    version = event_versions([event_id])[event_id]
+    key = f'pages:event:{event_id}:{version}:page'
+    cache = get_cache()
+    page = cache.get(key)
+    record_cache(hits=page is not None, misses=page is None)
+    if page is None:
+        page = build(event_id)
+        if page is not None:
+            cache.set(key, page, get_timeout())
+    return page
@@ -0,0 +1,327 @@
+"""Answer host questions about an event.
+
+Common questions (counts, "who works in X", skill and experience filters,
+top skills) are parsed into ORM queries against the stats row and tag
+index and never reach a language model. Anything else goes to the
+configured backend with a compact context assembled from precomputed
+summaries, trimmed to a token budget. Answers are cached per event, query
+and data version, and every question is recorded as a ``ChatQuery``.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max, Q
+from django.utils.module_loading import import_string
+
+from .caching import event_versions
+from .facets import AttendeeFilter, FACET_LIMIT
+from .metrics import record_cache
+from .models import ChatQuery, EventStats, Participant, ParticipantTag
+
+DEFAULT_CONTEXT_TOKENS = 1500
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+LIST_LIMIT = 10
+
+STATUS_WORDS = {
+    'waitlist': 'waitlisted',
+    'waitlisted': 'waitlisted',
+    'cancelled': 'cancelled',
+    'canceled': 'cancelled',
+    'attended': 'attended',
+    'checked in': 'attended',
+    'registered': 'registered',
+}
+
+
+class ChatBackend:
+    """Interface for the model that answers open-ended questions"""
+
+    def complete(self, event, query, context):
+        raise NotImplementedError
+
+
+class LocalChatBackend(ChatBackend):
+    """Deterministic offline backend that answers from the context alone"""
+
+    def complete(self, event, query, context):
+        lines = [line for line in context.splitlines() if line.strip()]
+        return '\n'.join([f'Here is what I know about {event.title}:'] + lines[:12])
+
+
+class OpenAIChatBackend(ChatBackend):
+    """Chat completion through the OpenAI API"""
+    SYSTEM_PROMPT = (
+        'You answer an event host\'s questions about their event. Use only the '
+        'facts provided. If the facts do not answer the question, say so.'
+    )
+
+    def complete(self, event, query, context):
+        try:
+            from openai import OpenAI
+        except ImportError:
+            raise ImproperlyConfigured('OpenAIChatBackend requires the openai package')
+        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        completion = client.chat.completions.create(
+            model=getattr(settings, 'EVENTS_CHAT_MODEL', 'gpt-4o-mini'),
+            messages=[
+                {'role': 'system', 'content': self.SYSTEM_PROMPT},
+                {'role': 'user', 'content': f'Event facts:\n{context}\n\nQuestion: {query}'},
+            ],
+        )
+        return completion.choices[0].message.content.strip()
+
+
+def get_backend():
+    path = getattr(settings, 'EVENTS_CHAT_BACKEND', 'events.chat.LocalChatBackend')
+    return import_string(path)()
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split()).rstrip('?.! ')
+
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token"""
+    return len(text) // 4 + 1
+
+
+# Intent parsing
+
+EXPERIENCE_PATTERNS = [
+    (re.compile(r'between (\d+) and (\d+) years?'), lambda m: (int(m[1]), int(m[2]))),
+    (re.compile(r'(?:more than|over) (\d+) years?'), lambda m: (int(m[1]) + 1, None)),
+    (re.compile(r'(?:at least (\d+)|(\d+)\+) years?'), lambda m: (int(m[1] or m[2]), None)),
+    (re.compile(r'(?:less than|under|fewer than) (\d+) years?'), lambda m: (None, max(int(m[1]) - 1, 0))),
+]
+EXPERIENCE_SUFFIX = re.compile(r'\s*(?:of )?(?:experience|exp)\b')
+INDUSTRY_PATTERN = re.compile(r'\bwork(?:s|ing)? (?:in|at|for) (?:the )?(.+?)(?: industry| sector)?$')
+SKILL_PATTERN = re.compile(r'\b(?:knows?|skilled in|skills? in|experience (?:in|with)|uses?|using|codes? in) (.+)$')
+INTEREST_PATTERN = re.compile(r'\binterested in (.+)$')
+TOP_PATTERN = re.compile(r'\b(?:top|most common|popular|main) (skills|interests|industries|roles)\b')
+COUNT_PATTERN = re.compile(r'^how many\b')
+LIST_PATTERN = re.compile(r'^(?:who|which (?:people|participants|attendees)|list|show)\b')
+
+
+def _split_labels(text):
+    text = EXPERIENCE_SUFFIX.sub('', text).strip(' ,')
+    parts = re.split(r',|\band\b|&', text)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_intent(query):
+    """Return ``(intent, options)`` for a normalized query, or ``None``"""
+    top = TOP_PATTERN.search(query)
+    if top:
+        return 'top', {'facet': top[1]}
+
+    if COUNT_PATTERN.search(query):
+        intent = 'count'
+    elif LIST_PATTERN.search(query):
+        intent = 'list'
+    else:
+        return None
+
+    text = query
+    attendee_filter = AttendeeFilter()
+    for pattern, bounds in EXPERIENCE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            attendee_filter.min_experience, attendee_filter.max_experience = bounds(match)
+            text = (text[:match.start()] + text[match.end():]).strip()
+            text = re.sub(r'\s*\bwith\s*$', '', EXPERIENCE_SUFFIX.sub('', text, count=1)).strip()
+            break
+
+    options = {'filter': attendee_filter, 'industry': None}
+    for word, status in STATUS_WORDS.items():
+        if re.search(rf'\b{word}\b', text):
+            attendee_filter.status = [status]
+            break
+
+    industry = INDUSTRY_PATTERN.search(text)
+    interests = INTEREST_PATTERN.search(text)
+    skills = SKILL_PATTERN.search(text)
+    if industry:
+        options['industry'] = industry[1].strip()
+    elif interests:
+        attendee_filter.interests = _split_labels(interests[1])
+    elif skills:
+        attendee_filter.skills = _split_labels(skills[1])
+    elif intent == 'list' and attendee_filter.is_empty:
+        return None
+    return intent, options
+
+
+def _filtered_participants(event, options):
+    queryset = options['filter'].apply(Participant.objects.filter(event=event))
+    if not options['filter'].status:
+        queryset = queryset.exclude(status='cancelled')
+    industry = options['industry']
+    if industry:
+        queryset = queryset.filter(Q(industry__iexact=industry) | Q(company__iexact=industry))
+    return queryset
+
+
+def _describe(options):
+    attendee_filter = options['filter']
+    parts = []
+    if options['industry']:
+        parts.append(f'working in {options["industry"]}')
+    if attendee_filter.skills:
+        parts.append(f'skilled in {", ".join(attendee_filter.skills)}')
+    if attendee_filter.interests:
+        parts.append(f'interested in {", ".join(attendee_filter.interests)}')
+    low, high = attendee_filter.min_experience, attendee_filter.max_experience
+    if low is not None and high is not None:
+        parts.append(f'with {low}-{high} years of experience')
+    elif low is not None:
+        parts.append(f'with {low}+ years of experience')
+    elif high is not None:
+        parts.append(f'with at most {high} years of experience')
+    return ' '.join(parts)
+
+
+def answer_locally(event, intent, options):
+    """Answer a parsed intent straight from the database"""
+    if intent == 'top':
+        return _answer_top(event, options['facet'])
+
+    attendee_filter = options['filter']
+    description = _describe(options)
+    status = attendee_filter.status[0] if attendee_filter.status else None
+    label = f'{status} participants' if status else 'participants'
+
+    if intent == 'count':
+        if not description:
+            stats = EventStats.objects.filter(event=event).first() or EventStats.rebuild(event.pk)
+            count = getattr(stats, EventStats.STATUS_FIELDS[status]) if status else stats.total_participants
+        else:
+            count = _filtered_participants(event, options).count()
+        return f'{count} {label}{" " + description if description else ""}.'
+
+    participants = list(
+        _filtered_participants(event, options)
+        .order_by('last_name', 'first_name')
+        .values_list('first_name', 'last_name', 'role', 'company')[:LIST_LIMIT + 1]
+    )
+    if not participants:
+        return f'No {label} {description}.'.replace('  ', ' ')
+    lines = []
+    for first_name, last_name, role, company in participants[:LIST_LIMIT]:
+        detail = ', '.join(value for value in (role, company) if value)
+        lines.append(f'- {first_name} {last_name}' + (f' ({detail})' if detail else ''))
+    if len(participants) > LIST_LIMIT:
+        total = _filtered_participants(event, options).count()
+        lines.append(f'...and {total - LIST_LIMIT} more.')
+    return '\n'.join([f'{label.capitalize()} {description}:'.replace('  ', ' ')] + lines)
+
+
+def _answer_top(event, facet):
+    active = Participant.objects.filter(event=event).exclude(status='cancelled')
+    if facet in ('skills', 'interests'):
+        rows = (
+            ParticipantTag.objects
+            .filter(event=event, kind=facet[:-1], participant__in=active.values('pk'))
+            .values('value')
+            .annotate(label=Max('label'), count=Count('id'))
+            .order_by('-count', 'value')[:LIST_LIMIT]
+        )
+    else:
+        field = 'industry' if facet == 'industries' else 'role'
+        rows = (
+            active.exclude(**{field: ''})
+            .values(field)
+            .annotate(label=Max(field), count=Count('id'))
+            .order_by('-count', field)[:LIST_LIMIT]
+        )
+    if not rows:
+        return f'No {facet} recorded yet.'
+    return f'Top {facet}: ' + ', '.join(f'{row["label"]} ({row["count"]})' for row in rows) + '.'
+
+
+# Context building for the model backend
+
+def build_context(event, max_tokens=None):
+    """Compact event summary from precomputed rows, within ``max_tokens``"""
+    if max_tokens is None:
+        max_tokens = getattr(settings, 'EVENTS_CHAT_CONTEXT_TOKENS', DEFAULT_CONTEXT_TOKENS)
+
+    stats = EventStats.objects.filter(event=event).first() or EventStats.rebuild(event.pk)
+    sections = [
+        f'Event: {event.title}',
+        f'Date: {event.date:%Y-%m-%d %H:%M}' + (f' at {event.location}' if event.location else ''),
+        f'Status: {event.get_status_display()}'
+        + (f'; capacity {event.max_participants}' if event.max_participants else ''),
+        f'Registered: {stats.registered_count}; waitlisted: {stats.waitlisted_count}; '
+        f'attended: {stats.attended_count}; cancelled: {stats.cancelled_count}',
+        f'Public questions: {stats.question_count}; votes: {stats.vote_count}',
+    ]
+
+    for insight in event.insights.all():
+        data = insight.get_data()
+        items = data.get('items')
+        if items:
+            summary = ', '.join(f'{item["label"]} ({item["count"]})' for item in items[:FACET_LIMIT])
+            sections.append(f'{insight.title}: {summary}')
+        elif insight.insight_type == 'networking_potential' and data:
+            sections.append(
+                f'{insight.title}: score {data.get("score")}, '
+                f'interest overlap {data.get("interest_overlap")}, '
+                f'industry diversity {data.get("industry_diversity")}'
+            )
+
+    for question in event.public_questions.order_by('-votes', '-created_at')[:5]:
+        sections.append(f'Audience question ({question.votes} votes): {question.question_text[:200]}')
+
+    lines = []
+    used = 0
+    for section in sections:
+        cost = estimate_tokens(section)
+        if used + cost > max_tokens:
+            remaining = (max_tokens - used) * 4
+            if remaining > 40:
+                lines.append(section[:remaining - 3] + '...')
+            break
+        lines.append(section)
+        used += cost
+    return '\n'.join(lines)
+
+
+# Caching and recording
+
+def data_version(event):
+    """Changes whenever the event, its attendees, questions or insights change"""
+    return event_versions([event.pk])[event.pk]
+
+
+def cache_key(event, normalized_query, version):
+    digest = hashlib.sha256(normalized_query.encode()).hexdigest()[:32]
+    version_digest = hashlib.sha1(version.encode()).hexdigest()[:12]
+    return f'chat:{event.pk}:{version_digest}:{digest}'
+
+
+def answer_query(event, user, query, backend=None):
+    """Answer ``query`` about ``event`` and record it as a ``ChatQuery``"""
+    normalized = normalize_query(query)
+    key = cache_key(event, normalized, data_version(event))
+    cached = cache.get(key)
+    record_cache(hits=cached is not None, misses=cached is None)
+    if cached is not None:
+        query_type, response = cached
+    else:
+        intent = parse_intent(normalized)
+        if intent is not None:
+            query_type = intent[0]
+            response = answer_locally(event, *intent)
+        else:
+            query_type = 'general'
+            response = (backend or get_backend()).complete(event, query, build_context(event))
+        cache.set(key, (query_type, response), getattr(settings, 'EVENTS_CHAT_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+
+    chat_query = ChatQuery.objects.create(
+        event=event, user=user, query=query, response=response, query_type=query_type
+    )
+    chat_query.cached = cached is not None
+    return chat_query
@@ -0,0 +1,105 @@
+"""Copy events, one at a time or as a recurring series.
+
+A clone gets the source event's details, settings and onboarding
+questions, and optionally the Q&A questions the host seeded (ones asked
+without a participant); registrations, votes and insights are not copied.
+Clones start as drafts, with their dates (and end date and registration
+deadline) moved by the same amount.
+
+Everything is written in one transaction with a handful of bulk inserts,
+however many clones there are. The per-event work that ``Event.save``
+normally does (stats row, search index, QR code, page cache) is done in
+bulk as well. Backends that cannot return primary keys from a bulk insert
+save the events one at a time instead.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .caching import bump_event_versions
+from .models import Event, EventStats, OnboardingQuestion, PublicQuestion
+from .qr import schedule_qr_codes
+from .search import index_events
+
+MAX_SERIES_LENGTH = 104
+# Event fields carried over to every clone
+CLONED_FIELDS = (
+    'host_id', 'title', 'description', 'location', 'max_participants', 'template_id',
+    'allow_waitlist', 'enable_qa', 'enable_matchmaking',
+)
+QUESTION_FIELDS = ('question_text', 'question_type', 'is_mandatory', 'order', 'choices', 'maps_to_field')
+
+
+def series_dates(start, count, interval=timedelta(days=7)):
+    """``count`` dates ``interval`` apart, beginning at ``start``"""
+    return [start + interval * i for i in range(count)]
+
+
+def copy_questions(questions, events):
+    """Unsaved copies of ``questions`` for each of ``events``"""
+    return [
+        OnboardingQuestion(event=event, **{field: getattr(question, field) for field in QUESTION_FIELDS})
+        for event in events
+        for question in questions
+    ]
+
+
+def instantiate_template(event, template=None):
+    """Give ``event`` its own copy of its template's questions"""
+    template = template or event.template
+    if template is None:
+        return []
+    return OnboardingQuestion.objects.bulk_create(copy_questions(template.template_questions.all(), [event]))
+
+
+def _shift(value, delta):
+    return value + delta if value is not None else None
+
+
+def build_clone(event, date, title=None):
+    delta = date - event.date
+    clone = Event(
+        date=date,
+        end_date=_shift(event.end_date, delta),
+        registration_deadline=_shift(event.registration_deadline, delta),
+        status='draft',
+        **{field: getattr(event, field) for field in CLONED_FIELDS},
+    )
+    if title:
+        clone.title = title
+    return clone
+
+
+def _insert_events(clones, question_count=0):
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # The new ids are needed for the questions, so fall back to save()
+        for clone in clones:
+            clone.save()
+        if question_count:
+            EventStats.objects.filter(event__in=clones).update(question_count=question_count)
+        return
+    Event.objects.bulk_create(clones)
+    EventStats.objects.bulk_create([EventStats(event=clone, question_count=question_count) for clone in clones])
+    index_events(clones)
+    schedule_qr_codes(clones)
+    bump_event_versions([clone.pk for clone in clones])
+
+
+def clone_event(event, dates=None, title=None, include_qa=False):
+    """Copies of ``event`` on each of ``dates`` (default: the same date); returns them"""
+    dates = dates or [event.date]
+    if len(dates) > MAX_SERIES_LENGTH:
+        raise ValueError(f'A series can have at most {MAX_SERIES_LENGTH} events')
+    clones = [build_clone(event, date, title) for date in dates]
+    questions = list(event.onboarding_questions.all())
+    seeds = list(event.public_questions.filter(participant__isnull=True)) if include_qa else []
+
+    with transaction.atomic():
+        _insert_events(clones, question_count=len(seeds))
+        OnboardingQuestion.objects.bulk_create(copy_questions(questions, clones))
+        PublicQuestion.objects.bulk_create([
+            PublicQuestion(event=clone, question_text=seed.question_text)
+            for clone in clones
+            for seed in seeds
+        ])
+    return clones
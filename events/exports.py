@@ -0,0 +1,134 @@
+"""Streaming participant exports with one column per onboarding question.
+
+Participants are read in primary-key order with ``iterator(chunk_size=...)``
+and their responses are prefetched once per chunk, so memory stays flat and
+the header row goes out before any participant has been read.
+
+CSV cells that a spreadsheet would run as a formula are prefixed with
+``'`` so registrant-supplied text is always shown as text.
+"""
+import csv
+import json
+import zlib
+
+from django.db.models import Prefetch
+
+from .models import QuestionResponse
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+PARTICIPANT_COLUMNS = [
+    'id', 'first_name', 'last_name', 'email', 'phone', 'status', 'role', 'company',
+    'industry', 'experience_years', 'skills', 'interests', 'priority_score', 'registered_at',
+]
+
+DEFAULT_CHUNK_SIZE = 1000
+# Leading characters that make spreadsheets evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def question_columns(questions):
+    """Unique, readable column names for each question"""
+    columns = []
+    seen = set()
+    for question in questions:
+        name = question.question_text.strip()
+        if name in seen:
+            name = f'{name} ({question.pk})'
+        seen.add(name)
+        columns.append(name)
+    return columns
+
+
+def iter_participant_answers(event, question_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(participant, {question_id: answer})`` in primary-key order"""
+    responses = QuestionResponse.objects.filter(question_id__in=question_ids).only(
+        'participant_id', 'question_id', 'answer'
+    )
+    participants = (
+        event.participants
+        .order_by('pk')
+        .only(*PARTICIPANT_COLUMNS, 'event_id', 'answers')
+        .prefetch_related(Prefetch('responses', queryset=responses))
+    )
+    for participant in participants.iterator(chunk_size=chunk_size):
+        yield participant, participant.get_answers()
+
+
+def _participant_values(participant):
+    values = {}
+    for column in PARTICIPANT_COLUMNS:
+        value = getattr(participant, column)
+        if column == 'registered_at' and value is not None:
+            value = value.isoformat()
+        values[column] = value
+    return values
+
+
+def csv_cell(value):
+    """``value`` as a CSV cell that spreadsheets will not evaluate"""
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(event, chunk_size=DEFAULT_CHUNK_SIZE):
+    questions = list(event.get_onboarding_questions())
+    writer = csv.writer(Echo())
+    yield writer.writerow([csv_cell(column) for column in PARTICIPANT_COLUMNS + question_columns(questions)])
+    question_ids = [question.pk for question in questions]
+    for participant, answers in iter_participant_answers(event, question_ids, chunk_size):
+        row = list(_participant_values(participant).values())
+        row += [answers.get(question_id, '') for question_id in question_ids]
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+def iter_jsonl(event, chunk_size=DEFAULT_CHUNK_SIZE):
+    questions = list(event.get_onboarding_questions())
+    columns = question_columns(questions)
+    question_ids = [question.pk for question in questions]
+    for participant, answers in iter_participant_answers(event, question_ids, chunk_size):
+        record = _participant_values(participant)
+        record['answers'] = {
+            column: answers.get(question_id)
+            for column, question_id in zip(columns, question_ids)
+        }
+        yield json.dumps(record) + '\n'
+
+
+def gzip_stream(chunks, flush_every=DEFAULT_CHUNK_SIZE):
+    """Gzip an iterable of text chunks, flushing regularly so bytes keep flowing"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for count, chunk in enumerate(chunks, start=1):
+        data = compressor.compress(chunk.encode())
+        if count == 1 or count % flush_every == 0:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_participants(event, export_format='csv', compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return an iterator of export chunks: ``str``, or ``bytes`` when compressed"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    rows = iter_csv(event, chunk_size) if export_format == 'csv' else iter_jsonl(event, chunk_size)
+    return gzip_stream(rows) if compress else rows
+
+
+def export_filename(event, export_format='csv', compress=False):
+    _, extension = EXPORT_FORMATS[export_format]
+    filename = f'event-{event.pk}-participants.{extension}'
+    return f'{filename}.gz' if compress else filename
@@ -0,0 +1,135 @@
+"""Faceted attendee filtering over the normalized participant tag index.
+
+Skills and interests match whole tags ("Java" never matches "JavaScript")
+through indexed ``Exists`` lookups on ``ParticipantTag``. Every facet count
+is a grouped query over the current result set.
+"""
+from django.db.models import Count, Exists, Min, OuterRef, Q
+
+from .insights import EXPERIENCE_BUCKETS
+from .models import Participant, ParticipantTag, normalize_tag
+
+# The insight buckets as inclusive whole-year ranges, e.g. "1-3" is 1 or 2
+EXPERIENCE_RANGES = [
+    (label.removesuffix(' years'), low, None if high is None else high - 1)
+    for label, low, high in EXPERIENCE_BUCKETS
+]
+
+FACET_LIMIT = 30
+
+
+class AttendeeFilter:
+    """Filter criteria parsed from a query string"""
+    LIST_PARAMS = ['skills', 'interests', 'role', 'industry', 'status']
+
+    def __init__(self, skills=None, interests=None, role=None, industry=None, status=None,
+                 min_experience=None, max_experience=None):
+        self.skills = skills or []
+        self.interests = interests or []
+        self.role = role or []
+        self.industry = industry or []
+        self.status = status or []
+        self.min_experience = min_experience
+        self.max_experience = max_experience
+
+    @classmethod
+    def from_query(cls, params):
+        values = {}
+        for name in cls.LIST_PARAMS:
+            items = []
+            for raw in params.getlist(name):
+                items.extend(item.strip() for item in raw.split(',') if item.strip())
+            values[name] = items
+        for name in ('min_experience', 'max_experience'):
+            try:
+                values[name] = int(params.get(name, ''))
+            except ValueError:
+                values[name] = None
+        return cls(**values)
+
+    @property
+    def is_empty(self):
+        return not any([
+            self.skills, self.interests, self.role, self.industry, self.status,
+            self.min_experience is not None, self.max_experience is not None,
+        ])
+
+    def apply(self, queryset):
+        for kind, labels in (('skill', self.skills), ('interest', self.interests)):
+            # Every selected tag must be present
+            for label in labels:
+                queryset = queryset.filter(Exists(ParticipantTag.objects.filter(
+                    participant=OuterRef('pk'), kind=kind, value=normalize_tag(label),
+                )))
+        if self.role:
+            queryset = queryset.filter(role__in=self.role)
+        if self.industry:
+            queryset = queryset.filter(industry__in=self.industry)
+        if self.status:
+            queryset = queryset.filter(status__in=self.status)
+        if self.min_experience is not None:
+            queryset = queryset.filter(experience_years__gte=self.min_experience)
+        if self.max_experience is not None:
+            queryset = queryset.filter(experience_years__lte=self.max_experience)
+        return queryset
+
+    def as_dict(self):
+        return {
+            'skills': self.skills,
+            'interests': self.interests,
+            'role': self.role,
+            'industry': self.industry,
+            'status': self.status,
+            'min_experience': self.min_experience,
+            'max_experience': self.max_experience,
+        }
+
+
+def filter_attendees(event, attendee_filter):
+    return attendee_filter.apply(Participant.objects.filter(event=event))
+
+
+def facet_counts(event, queryset):
+    """Live counts for every facet over ``queryset``"""
+    matching = queryset.order_by().values('pk')
+    tag_rows = (
+        ParticipantTag.objects
+        .filter(event=event, participant__in=matching)
+        .values('kind', 'value')
+        .annotate(label=Min('label'), count=Count('id'))
+        .order_by('-count', 'value')
+    )
+    tags = {'skill': [], 'interest': []}
+    for row in tag_rows:
+        if len(tags[row['kind']]) < FACET_LIMIT:
+            tags[row['kind']].append({'value': row['label'], 'count': row['count']})
+
+    def column_counts(field):
+        rows = (
+            queryset.order_by().exclude(**{field: ''})
+            .values(field).annotate(count=Count('id')).order_by('-count', field)[:FACET_LIMIT]
+        )
+        return [{'value': row[field], 'count': row['count']} for row in rows]
+
+    experience = queryset.order_by().aggregate(**{
+        f'experience_{index}': Count('id', filter=Q(experience_years__gte=low, **(
+            {'experience_years__lte': high} if high is not None else {}
+        )))
+        for index, (label, low, high) in enumerate(EXPERIENCE_RANGES)
+    })
+    status_labels = dict(Participant.STATUS_CHOICES)
+
+    return {
+        'skills': tags['skill'],
+        'interests': tags['interest'],
+        'role': column_counts('role'),
+        'industry': column_counts('industry'),
+        'status': [
+            {'value': row['value'], 'label': status_labels.get(row['value'], row['value']), 'count': row['count']}
+            for row in column_counts('status')
+        ],
+        'experience': [
+            {'value': label, 'min': low, 'max': high, 'count': experience[f'experience_{index}']}
+            for index, (label, low, high) in enumerate(EXPERIENCE_RANGES)
+        ],
+    }
@@ -1,8 +1,14 @@
+import re
+
 from django import forms
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column, Field
+from .cloning import MAX_SERIES_LENGTH
 from .models import Host, Event, OnboardingQuestion, Participant, PublicQuestion
 
 
@@ -124,6 +130,40 @@ class EventCreationForm(forms.ModelForm):
         )
 
 
+class EventCloneForm(forms.Form):
+    """Form for copying an event once or as a weekly (or other) series"""
+    title = forms.CharField(max_length=255)
+    date = forms.DateTimeField(
+        help_text="Date of the first copy",
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+    )
+    count = forms.IntegerField(
+        min_value=1, max_value=MAX_SERIES_LENGTH, initial=1,
+        help_text="How many events to create",
+    )
+    interval_days = forms.IntegerField(
+        min_value=1, max_value=365, initial=7,
+        help_text="Days between events in a series",
+    )
+    include_qa = forms.BooleanField(
+        required=False, label="Copy Q&A questions you added yourself",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper()
+        self.helper.layout = Layout(
+            'title',
+            'date',
+            Row(
+                Column('count', css_class='form-group col-md-6 mb-0'),
+                Column('interval_days', css_class='form-group col-md-6 mb-0'),
+                css_class='form-row'
+            ),
+            'include_qa',
+        )
+
+
 class OnboardingQuestionForm(forms.ModelForm):
     """Form for creating/editing onboarding questions"""
     class Meta:
@@ -174,11 +214,9 @@ class DynamicParticipantForm(forms.ModelForm):
         layout_fields = ['first_name', 'last_name', 'email', 'phone']
         
         # Get questions for this event (either custom questions or template questions)
-        questions = event.onboarding_questions.all()
-        if not questions and event.template:
-            questions = event.template.template_questions.all()
+        self.questions = list(event.get_onboarding_questions())
         
-        for question in questions:
+        for question in self.questions:
             field_name = f'question_{question.id}'
             
             if question.question_type == 'multiple_choice':
@@ -231,16 +269,12 @@ class DynamicParticipantForm(forms.ModelForm):
         participant.event = self.event
         
         if commit:
-            participant.save()
-            
-            # Save question responses and denormalize key fields
-            questions = self.event.onboarding_questions.all()
-            if not questions and self.event.template:
-                questions = self.event.template.template_questions.all()
-            
+            # Collect answers and denormalize key fields before the one save
+            from .models import QuestionResponse
+            answers = {}
             denormalized_data = {}
             
-            for question in questions:
+            for question in self.questions:
                 field_name = f'question_{question.id}'
                 if field_name in self.cleaned_data:
                     answer = self.cleaned_data[field_name]
@@ -249,27 +283,48 @@ class DynamicParticipantForm(forms.ModelForm):
                     if isinstance(answer, list):
                         answer = ', '.join(answer)
                     
-                    # Create question response
-                    from .models import QuestionResponse
-                    QuestionResponse.objects.create(
-                        participant=participant,
-                        question=question,
-                        answer=str(answer)
-                    )
+                    answers[question] = str(answer)
                     
                     # Store for denormalization
                     if question.maps_to_field:
                         denormalized_data[question.maps_to_field] = answer
             
-            # Update participant with denormalized data
             for field, value in denormalized_data.items():
                 if hasattr(participant, field):
-                    setattr(participant, field, value)
+                    setattr(participant, field, self._denormalized_value(field, value))
             
+            packed = getattr(settings, 'EVENTS_PACKED_ANSWERS', False)
+            if packed:
+                participant.answers = {str(question.id): answer for question, answer in answers.items()}
             participant.save()
+            # Numeric answers always get a row as well, for SQL aggregation
+            QuestionResponse.objects.bulk_create([
+                QuestionResponse(
+                    participant=participant, question=question, answer=answer,
+                    value=QuestionResponse.parse_value(answer) if question.is_numeric else None,
+                )
+                for question, answer in answers.items()
+                if not packed or question.is_numeric
+            ])
         
         return participant
 
+    def _denormalized_value(self, field, value):
+        """Coerce an answer to fit the participant field it maps to"""
+        if isinstance(value, list):
+            value = ', '.join(value)
+        try:
+            model_field = Participant._meta.get_field(field)
+        except FieldDoesNotExist:
+            return value
+        if isinstance(model_field, models.IntegerField):
+            # Ranges such as "3-5 years" or "8+ years" store their lower bound
+            match = re.search(r'\d+', str(value))
+            return int(match.group()) if match else None
+        if isinstance(model_field, models.CharField) and model_field.max_length:
+            return str(value)[:model_field.max_length]
+        return value
+
 
 class PublicQuestionForm(forms.ModelForm):
     """Form for submitting public questions during events"""
@@ -286,3 +341,11 @@ class PublicQuestionForm(forms.ModelForm):
         self.helper.layout = Layout(
             'question_text'
         )
+
+
+class ChatQueryForm(forms.Form):
+    """Form for asking questions about an event's attendees"""
+    query = forms.CharField(
+        max_length=500,
+        widget=forms.TextInput(attrs={'placeholder': 'e.g. How many people work in FinTech?'})
+    )
@@ -0,0 +1,230 @@
+"""Attendee insight generation.
+
+Every insight type is built from a single streamed pass over an event's
+participants. Each distribution keeps a bounded number of distinct labels, so
+memory stays flat however many people register. Results are stored as JSON in
+``EventInsight.content`` so templates can chart them directly.
+
+Answer statistics for rating and number questions are the exception: they
+are aggregated in the database by ``answers.question_summary``.
+"""
+import json
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .answers import question_summary
+from .caching import bump_event_version
+from .models import Event, EventInsight, OnboardingQuestion
+from .tasks import enqueue
+
+INSIGHTS_VERSION = 2
+
+# Distinct labels kept per distribution before the rarest ones are dropped
+MAX_DISTINCT_LABELS = 2000
+TOP_ITEMS = 25
+
+EXPERIENCE_BUCKETS = [
+    ('0-1 years', 0, 1),
+    ('1-3 years', 1, 3),
+    ('3-5 years', 3, 5),
+    ('5-8 years', 5, 8),
+    ('8+ years', 8, None),
+]
+
+PARTICIPANT_FIELDS = ('skills', 'interests', 'role', 'industry', 'experience_years')
+
+
+class BoundedCounter(Counter):
+    """Counter that sheds its rarest labels once it grows past ``max_labels``"""
+
+    def __init__(self, max_labels=MAX_DISTINCT_LABELS):
+        super().__init__()
+        self.max_labels = max_labels
+        self.dropped = 0
+
+    def add(self, label):
+        self[label] += 1
+        if len(self) > self.max_labels:
+            keep = self.max_labels // 2
+            for rare_label, count in self.most_common()[keep:]:
+                self.dropped += count
+                del self[rare_label]
+
+
+def split_tags(value):
+    """Split a comma-separated profile field into clean labels"""
+    if not value:
+        return []
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
+def experience_bucket(years):
+    if years is None:
+        return None
+    for label, low, high in EXPERIENCE_BUCKETS:
+        if high is None or years < high:
+            return label
+    return EXPERIENCE_BUCKETS[-1][0]
+
+
+def _distribution(counter, total):
+    items = [
+        {'label': label, 'count': count, 'percent': round(100 * count / total, 1) if total else 0}
+        for label, count in counter.most_common(TOP_ITEMS)
+    ]
+    shown = sum(item['count'] for item in items)
+    return {
+        'total': total,
+        'distinct': len(counter),
+        'items': items,
+        'other': sum(counter.values()) - shown + counter.dropped,
+    }
+
+
+def _normalized_entropy(counter):
+    total = sum(counter.values())
+    if total == 0 or len(counter) < 2:
+        return 0.0
+    entropy = -sum((c / total) * math.log(c / total) for c in counter.values() if c)
+    return entropy / math.log(len(counter))
+
+
+def aggregate_participants(rows):
+    """Build every insight payload from one pass over participant rows"""
+    skills = BoundedCounter()
+    interests = BoundedCounter()
+    industries = BoundedCounter()
+    roles = BoundedCounter()
+    experience = Counter()
+    participants = 0
+    experience_total = 0
+    experience_known = 0
+
+    for skill_value, interest_value, role, industry, experience_years in rows:
+        participants += 1
+        for skill in split_tags(skill_value):
+            skills.add(skill)
+        for interest in split_tags(interest_value):
+            interests.add(interest)
+        if industry:
+            industries.add(industry.strip())
+        if role:
+            roles.add(role.strip())
+        bucket = experience_bucket(experience_years)
+        experience[bucket or 'Not specified'] += 1
+        if experience_years is not None:
+            experience_total += experience_years
+            experience_known += 1
+
+    # Interest co-occurrences: for each interest, the pairs of attendees who
+    # both list it. A pair sharing three interests counts three times, so
+    # this is not the number of distinct pairs with something in common,
+    # which a single bounded pass cannot count; overlap is capped at 1.
+    interest_cooccurrences = sum(count * (count - 1) // 2 for count in interests.values())
+    possible_pairs = participants * (participants - 1) // 2
+    overlap = min(1.0, interest_cooccurrences / possible_pairs) if possible_pairs else 0.0
+    industry_diversity = _normalized_entropy(industries)
+    role_diversity = _normalized_entropy(roles)
+
+    bucket_labels = [label for label, _, _ in EXPERIENCE_BUCKETS] + ['Not specified']
+    return {
+        'skill_distribution': _distribution(skills, participants),
+        'industry_spread': _distribution(industries, participants),
+        'experience_levels': {
+            'total': participants,
+            'items': [
+                {
+                    'label': label,
+                    'count': experience[label],
+                    'percent': round(100 * experience[label] / participants, 1) if participants else 0,
+                }
+                for label in bucket_labels
+            ],
+            'average_years': round(experience_total / experience_known, 1) if experience_known else None,
+        },
+        'interests_analysis': _distribution(interests, participants),
+        'networking_potential': {
+            'participants': participants,
+            'interest_cooccurrences': interest_cooccurrences,
+            'interest_overlap': round(overlap, 3),
+            'industry_diversity': round(industry_diversity, 3),
+            'role_diversity': round(role_diversity, 3),
+            'score': round(100 * (overlap + industry_diversity + role_diversity) / 3),
+        },
+    }
+
+
+INSIGHT_TITLES = {
+    'skill_distribution': 'Top skills',
+    'industry_spread': 'Industry spread',
+    'experience_levels': 'Experience levels',
+    'interests_analysis': 'Shared interests',
+    'networking_potential': 'Networking potential',
+    'answer_statistics': 'Rating and number answers',
+}
+
+
+def generate_event_insights(event, chunk_size=2000):
+    """Regenerate all insights for ``event`` from its active participants"""
+    rows = (
+        event.participants
+        .exclude(status='cancelled')
+        .order_by()
+        .values_list(*PARTICIPANT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    payloads = aggregate_participants(rows)
+    numeric_questions = event.onboarding_questions.filter(question_type__in=OnboardingQuestion.NUMERIC_TYPES)
+    if numeric_questions:
+        payloads['answer_statistics'] = {
+            'questions': [question_summary(question) for question in numeric_questions],
+        }
+
+    insights = [
+        EventInsight(
+            event=event,
+            insight_type=insight_type,
+            title=INSIGHT_TITLES[insight_type],
+            content=json.dumps({'version': INSIGHTS_VERSION, **payload}),
+        )
+        for insight_type, payload in payloads.items()
+    ]
+    with transaction.atomic():
+        event.insights.all().delete()
+        EventInsight.objects.bulk_create(insights)
+        bump_event_version(event.pk)
+    return insights
+
+
+def generate_insights_for_event_id(event_id):
+    event = Event.objects.filter(pk=event_id).first()
+    if event is not None:
+        generate_event_insights(event)
+
+
+def schedule_event_insights(event_id, force=False):
+    """Regenerate insights in the background after a batch of registrations.
+
+    The first registration and then every ``EVENTS_INSIGHTS_BATCH_SIZE``
+    registrations trigger a run, so hosts see numbers move during signup
+    without paying for a full pass on every request.
+    """
+    batch_size = getattr(settings, 'EVENTS_INSIGHTS_BATCH_SIZE', 25)
+    counter_key = f'insights:registrations:{event_id}'
+    if not force:
+        cache.add(counter_key, 0, timeout=None)
+        try:
+            registrations = cache.incr(counter_key)
+        except ValueError:
+            registrations = 1
+        if registrations != 1 and registrations % batch_size:
+            return False
+    enqueue(
+        generate_insights_for_event_id, args=[event_id], queue='insights',
+        dedup_key=f'insights:{event_id}', event_id=event_id,
+    )
+    return True
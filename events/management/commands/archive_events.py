@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from events.archive import archive_event, purge_event
+from events.models import Event, EventArchive
+
+
+class Command(BaseCommand):
+    help = 'Archive completed events to compressed files and purge their rows in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Archive one completed event',
+        )
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=90,
+            help='Archive completed events that took place more than this many days ago',
+        )
+        parser.add_argument(
+            '--no-purge',
+            action='store_true',
+            help='Write the archives but keep the rows',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows deleted per transaction (default: EVENTS_PURGE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            help='Seconds to wait between batches (default: EVENTS_PURGE_PAUSE)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the events that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        if options['event_id']:
+            events = Event.objects.filter(pk=options['event_id'])
+            if not events.exists():
+                raise CommandError(f'Event {options["event_id"]} does not exist')
+            if events.exclude(status='completed').exists():
+                raise CommandError('Only completed events can be archived')
+        else:
+            cutoff = timezone.now() - timedelta(days=options['older_than'])
+            events = Event.objects.filter(status='completed', date__lt=cutoff)
+        # Archives a crashed run left unfinished are written again
+        events = events.filter(Q(archive__isnull=True) | Q(archive__status='archiving')).order_by('date')
+        # Purges that were interrupted are finished first
+        unfinished = EventArchive.objects.none() if options['no_purge'] else EventArchive.objects.filter(
+            status__in=['archived', 'purging']
+        )
+        if options['event_id']:
+            unfinished = unfinished.filter(original_event_id=options['event_id'])
+
+        if options['dry_run']:
+            for archive in unfinished:
+                self.stdout.write(f'Would finish purging "{archive.event_title}" ({archive.original_event_id})')
+            for event in events:
+                self.stdout.write(f'Would archive "{event.title}" ({event.pk}, {event.date:%Y-%m-%d})')
+            return
+
+        purged = 0
+        for archive in unfinished:
+            self.stdout.write(f'Resuming purge of "{archive.event_title}" ({archive.original_event_id})')
+            self.purge(archive, options)
+            purged += 1
+
+        archived = 0
+        for event in events.iterator():
+            self.stdout.write(f'Archiving "{event.title}" ({event.pk})')
+            archive = archive_event(event, progress=self.report)
+            self.stdout.write(f'  wrote {archive.archive_file.name} ({archive.size_bytes // 1024} KB)')
+            archived += 1
+            if not options['no_purge']:
+                self.purge(archive, options)
+                purged += 1
+
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Archived {archived} events, purged {purged}.'))
+
+    def purge(self, archive, options):
+        purge_event(archive, batch_size=options['batch_size'], pause=options['pause'], progress=self.report)
+        self.stdout.write(f'  purged {sum(archive.deleted_counts.values())} rows')
+
+    def report(self, action, label, count):
+        self.stdout.write(f'  {action} {count} {label} rows')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from events.answers import DEFAULT_CHUNK_SIZE, backfill_values
+from events.models import OnboardingQuestion
+
+
+class Command(BaseCommand):
+    help = 'Store the parsed number of every answer to rating and number questions for aggregation in SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help="Only backfill this event's questions",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Answers updated per transaction',
+        )
+
+    def handle(self, *args, **options):
+        questions = OnboardingQuestion.objects.filter(event__isnull=False)
+        if options['event_id']:
+            questions = questions.filter(event_id=options['event_id'])
+
+        def progress(step, rows):
+            self.stdout.write(f'  {rows} answers written ({step})')
+
+        rows = backfill_values(questions, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Stored values for {rows} answers.'))
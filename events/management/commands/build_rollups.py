@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from events.models import Event
+from events.rollups import build_event_rollup
+
+
+class Command(BaseCommand):
+    help = 'Build analytics rollups for completed events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Build the rollup for a specific event ID',
+        )
+        parser.add_argument(
+            '--host-id',
+            type=int,
+            help='Build rollups for every completed event of a host',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only build rollups for events that do not have one yet',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(status='completed').order_by('date')
+        if options['event_id']:
+            events = Event.objects.filter(pk=options['event_id'])
+        if options['host_id']:
+            events = events.filter(host_id=options['host_id'])
+        if options['missing']:
+            events = events.filter(rollup__isnull=True)
+
+        count = 0
+        for event in events.iterator():
+            build_event_rollup(event)
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Completed! Built rollups for {count} events.')
+        )
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from events.cloning import MAX_SERIES_LENGTH, clone_event, series_dates
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Copy an event, or create a recurring series from it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int, help='Event to copy')
+        parser.add_argument(
+            '--date',
+            help='Date of the first copy, e.g. 2025-06-05T18:30 (default: one interval after the event)',
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=1,
+            help=f'Number of events to create (at most {MAX_SERIES_LENGTH})',
+        )
+        parser.add_argument(
+            '--interval-days',
+            type=int,
+            default=7,
+            help='Days between events in a series',
+        )
+        parser.add_argument('--title', help='Title for the copies (default: the same title)')
+        parser.add_argument(
+            '--include-qa',
+            action='store_true',
+            help='Also copy Q&A questions the host added',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event_id"]} does not exist')
+        if not 1 <= options['count'] <= MAX_SERIES_LENGTH:
+            raise CommandError(f'--count must be between 1 and {MAX_SERIES_LENGTH}')
+
+        interval = timedelta(days=options['interval_days'])
+        if options['date']:
+            start = parse_datetime(options['date'])
+            if start is None:
+                raise CommandError(f'Invalid date: {options["date"]}')
+            if timezone.is_naive(start):
+                start = timezone.make_aware(start)
+        else:
+            start = event.date + interval
+
+        clones = clone_event(
+            event, series_dates(start, options['count'], interval),
+            title=options['title'], include_qa=options['include_qa'],
+        )
+        first, last = clones[0], clones[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'\nCompleted! Created {len(clones)} draft events (ids {first.pk}-{last.pk}), '
+            f'{first.date:%Y-%m-%d} to {last.date:%Y-%m-%d}.'
+        ))
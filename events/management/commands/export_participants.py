@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from events.exports import EXPORT_FORMATS, export_participants
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Export every registrant of an event with one column per onboarding question'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int, help='Event to export')
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip-compress the output',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (defaults to stdout)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of participants fetched per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event with ID {options["event_id"]} not found')
+
+        chunks = export_participants(
+            event, options['format'], compress=options['gzip'], chunk_size=options['chunk_size']
+        )
+        if options['output']:
+            mode = 'wb' if options['gzip'] else 'w'
+            encoding = None if options['gzip'] else 'utf-8'
+            with open(options['output'], mode, encoding=encoding, newline='' if encoding else None) as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'Exported participants to {options["output"]}'))
+        else:
+            output = sys.stdout.buffer if options['gzip'] else sys.stdout
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
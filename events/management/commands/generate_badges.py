@@ -0,0 +1,64 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from events.badges import BADGE_FORMATS, write_badges
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Write printable name badges with check-in QR codes for an event'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int, help='Event to print badges for')
+        parser.add_argument(
+            '--format',
+            choices=BADGE_FORMATS,
+            default='pdf',
+            help='A multi-page PDF or a directory of PNG sheets',
+        )
+        parser.add_argument(
+            '--output',
+            help='PDF file or PNG directory (default: badges-<event id>.pdf or badges-<event id>/)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for rendering QR codes',
+        )
+        parser.add_argument(
+            '--include-waitlisted',
+            action='store_true',
+            help='Also print badges for waitlisted participants',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Public base URL encoded in the codes (default: EVENTS_PUBLIC_BASE_URL)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event with ID {options["event_id"]} not found')
+
+        badge_format = options['format']
+        output = options['output'] or (
+            f'badges-{event.pk}.pdf' if badge_format == 'pdf' else f'badges-{event.pk}'
+        )
+        statuses = ('registered', 'waitlisted') if options['include_waitlisted'] else ('registered',)
+
+        def progress(pages):
+            if pages % 25 == 0:
+                self.stdout.write(f'  wrote {pages} pages')
+
+        pages = write_badges(
+            event, output, badge_format, workers=options['workers'], statuses=statuses,
+            base_url=options['base_url'], progress=progress,
+        )
+        if not pages:
+            self.stdout.write(self.style.WARNING(f'No participants to print badges for in {event.title}'))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompleted! Wrote {pages} pages of badges for {event.title} to {output}')
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from events.insights import generate_event_insights
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Generate attendee insights for events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Generate insights for a specific event ID',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of participants fetched per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        if options['event_id']:
+            events = Event.objects.filter(pk=options['event_id'])
+            if not events.exists():
+                self.stdout.write(
+                    self.style.ERROR(f'Event with ID {options["event_id"]} not found')
+                )
+                return
+        else:
+            events = Event.objects.filter(status__in=['published', 'ongoing'])
+            self.stdout.write('Generating insights for published and ongoing events...')
+
+        count = 0
+        for event in events.iterator():
+            generate_event_insights(event, chunk_size=options['chunk_size'])
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Completed! Generated insights for {count} events.')
+        )
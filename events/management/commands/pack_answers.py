@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from events.answers import DEFAULT_CHUNK_SIZE, pack_answers, unpack_answers
+from events.models import Participant
+
+
+class Command(BaseCommand):
+    help = "Move onboarding answers into participants' packed answers column (or back with --unpack)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Only convert participants of this event',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Participants converted per transaction',
+        )
+        parser.add_argument(
+            '--unpack',
+            action='store_true',
+            help='Write packed answers back out as QuestionResponse rows',
+        )
+
+    def handle(self, *args, **options):
+        participants = Participant.objects.all()
+        if options['event_id']:
+            participants = participants.filter(event_id=options['event_id'])
+
+        def progress(last_pk, rows):
+            self.stdout.write(f'  {rows} answers converted (up to participant {last_pk})')
+
+        if options['unpack']:
+            rows = unpack_answers(participants, options['chunk_size'], progress)
+            self.stdout.write(self.style.SUCCESS(f'\nCompleted! Wrote {rows} QuestionResponse rows.'))
+        else:
+            rows = pack_answers(participants, options['chunk_size'], progress)
+            self.stdout.write(self.style.SUCCESS(f'\nCompleted! Packed {rows} QuestionResponse rows.'))
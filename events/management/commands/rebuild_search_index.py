@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text index used by the public event search'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompleted! Rebuilt the search index with {type(backend).__name__}.')
+        )
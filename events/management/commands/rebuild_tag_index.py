@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.models import Participant, ParticipantTag
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the normalized skill and interest tag index used for attendee filtering'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Rebuild tags for a specific event ID',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Participants processed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        participants = Participant.objects.only('event_id', 'skills', 'interests').order_by('pk')
+        if options['event_id']:
+            participants = participants.filter(event_id=options['event_id'])
+
+        batch_size = options['batch_size']
+        last_pk = 0
+        rebuilt = 0
+        tags = 0
+
+        while True:
+            batch = list(participants.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            rows = [tag for participant in batch for tag in participant.build_tags()]
+            with transaction.atomic():
+                ParticipantTag.objects.filter(participant__in=batch).delete()
+                ParticipantTag.objects.bulk_create(rows)
+            last_pk = batch[-1].pk
+            rebuilt += len(batch)
+            tags += len(rows)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompleted! Rebuilt {tags} tags for {rebuilt} participants.')
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from events.models import Event, EventStats
+
+
+class Command(BaseCommand):
+    help = 'Recount precomputed event statistics and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event-id',
+            type=int,
+            help='Reconcile stats for a specific event ID',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.select_related('stats').order_by('pk')
+        if options['event_id']:
+            events = events.filter(pk=options['event_id'])
+            if not events.exists():
+                self.stdout.write(
+                    self.style.ERROR(f'Event with ID {options["event_id"]} not found')
+                )
+                return
+
+        fields = list(EventStats.STATUS_FIELDS.values()) + ['question_count', 'vote_count']
+        checked = 0
+        repaired = 0
+
+        for event in events.iterator(chunk_size=500):
+            try:
+                before = {field: getattr(event.stats, field) for field in fields}
+            except EventStats.DoesNotExist:
+                before = None
+            stats = EventStats.rebuild(event.pk)
+            after = {field: getattr(stats, field) for field in fields}
+            checked += 1
+            if before != after:
+                repaired += 1
+                self.stdout.write(f'Repaired stats for: {event.title}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompleted! Checked {checked} events, repaired {repaired}.')
+        )
@@ -1,61 +1,161 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
 from events.models import Event
+from events.qr import payload_hash, public_base_url, qr_code_name, registration_url, render_qr_png, save_qr_png
 
 
 class Command(BaseCommand):
-    help = 'Regenerate QR codes for events that are missing them'
+    help = 'Regenerate QR codes for events whose stored code is missing or encodes an out-of-date URL'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--all',
             action='store_true',
-            help='Regenerate QR codes for all events (not just missing ones)',
+            help='Also check that the stored image of every up-to-date event still exists',
         )
         parser.add_argument(
             '--event-id',
             type=int,
             help='Regenerate QR code for a specific event ID',
         )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render images even when the stored code already matches',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without rendering or saving anything',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for rendering (1 renders in this process)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Events rendered and saved per batch; finished batches survive an interruption',
+        )
 
     def handle(self, *args, **options):
+        # Only the setting: events are checked against it on every save, and a
+        # code for any other URL would be pending, and re-rendered, straight away
+        base_url = public_base_url()
+        events = Event.objects.order_by('pk')
         if options['event_id']:
-            # Regenerate for specific event
-            try:
-                event = Event.objects.get(pk=options['event_id'])
-                event.generate_qr_code()
-                self.stdout.write(
-                    self.style.SUCCESS(f'Successfully regenerated QR code for event: {event.title}')
-                )
-            except Event.DoesNotExist:
+            events = events.filter(pk=options['event_id'])
+            if not events.exists():
                 self.stdout.write(
                     self.style.ERROR(f'Event with ID {options["event_id"]} not found')
                 )
-            return
+                return
 
-        # Get events that need QR codes
-        if options['all']:
-            events = Event.objects.all()
-            self.stdout.write('Regenerating QR codes for all events...')
-        else:
-            events = Event.objects.filter(qr_code='')
-            self.stdout.write('Regenerating QR codes for events missing QR codes...')
-
-        count = 0
-        errors = 0
-
-        for event in events:
-            try:
-                event.generate_qr_code()
-                count += 1
-                self.stdout.write(f'✓ Generated QR code for: {event.title}')
-            except Exception as e:
-                errors += 1
-                self.stdout.write(
-                    self.style.ERROR(f'✗ Failed to generate QR code for {event.title}: {e}')
+        self.stdout.write(f'Checking QR codes against {base_url} ...')
+        started = time.monotonic()
+        totals = {'checked': 0, 'up_to_date': 0, 'rendered': 0, 'reused': 0, 'updated': 0, 'errors': 0}
+
+        # event id -> (digest, payload) for every event whose stored code is stale.
+        # The digest covers the URL, so a new base URL makes every code stale.
+        stale = {}
+        rows = events.values_list('pk', 'qr_code', 'qr_code_hash').iterator(chunk_size=options['batch_size'])
+        for pk, stored_name, stored_hash in rows:
+            totals['checked'] += 1
+            payload = registration_url(pk, base_url)
+            digest = payload_hash(payload)
+            if not options['force'] and stored_hash == digest and stored_name and (
+                not options['all'] or default_storage.exists(stored_name)
+            ):
+                totals['up_to_date'] += 1
+                continue
+            stale[pk] = (digest, payload)
+
+        if options['dry_run']:
+            digests = {digest for digest, _ in stale.values()}
+            to_render = digests if options['force'] else {
+                digest for digest in digests if not default_storage.exists(qr_code_name(digest))
+            }
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'\nDry run: {totals["checked"]} checked, {totals["up_to_date"]} up to date, '
+                    f'{len(stale)} to update, {len(to_render)} images to render, '
+                    f'{len(digests) - len(to_render)} reused.'
                 )
+            )
+            return
 
+        batch_size = options['batch_size']
+        executor = ProcessPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        # digest -> stored name, for every image written or found during this run
+        stored = {}
+        items = list(stale.items())
+        try:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                self.store_images([value for _, value in batch], stored, executor, options, totals)
+                # Saved per batch, so an interrupted run keeps its progress
+                updates = [
+                    Event(pk=pk, qr_code=stored[digest], qr_code_hash=digest)
+                    for pk, (digest, _) in batch
+                    if digest in stored
+                ]
+                Event.objects.bulk_update(updates, ['qr_code', 'qr_code_hash'])
+                totals['updated'] += len(updates)
+                self.stdout.write(f'  {start + len(batch)}/{len(items)} events processed')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.monotonic() - started
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nCompleted! Generated QR codes for {count} events. {errors} errors.'
+                f'\nCompleted in {elapsed:.1f}s! {totals["checked"]} checked, {totals["up_to_date"]} up to date, '
+                f'{totals["updated"]} updated, {totals["rendered"]} rendered, {totals["reused"]} reused. '
+                f'{totals["errors"]} errors.'
             )
         )
+
+    def store_images(self, batch, stored, executor, options, totals):
+        """Render and store the images ``batch`` needs that this run has not stored yet"""
+        to_render = {}
+        for digest, payload in batch:
+            if digest in stored or digest in to_render:
+                continue
+            name = qr_code_name(digest)
+            # Identical payloads share one content-addressed image
+            if not options['force'] and default_storage.exists(name):
+                stored[digest] = name
+                totals['reused'] += 1
+            else:
+                to_render[digest] = payload
+        if not to_render:
+            return
+
+        payloads = list(to_render.values())
+        if executor is not None:
+            chunksize = max(1, min(64, len(payloads) // options['workers']))
+            images = executor.map(_render, payloads, chunksize=chunksize)
+        else:
+            images = map(_render, payloads)
+        for digest, (image, error) in zip(to_render, images):
+            if error:
+                totals['errors'] += 1
+                self.stdout.write(self.style.ERROR(f'✗ Failed to render {to_render[digest]}: {error}'))
+                continue
+            # Swapped in over any current file, which stays readable meanwhile
+            stored[digest] = save_qr_png(digest, image)
+            totals['rendered'] += 1
+
+
+def _render(payload):
+    try:
+        return render_qr_png(payload), None
+    except Exception as e:
+        return None, str(e)
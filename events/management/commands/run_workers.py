@@ -0,0 +1,105 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from events.tasks import get_queues, prune_finished_jobs, requeue_stale_jobs, work
+
+SUPERVISOR_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs: one worker process per slot in EVENTS_JOB_QUEUES'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues',
+            help='Comma-separated queues to serve (default: every configured queue)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every due job in this process, then exit',
+        )
+        parser.add_argument(
+            '--worker',
+            action='store_true',
+            help='Run a single worker loop in this process (used by the supervisor)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when no job is due',
+        )
+
+    def handle(self, *args, **options):
+        configured = get_queues()
+        queues = options['queues'].split(',') if options['queues'] else list(configured)
+        unknown = set(queues) - set(configured)
+        if unknown:
+            raise CommandError(f'Unknown queues: {", ".join(sorted(unknown))}')
+
+        if options['once']:
+            requeue_stale_jobs()
+            processed = work(queues, once=True)
+            self.stdout.write(self.style.SUCCESS(f'\nCompleted! Ran {processed} jobs from {", ".join(queues)}.'))
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options['worker']:
+            work(queues, poll_interval=options['poll_interval'], stop=lambda: self.stopping)
+            return
+
+        self.supervise({queue: configured[queue] for queue in queues}, options['poll_interval'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def spawn(self, queue, poll_interval):
+        # Not sys.argv[0]: that is django-admin or a module path under python -m
+        command = [
+            sys.executable, '-m', 'django', 'run_workers', '--worker',
+            '--queues', queue, '--poll-interval', str(poll_interval),
+        ]
+        path = [str(settings.BASE_DIR)] + [entry for entry in [os.environ.get('PYTHONPATH')] if entry]
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, PYTHONPATH=os.pathsep.join(path),
+        )
+        return subprocess.Popen(command, env=env)
+
+    def supervise(self, concurrency, poll_interval):
+        """Keep ``concurrency[queue]`` worker processes running for each queue"""
+        slots = [queue for queue, count in concurrency.items() for _ in range(count)]
+        self.stdout.write(f'Starting {len(slots)} workers: ' + ', '.join(
+            f'{queue} x{count}' for queue, count in concurrency.items()
+        ))
+        workers = [self.spawn(queue, poll_interval) for queue in slots]
+        last_maintenance = 0
+        try:
+            while not self.stopping:
+                if time.monotonic() - last_maintenance > SUPERVISOR_INTERVAL:
+                    requeued = requeue_stale_jobs()
+                    pruned = prune_finished_jobs()
+                    if requeued or pruned:
+                        self.stdout.write(f'  requeued {requeued} stale jobs, pruned {pruned} finished jobs')
+                    last_maintenance = time.monotonic()
+                for index, process in enumerate(workers):
+                    if process.poll() is not None:
+                        self.stdout.write(self.style.WARNING(
+                            f'Worker for {slots[index]} exited with {process.returncode}; restarting'
+                        ))
+                        workers[index] = self.spawn(slots[index], poll_interval)
+                time.sleep(1)
+        finally:
+            for process in workers:
+                process.terminate()
+            for process in workers:
+                process.wait()
+        self.stdout.write(self.style.SUCCESS('\nCompleted! All workers stopped.'))
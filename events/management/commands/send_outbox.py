@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from events.models import Event, OutboundEmail
+from events.outbox import drain_outbox, queue_event_reminders
+
+
+class Command(BaseCommand):
+    help = 'Send every due email in the outbox now, without waiting for the email worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reminders',
+            type=int,
+            metavar='EVENT_ID',
+            help='First queue a reminder for every registered attendee of this event',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Messages sent per batch (default: EVENTS_EMAIL_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        if options['reminders']:
+            if not Event.objects.filter(pk=options['reminders']).exists():
+                raise CommandError(f'Event {options["reminders"]} does not exist')
+            queued = queue_event_reminders(options['reminders'])
+            self.stdout.write(f'Queued {queued} reminders')
+
+        totals = Counter()
+        while True:
+            counts = drain_outbox(batch_size=options['batch_size'])
+            totals.update(counts)
+            if counts:
+                self.stdout.write(
+                    '  ' + ', '.join(f'{outcome} {count}' for outcome, count in sorted(counts.items()))
+                )
+            # Stop once only throttled or backed-off messages are left
+            if not counts.get('sent') and not counts.get('retried') and not counts.get('failed'):
+                break
+
+        waiting = OutboundEmail.objects.filter(status='pending').count()
+        self.stdout.write(self.style.SUCCESS(
+            f'\nCompleted! Sent {totals["sent"]} emails, {totals["failed"]} failed, {waiting} still waiting.'
+        ))
@@ -0,0 +1,337 @@
+"""Per-request performance instrumentation.
+
+``PerformanceMiddleware`` measures every request: database query count and
+time (through a connection execute wrapper), template render time (through
+``TimedDjangoTemplates``), page and answer cache hits and misses, and total
+wall time. The figures go into in-process counters and histograms labelled
+with the resolved URL name, which the ``metrics`` view renders in the
+Prometheus text format, and, when ``EVENTS_SERVER_TIMING`` is on (by
+default only with ``DEBUG``), into a ``Server-Timing`` header.
+
+Streaming responses run most of their queries while the body is sent,
+after the headers have gone out. They are measured until the stream ends
+and get no ``Server-Timing`` header, which could only show part of them.
+
+The current request's figures live in a context variable, so they stay
+separate under threaded WSGI and under ASGI. Each thread records into its
+own shard of the histograms, so recording never takes a lock; the shards
+are only summed when the endpoint is scraped.
+"""
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+from django.template.backends.django import DjangoTemplates
+
+from .ratelimit import get_metrics as get_rate_limit_metrics
+
+# Request duration buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Queries per request buckets
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+UNRESOLVED_VIEW = 'unresolved'
+
+
+class RequestMetrics:
+    """Figures collected while one request is handled"""
+    __slots__ = ('queries', 'db_time', 'template_time', 'template_depth', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_current = ContextVar('eventm_request_metrics', default=None)
+
+
+def current_metrics():
+    return _current.get()
+
+
+def record_cache(hits=0, misses=0):
+    """Count cache lookups against the current request, if any"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+class TimedTemplate:
+    """Template wrapper that adds render time to the current request"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.template_depth:
+            # Nested renders are already inside the outer render's time
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times recorded per request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class MetricShard:
+    """One thread's counters and histograms"""
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            # One count per bucket, then +Inf, sum and count
+            histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[len(buckets)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def merge(self, other):
+        """Add ``other``'s counts to this shard"""
+        for key, value in other.counters.copy().items():
+            self.counters[key] += value
+        for key, values in other.histograms.copy().items():
+            total = self.histograms.get(key)
+            self.histograms[key] = list(values) if total is None else [a + b for a, b in zip(total, values)]
+
+    def clear(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+
+class _ShardOwner:
+    """Held only by a thread's local storage, so it is freed when the thread ends"""
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class MetricsRegistry:
+    """Per-thread shards that are summed when read
+
+    A thread's shard is folded into a retired total when the thread ends, so
+    servers that start a thread per request keep a bounded list of shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = MetricShard()
+        self._lock = threading.RLock()
+
+    def shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = _ShardOwner(MetricShard())
+            with self._lock:
+                self._shards.append(owner.shard)
+            weakref.finalize(owner, self._retire, owner.shard)
+        return owner.shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards.remove(shard)
+            self._retired.merge(shard)
+
+    def snapshot(self):
+        """Summed ``(counters, histograms)`` across every shard"""
+        total = MetricShard()
+        with self._lock:
+            shards = list(self._shards)
+            total.merge(self._retired)
+        for shard in shards:
+            total.merge(shard)
+        return total.counters, total.histograms
+
+    def reset(self):
+        with self._lock:
+            self._retired.clear()
+            for shard in self._shards:
+                shard.clear()
+
+
+registry = MetricsRegistry()
+
+
+def record_request(view, status_code, duration, metrics):
+    shard = registry.shard()
+    labels = (('view', view),)
+    shard.counters[('eventm_http_requests_total', labels + (('status', f'{status_code // 100}xx'),))] += 1
+    shard.counters[('eventm_db_queries_total', labels)] += metrics.queries
+    shard.counters[('eventm_db_query_seconds_total', labels)] += metrics.db_time
+    shard.counters[('eventm_template_render_seconds_total', labels)] += metrics.template_time
+    shard.counters[('eventm_cache_requests_total', labels + (('result', 'hit'),))] += metrics.cache_hits
+    shard.counters[('eventm_cache_requests_total', labels + (('result', 'miss'),))] += metrics.cache_misses
+    shard.observe('eventm_http_request_duration_seconds', labels, duration, DURATION_BUCKETS)
+    shard.observe('eventm_http_request_queries', labels, metrics.queries, QUERY_BUCKETS)
+
+
+def server_timing(duration, metrics):
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+        f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNRESOLVED_VIEW
+    return match.view_name
+
+
+@contextmanager
+def measuring(metrics):
+    """Count queries and renders in this block against ``metrics``"""
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_record_query))
+            yield
+    finally:
+        _current.reset(token)
+
+
+def _measure_stream(content, metrics, request, status_code, start):
+    """Yield ``content``, measuring each chunk, and record the request once it ends"""
+    iterator = iter(content)
+    try:
+        while True:
+            with measuring(metrics):
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        record_request(view_name(request), status_code, time.perf_counter() - start, metrics)
+
+
+class PerformanceMiddleware:
+    """Time each request and record it under its URL name; keep this first"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+        with measuring(metrics):
+            response = self.get_response(request)
+        # Files are sent without queries, and possibly by the server itself
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = _measure_stream(
+                response.streaming_content, metrics, request, response.status_code, start,
+            )
+            return response
+        duration = time.perf_counter() - start
+        record_request(view_name(request), response.status_code, duration, metrics)
+        if getattr(settings, 'EVENTS_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = server_timing(duration, metrics)
+        return response
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+METRIC_HELP = {
+    'eventm_http_requests_total': ('counter', 'Requests handled, by URL name and status class'),
+    'eventm_db_queries_total': ('counter', 'Database queries run while handling requests'),
+    'eventm_db_query_seconds_total': ('counter', 'Time spent in database queries'),
+    'eventm_template_render_seconds_total': ('counter', 'Time spent rendering templates'),
+    'eventm_cache_requests_total': ('counter', 'Page and answer cache lookups, by result'),
+    'eventm_http_request_duration_seconds': ('histogram', 'Request wall time'),
+    'eventm_http_request_queries': ('histogram', 'Database queries per request'),
+    'eventm_ratelimit_allowed_total': ('counter', 'Requests the rate limiter let through'),
+    'eventm_ratelimit_shed_total': ('counter', 'Requests the rate limiter shed, by scope'),
+}
+HISTOGRAM_BUCKETS = {
+    'eventm_http_request_duration_seconds': DURATION_BUCKETS,
+    'eventm_http_request_queries': QUERY_BUCKETS,
+}
+
+
+def render_prometheus():
+    """Every metric of this process in the Prometheus text exposition format"""
+    counters, histograms = registry.snapshot()
+    for endpoint, counts in get_rate_limit_metrics().items():
+        counters[('eventm_ratelimit_allowed_total', (('endpoint', endpoint),))] += counts['allowed']
+        for scope, count in counts['shed'].items():
+            counters[('eventm_ratelimit_shed_total', (('endpoint', endpoint), ('scope', scope)))] += count
+
+    samples = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        samples[name].append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for (name, labels), values in sorted(histograms.items()):
+        buckets = HISTOGRAM_BUCKETS[name]
+        for bound, count in zip(buckets + ('+Inf',), values):
+            samples[name].append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {count}')
+        samples[name].append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-2])}')
+        samples[name].append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+
+    lines = []
+    for name, (metric_type, help_text) in METRIC_HELP.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(samples.get(name, []))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_event_stats(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventStats = apps.get_model('events', 'EventStats')
+    Participant = apps.get_model('events', 'Participant')
+    PublicQuestion = apps.get_model('events', 'PublicQuestion')
+    QuestionVote = apps.get_model('events', 'QuestionVote')
+    for event_id in Event.objects.values_list('id', flat=True).iterator():
+        counts = Participant.objects.filter(event_id=event_id).aggregate(
+            registered_count=Count('id', filter=Q(status='registered')),
+            waitlisted_count=Count('id', filter=Q(status='waitlisted')),
+            cancelled_count=Count('id', filter=Q(status='cancelled')),
+            attended_count=Count('id', filter=Q(status='attended')),
+            last_registration_at=Max('registered_at'),
+        )
+        EventStats.objects.create(
+            event_id=event_id,
+            question_count=PublicQuestion.objects.filter(event_id=event_id).count(),
+            vote_count=QuestionVote.objects.filter(question__event_id=event_id).count(),
+            **counts
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_alter_onboardingquestion_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registered_count', models.IntegerField(default=0)),
+                ('waitlisted_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('attended_count', models.IntegerField(default=0)),
+                ('question_count', models.IntegerField(default=0)),
+                ('vote_count', models.IntegerField(default=0)),
+                ('last_registration_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='events.event')),
+            ],
+            options={
+                'verbose_name_plural': 'event stats',
+            },
+        ),
+        migrations.RunPython(backfill_event_stats, migrations.RunPython.noop),
+    ]
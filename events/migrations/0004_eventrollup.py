@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_eventstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_title', models.CharField(max_length=255)),
+                ('event_date', models.DateTimeField()),
+                ('registered_count', models.IntegerField(default=0)),
+                ('waitlisted_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('attended_count', models.IntegerField(default=0)),
+                ('returning_count', models.IntegerField(default=0, help_text='Attendees seen at an earlier event of this host')),
+                ('top_skills', models.JSONField(blank=True, default=dict)),
+                ('top_industries', models.JSONField(blank=True, default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('event', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rollup', to='events.event')),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_rollups', to='events.host')),
+            ],
+            options={
+                'ordering': ['event_date'],
+                'indexes': [models.Index(fields=['host', 'event_date'], name='events_even_host_id_642070_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_participant_tags(apps, schema_editor):
+    Participant = apps.get_model('events', 'Participant')
+    ParticipantTag = apps.get_model('events', 'ParticipantTag')
+    batch = []
+    participants = Participant.objects.exclude(skills='', interests='').only(
+        'id', 'event_id', 'skills', 'interests'
+    )
+    for participant in participants.iterator(chunk_size=2000):
+        seen = set()
+        for kind, raw in (('skill', participant.skills), ('interest', participant.interests)):
+            for label in (raw or '').split(','):
+                label = label.strip()
+                value = ' '.join(label.split()).casefold()
+                if value and (kind, value) not in seen:
+                    seen.add((kind, value))
+                    batch.append(ParticipantTag(
+                        event_id=participant.event_id, participant_id=participant.id,
+                        kind=kind, value=value[:128], label=label[:128],
+                    ))
+        if len(batch) >= 2000:
+            ParticipantTag.objects.bulk_create(batch)
+            batch = []
+    ParticipantTag.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_eventrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('skill', 'Skill'), ('interest', 'Interest')], max_length=20)),
+                ('value', models.CharField(max_length=128)),
+                ('label', models.CharField(max_length=128)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participant_tags', to='events.event')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='events.participant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', 'kind', 'value'], name='events_part_event_i_bf6217_idx')],
+                'unique_together': {('participant', 'kind', 'value')},
+            },
+        ),
+        migrations.RunPython(backfill_participant_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'CREATE VIRTUAL TABLE IF NOT EXISTS events_event_fts '
+                    "USING fts5(title, description, location, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except Exception:
+                # SQLite built without FTS5: search falls back to substring matching
+                return
+            cursor.execute(
+                'INSERT INTO events_event_fts (rowid, title, description, location) '
+                'SELECT id, title, description, location FROM events_event'
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'ALTER TABLE events_event ADD FULLTEXT INDEX events_event_fulltext (title, description, location)'
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('DROP TABLE IF EXISTS events_event_fts')
+        elif connection.vendor == 'mysql':
+            cursor.execute('ALTER TABLE events_event DROP INDEX events_event_fulltext')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_participanttag'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
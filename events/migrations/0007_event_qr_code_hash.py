@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='qr_code_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_qr_code_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'date'], name='event_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['event', 'status'], name='participant_event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['event', '-registered_at'], name='participant_event_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participantmatch',
+            index=models.Index(fields=['event', 'participant1', '-match_score'], name='match_event_p1_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicquestion',
+            index=models.Index(fields=['event', '-votes', '-created_at'], name='question_event_ranking_idx'),
+        ),
+    ]
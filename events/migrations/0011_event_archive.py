@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_event_id', models.IntegerField(unique=True)),
+                ('event_title', models.CharField(max_length=255)),
+                ('event_date', models.DateTimeField()),
+                ('archive_file', models.FileField(upload_to='archives/')),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('row_counts', models.JSONField(blank=True, default=dict)),
+                ('deleted_counts', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('archived', 'Archived'), ('purging', 'Purging'), ('purged', 'Purged')], default='archived', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('purged_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archive', to='events.event')),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_archives', to='events.host')),
+            ],
+            options={
+                'ordering': ['-event_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_event_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='answers',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
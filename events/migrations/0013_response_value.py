@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_participant_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionresponse',
+            name='value',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='eventinsight',
+            name='insight_type',
+            field=models.CharField(choices=[('skill_distribution', 'Skill Distribution'), ('industry_spread', 'Industry Spread'), ('experience_levels', 'Experience Levels'), ('interests_analysis', 'Interests Analysis'), ('networking_potential', 'Networking Potential'), ('answer_statistics', 'Answer Statistics')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='questionresponse',
+            index=models.Index(fields=['question', 'value'], name='response_question_value_idx'),
+        ),
+    ]
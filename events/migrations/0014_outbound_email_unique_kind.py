@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:13
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_emails(apps, schema_editor):
+    """Keep the first email of each kind per attendee, so the constraint can be added"""
+    OutboundEmail = apps.get_model('events', 'OutboundEmail')
+    duplicated = (
+        OutboundEmail.objects.filter(participant__isnull=False)
+        .values('event_id', 'participant_id', 'kind')
+        .annotate(count=Count('id'), first=Min('id'))
+        .filter(count__gt=1)
+    )
+    for group in duplicated.iterator():
+        OutboundEmail.objects.filter(
+            event_id=group['event_id'], participant_id=group['participant_id'], kind=group['kind'],
+        ).exclude(pk=group['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0013_response_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='outboundemail',
+            constraint=models.UniqueConstraint(fields=('event', 'participant', 'kind'), name='email_unique_event_participant_kind'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_job_keys(apps, schema_editor):
+    """Copy the key of each waiting job, the oldest one if a backend let several share it"""
+    Job = apps.get_model('events', 'Job')
+    seen = set()
+    pending = Job.objects.filter(status='pending', dedup_key__isnull=False).order_by('pk')
+    for pk, dedup_key in pending.values_list('pk', 'dedup_key').iterator():
+        if dedup_key not in seen:
+            seen.add(dedup_key)
+            Job.objects.filter(pk=pk).update(pending_dedup_key=dedup_key)
+    Job.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_outbound_email_unique_kind'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='job',
+            name='job_unique_pending_dedup_key',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Refreshed by the worker while the job runs', null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='pending_dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_job_keys, migrations.RunPython.noop),
+    ]
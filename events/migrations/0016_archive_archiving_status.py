@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_job_pending_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventarchive',
+            name='status',
+            field=models.CharField(choices=[('archiving', 'Archiving'), ('archived', 'Archived'), ('purging', 'Purging'), ('purged', 'Purged')], default='archived', max_length=20),
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+import json
+import math
+from functools import cached_property
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .caching import bump_event_version, bump_event_versions
+
 
 class Host(models.Model):
     """Host model for event creators"""
@@ -16,6 +23,13 @@ class Host(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if not is_new:
+            # Host details appear on every cached event card
+            bump_event_versions(self.events.values_list('pk', flat=True))
+
 
 class EventTemplate(models.Model):
     """Pre-built questionnaire templates for different event types"""
@@ -57,6 +71,7 @@ class Event(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     template = models.ForeignKey(EventTemplate, on_delete=models.SET_NULL, null=True, blank=True)
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True)
+    qr_code_hash = models.CharField(max_length=64, blank=True)
     registration_deadline = models.DateTimeField(null=True, blank=True)
     
     # Settings
@@ -69,76 +84,263 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'date'], name='event_status_date_idx')]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_search = instance._search_fields()
+        return instance
+
+    def _search_fields(self):
+        return (self.__dict__.get('title'), self.__dict__.get('description'), self.__dict__.get('location'))
+
     def save(self, *args, **kwargs):
         """Generate QR code when event is saved"""
         # Save first to get the primary key
         is_new = self.pk is None
+        previous_status = getattr(self, '_loaded_status', None)
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        # The capacity snapshot depends on max_participants
+        self.__dict__.pop('capacity', None)
+        
+        if is_new:
+            EventStats.objects.get_or_create(event=self)
         
-        # Generate QR code only after we have a primary key
-        if is_new or not self.qr_code:
-            self.generate_qr_code()
+        bump_event_version(self.pk, catalog=True)
+        
+        if self._search_fields() != getattr(self, '_loaded_search', None):
+            from .search import index_event
+            index_event(self)
+            self._loaded_search = self._search_fields()
+        
+        if self.status == 'completed' and previous_status != 'completed':
+            from .rollups import schedule_event_rollup
+            schedule_event_rollup(self.pk)
+        
+        # Render the QR code in the background once we have a primary key
+        if 'qr_code_hash' in self.__dict__:
+            from .qr import schedule_qr_code
+            schedule_qr_code(self)
+    
+    def delete(self, *args, **kwargs):
+        from .search import remove_event
+        event_id = self.pk
+        result = super().delete(*args, **kwargs)
+        remove_event(event_id)
+        bump_event_version(event_id, catalog=True)
+        return result
     
     def generate_qr_code(self):
-        """Generate QR code for event registration"""
+        """Render the registration QR code now instead of in the background"""
+        from .qr import generate_event_qr
+        self.qr_code.name, self.qr_code_hash = generate_event_qr(self.pk)
+
+    @property
+    def qr_code_pending(self):
+        from .qr import qr_code_pending
+        return qr_code_pending(self)
+
+    def get_onboarding_questions(self):
+        """Questions asked at registration: the event's own, else its template's"""
+        questions = self.onboarding_questions.all()
+        if not questions and self.template:
+            questions = self.template.template_questions.all()
+        return questions
+
+    @cached_property
+    def capacity(self):
+        """Registration counts, read once per instance until ``invalidate_capacity``"""
         try:
-            import qrcode
-            from PIL import Image
-            from io import BytesIO
-            from django.core.files import File
-            
-            # Create QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
+            return EventCapacity(self.max_participants, self.stats.registered_count, self.stats.waitlisted_count)
+        except EventStats.DoesNotExist:
+            counts = self.participants.aggregate(
+                registered=Count('id', filter=Q(status='registered')),
+                waitlisted=Count('id', filter=Q(status='waitlisted')),
             )
-            # Use a more flexible URL (can be configured later)
-            qr.add_data(f"http://localhost:8000/register/{self.pk}/")
-            qr.make(fit=True)
-            
-            # Create QR code image
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to RGB if necessary
-            if qr_img.mode != 'RGB':
-                qr_img = qr_img.convert('RGB')
-            
-            # Create white background with padding
-            width, height = qr_img.size
-            new_img = Image.new('RGB', (width + 40, height + 40), 'white')
-            new_img.paste(qr_img, (20, 20))
-            
-            # Save to BytesIO
-            stream = BytesIO()
-            new_img.save(stream, format='PNG')
-            stream.seek(0)
-            
-            # Save to model field
-            file_name = f'qr_event_{self.pk}.png'
-            self.qr_code.save(file_name, File(stream), save=False)
-            stream.close()
-            
-            # Save again to update the qr_code field
-            super(Event, self).save(update_fields=['qr_code'])
-            
-        except Exception as e:
-            # Log the error but don't fail the save operation
-            print(f"Error generating QR code for event {self.pk}: {e}")
-            pass
+            return EventCapacity(self.max_participants, counts['registered'], counts['waitlisted'])
+
+    def invalidate_capacity(self):
+        """Forget the capacity snapshot and cached stats after registrations change"""
+        self.__dict__.pop('capacity', None)
+        stats_relation = Event.stats.related
+        if stats_relation.is_cached(self):
+            stats_relation.delete_cached_value(self)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.invalidate_capacity()
 
     @property
     def participant_count(self):
-        return self.participants.filter(status='registered').count()
+        return self.capacity.registered
 
     @property
     def waitlist_count(self):
-        return self.participants.filter(status='waitlisted').count()
+        return self.capacity.waitlisted
+
+    @property
+    def spots_remaining(self):
+        return self.capacity.spots_remaining
+
+    @property
+    def fill_percent(self):
+        return self.capacity.fill_percent
+
+    @property
+    def is_full(self):
+        return self.capacity.is_full
+
+
+class EventCapacity:
+    """Snapshot of an event's registration counts and what follows from them"""
+
+    def __init__(self, max_participants, registered, waitlisted):
+        self.max_participants = max_participants
+        self.registered = registered
+        self.waitlisted = waitlisted
+
+    @property
+    def spots_remaining(self):
+        """Open places, or ``None`` when the event has no limit"""
+        if not self.max_participants:
+            return None
+        return max(self.max_participants - self.registered, 0)
+
+    @property
+    def fill_percent(self):
+        if not self.max_participants:
+            return 0
+        return min(round(100 * self.registered / self.max_participants), 100)
+
+    @property
+    def is_full(self):
+        return bool(self.max_participants and self.registered >= self.max_participants)
+
+
+class EventStats(models.Model):
+    """Per-event counters maintained on write so pages never count rows
+
+    Model saves and deletes keep the counters in step. ``QuerySet.update()``,
+    ``bulk_update()`` and raw SQL skip ``Participant.save`` and leave them
+    stale, so follow any such status change with ``rebuild`` (or run
+    ``manage.py reconcile_event_stats``).
+    """
+    STATUS_FIELDS = {
+        'registered': 'registered_count',
+        'waitlisted': 'waitlisted_count',
+        'cancelled': 'cancelled_count',
+        'attended': 'attended_count',
+    }
+
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='stats')
+    registered_count = models.IntegerField(default=0)
+    waitlisted_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    attended_count = models.IntegerField(default=0)
+    question_count = models.IntegerField(default=0)
+    vote_count = models.IntegerField(default=0)
+    last_registration_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'event stats'
+
+    def __str__(self):
+        return f"Stats for event {self.event_id}"
+
+    @property
+    def total_participants(self):
+        return self.registered_count + self.waitlisted_count + self.cancelled_count + self.attended_count
+
+    @classmethod
+    def apply(cls, event_id, last_registration_at=None, **deltas):
+        """Add ``deltas`` to an event's counters in a single UPDATE"""
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if last_registration_at:
+            updates['last_registration_at'] = last_registration_at
+        if not updates:
+            return
+        updates['updated_at'] = timezone.now()
+        if not cls.objects.filter(event_id=event_id).update(**updates):
+            # No row yet: counting from the source already includes this write
+            cls.rebuild(event_id)
+        bump_event_version(event_id)
+
+    @classmethod
+    def status_delta(cls, old_status, new_status):
+        deltas = {}
+        if old_status in cls.STATUS_FIELDS:
+            deltas[cls.STATUS_FIELDS[old_status]] = -1
+        if new_status in cls.STATUS_FIELDS:
+            field = cls.STATUS_FIELDS[new_status]
+            deltas[field] = deltas.get(field, 0) + 1
+        return deltas
+
+    @classmethod
+    def rebuild(cls, event_id):
+        """Recount an event's stats from the source tables"""
+        participant_counts = Participant.objects.filter(event_id=event_id).aggregate(
+            **{field: Count('id', filter=Q(status=status)) for status, field in cls.STATUS_FIELDS.items()},
+            last_registration_at=models.Max('registered_at'),
+        )
+        values = {
+            **participant_counts,
+            'question_count': PublicQuestion.objects.filter(event_id=event_id).count(),
+            'vote_count': QuestionVote.objects.filter(question__event_id=event_id).count(),
+        }
+        stats, _ = cls.objects.update_or_create(event_id=event_id, defaults=values)
+        bump_event_version(event_id)
+        return stats
+
+
+class EventRollup(models.Model):
+    """Compact summary of a completed event for cross-event host analytics"""
+    host = models.ForeignKey(Host, on_delete=models.CASCADE, related_name='event_rollups')
+    event = models.OneToOneField(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name='rollup')
+    event_title = models.CharField(max_length=255)
+    event_date = models.DateTimeField()
+    
+    registered_count = models.IntegerField(default=0)
+    waitlisted_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    attended_count = models.IntegerField(default=0)
+    returning_count = models.IntegerField(default=0, help_text="Attendees seen at an earlier event of this host")
+    
+    # {label: count} for the most common values
+    top_skills = models.JSONField(default=dict, blank=True)
+    top_industries = models.JSONField(default=dict, blank=True)
+    
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['event_date']
+        indexes = [models.Index(fields=['host', 'event_date'])]
+
+    def __str__(self):
+        return f"Rollup: {self.event_title} ({self.event_date:%Y-%m-%d})"
+
+    @property
+    def signups(self):
+        """Everyone who held a confirmed spot: still registered or checked in"""
+        return self.registered_count + self.attended_count
+
+    @property
+    def attendance_rate(self):
+        return self.attended_count / self.signups if self.signups else None
+
+    @property
+    def no_show_rate(self):
+        return self.registered_count / self.signups if self.signups else None
+
+    @property
+    def returning_rate(self):
+        return self.returning_count / self.signups if self.signups else None
 
 
 class OnboardingQuestion(models.Model):
@@ -152,6 +354,8 @@ class OnboardingQuestion(models.Model):
         ('email', 'Email'),
         ('number', 'Number'),
     ]
+    # Answers to these are also stored in QuestionResponse.value
+    NUMERIC_TYPES = ('rating_scale', 'number')
     
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='onboarding_questions', null=True, blank=True)
     template = models.ForeignKey(EventTemplate, on_delete=models.CASCADE, null=True, blank=True, related_name='template_questions')
@@ -174,12 +378,28 @@ class OnboardingQuestion(models.Model):
     def __str__(self):
         return f"{self.question_text[:50]}..."
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.event_id:
+            bump_event_version(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        event_id = self.event_id
+        result = super().delete(*args, **kwargs)
+        if event_id:
+            bump_event_version(event_id)
+        return result
+
     def get_choices_list(self):
         """Return choices as a list"""
         if self.choices:
             return [choice.strip() for choice in self.choices.split(',')]
         return []
 
+    @property
+    def is_numeric(self):
+        return self.question_type in self.NUMERIC_TYPES
+
 
 class Participant(models.Model):
     """Participant registration data"""
@@ -209,20 +429,100 @@ class Participant(models.Model):
     # Priority scoring for waitlist management
     priority_score = models.FloatField(default=0.0)
     
+    # Onboarding answers as {question id: answer} when EVENTS_PACKED_ANSWERS
+    # is on, instead of one QuestionResponse row each; read with get_answers()
+    answers = models.JSONField(default=dict, blank=True)
+    
     registered_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['event', 'email']
         ordering = ['-registered_at']
+        indexes = [
+            models.Index(fields=['event', 'status'], name='participant_event_status_idx'),
+            models.Index(fields=['event', '-registered_at'], name='participant_event_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.event.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_tags = (instance.__dict__.get('skills'), instance.__dict__.get('interests'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Keep the event's stats and tag index in step with this participant"""
+        is_new = self._state.adding
+        previous_status = getattr(self, '_loaded_status', None)
+        previous_tags = getattr(self, '_loaded_tags', (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                EventStats.apply(
+                    self.event_id,
+                    last_registration_at=self.registered_at,
+                    **EventStats.status_delta(None, self.status),
+                )
+            elif previous_status is not None and previous_status != self.status:
+                EventStats.apply(self.event_id, **EventStats.status_delta(previous_status, self.status))
+                if previous_status == 'waitlisted' and self.status == 'registered':
+                    from .outbox import queue_email
+                    queue_email(self, 'promoted')
+            else:
+                # Counters did not move, but answers built from attendees did
+                bump_event_version(self.event_id)
+            if (self.skills, self.interests) != previous_tags:
+                self.sync_tags(replace=not is_new)
+        self._invalidate_event_capacity()
+        self._loaded_status = self.status
+        self._loaded_tags = (self.skills, self.interests)
+
+    def build_tags(self):
+        """Normalized skill and interest tags for this participant"""
+        tags = {}
+        for kind, labels in (('skill', self.get_skills_list()), ('interest', self.get_interests_list())):
+            for label in labels:
+                value = normalize_tag(label)
+                if value:
+                    tags.setdefault((kind, value), ParticipantTag(
+                        event_id=self.event_id, participant=self, kind=kind,
+                        value=value[:128], label=label[:128],
+                    ))
+        return list(tags.values())
+
+    def sync_tags(self, replace=True):
+        if replace:
+            self.tags.all().delete()
+        ParticipantTag.objects.bulk_create(self.build_tags())
+
+    def delete(self, *args, **kwargs):
+        # Deleting a participant cascades to their questions and votes, so recount
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            EventStats.rebuild(self.event_id)
+        self._invalidate_event_capacity()
+        return result
+
+    def _invalidate_event_capacity(self):
+        # The event this participant was loaded with may be rendered next
+        if Participant.event.is_cached(self):
+            self.event.invalidate_capacity()
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    def get_answers(self):
+        """``{question_id: answer}`` whichever way the answers are stored"""
+        if self.answers:
+            return {int(question_id): answer for question_id, answer in self.answers.items()}
+        # Uses prefetched responses when there are any
+        return {response.question_id: response.answer for response in self.responses.all()}
+
     def get_skills_list(self):
         """Return skills as a list"""
         if self.skills:
@@ -236,15 +536,55 @@ class Participant(models.Model):
         return []
 
 
+def normalize_tag(label):
+    """Case- and whitespace-insensitive form of a skill or interest"""
+    return ' '.join(label.split()).casefold()
+
+
+class ParticipantTag(models.Model):
+    """Normalized skills and interests for exact-match attendee filtering"""
+    KINDS = [
+        ('skill', 'Skill'),
+        ('interest', 'Interest'),
+    ]
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='participant_tags')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='tags')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    value = models.CharField(max_length=128)  # normalized, used for matching
+    label = models.CharField(max_length=128)  # as entered, used for display
+
+    class Meta:
+        unique_together = ['participant', 'kind', 'value']
+        indexes = [models.Index(fields=['event', 'kind', 'value'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.label}"
+
+
 class QuestionResponse(models.Model):
     """Individual responses to onboarding questions"""
     participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='responses')
     question = models.ForeignKey(OnboardingQuestion, on_delete=models.CASCADE)
     answer = models.TextField()
+    # Parsed answer to rating and number questions, so they aggregate in SQL
+    value = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['participant', 'question']
+        indexes = [
+            models.Index(fields=['question', 'value'], name='response_question_value_idx'),
+        ]
+
+    @staticmethod
+    def parse_value(answer):
+        """The number in ``answer``, or None when it is blank or not a finite number"""
+        try:
+            value = float(str(answer).strip())
+        except (TypeError, ValueError):
+            return None
+        return value if math.isfinite(value) else None
 
     def __str__(self):
         return f"{self.participant.full_name} - {self.question.question_text[:30]}..."
@@ -264,10 +604,27 @@ class PublicQuestion(models.Model):
 
     class Meta:
         ordering = ['-votes', '-created_at']
+        indexes = [models.Index(fields=['event', '-votes', '-created_at'], name='question_event_ranking_idx')]
 
     def __str__(self):
         return f"{self.question_text[:50]}... ({self.votes} votes)"
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                EventStats.apply(self.event_id, question_count=1)
+            else:
+                bump_event_version(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        # Votes cascade with the question, so recount rather than track them
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            EventStats.rebuild(self.event_id)
+        return result
+
 
 class QuestionVote(models.Model):
     """Track votes on public questions"""
@@ -281,6 +638,19 @@ class QuestionVote(models.Model):
     def __str__(self):
         return f"{self.participant.full_name} voted on: {self.question.question_text[:30]}..."
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                EventStats.apply(self.question.event_id, vote_count=1)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            EventStats.apply(self.question.event_id, vote_count=-1)
+        return result
+
 
 class ParticipantMatch(models.Model):
     """AI-generated participant matches"""
@@ -295,6 +665,7 @@ class ParticipantMatch(models.Model):
     class Meta:
         unique_together = ['participant1', 'participant2']
         ordering = ['-match_score']
+        indexes = [models.Index(fields=['event', 'participant1', '-match_score'], name='match_event_p1_score_idx')]
 
     def __str__(self):
         return f"Match: {self.participant1.full_name} <-> {self.participant2.full_name} ({self.match_score:.2f})"
@@ -308,6 +679,7 @@ class EventInsight(models.Model):
         ('experience_levels', 'Experience Levels'),
         ('interests_analysis', 'Interests Analysis'),
         ('networking_potential', 'Networking Potential'),
+        ('answer_statistics', 'Answer Statistics'),
     ]
     
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='insights')
@@ -322,6 +694,23 @@ class EventInsight(models.Model):
     def __str__(self):
         return f"{self.event.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_event_version(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        event_id = self.event_id
+        result = super().delete(*args, **kwargs)
+        bump_event_version(event_id)
+        return result
+
+    def get_data(self):
+        """Return the structured insight payload"""
+        try:
+            return json.loads(self.content)
+        except (TypeError, ValueError):
+            return {}
+
 
 class ChatQuery(models.Model):
     """Track AI chat queries about event data"""
@@ -337,3 +726,129 @@ class ChatQuery(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.query[:50]}..."
+
+
+class Job(models.Model):
+    """A unit of background work, run by the ``run_workers`` command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    queue = models.CharField(max_length=64, default='default')
+    task = models.CharField(max_length=255, help_text="Dotted path of the function to call")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Only one pending job may carry a given key; later enqueues reuse it
+    dedup_key = models.CharField(max_length=255, null=True, blank=True)
+    # The dedup key while the job is pending and NULL otherwise, so a plain
+    # unique column enforces it on every backend (MySQL has no partial indexes)
+    pending_dedup_key = models.CharField(max_length=255, null=True, blank=True, unique=True, editable=False)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=128, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Refreshed by the worker while the job runs")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_after'], name='job_claim_idx'),
+            models.Index(fields=['event', '-created_at'], name='job_event_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class OutboundEmail(models.Model):
+    """An email in the outbox, sent in batches by the 'email' job queue"""
+    KIND_CHOICES = [
+        ('confirmation', 'Registration confirmation'),
+        ('waitlisted', 'Waitlist confirmation'),
+        ('promoted', 'Waitlist promotion'),
+        ('reminder', 'Event reminder'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=True, related_name='outbound_emails')
+    participant = models.ForeignKey(
+        Participant, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_emails'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    to_email = models.EmailField()
+    domain = models.CharField(max_length=255, help_text="Recipient domain, for throttling")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    send_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='email_due_idx'),
+            models.Index(fields=['domain', 'sent_at'], name='email_domain_sent_idx'),
+        ]
+        constraints = [
+            # Each kind of email goes to an attendee once, however often it is queued
+            models.UniqueConstraint(fields=['event', 'participant', 'kind'], name='email_unique_event_participant_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+
+
+class EventArchive(models.Model):
+    """Compressed copy of a completed event's data, kept after its rows are purged"""
+    STATUS_CHOICES = [
+        ('archiving', 'Archiving'),
+        ('archived', 'Archived'),
+        ('purging', 'Purging'),
+        ('purged', 'Purged'),
+    ]
+    
+    event = models.OneToOneField(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name='archive')
+    original_event_id = models.IntegerField(unique=True)
+    host = models.ForeignKey(Host, on_delete=models.CASCADE, related_name='event_archives')
+    event_title = models.CharField(max_length=255)
+    event_date = models.DateTimeField()
+    
+    archive_file = models.FileField(upload_to='archives/')
+    size_bytes = models.BigIntegerField(default=0)
+    # {model label: rows written to the archive}
+    row_counts = models.JSONField(default=dict, blank=True)
+    # {model label: rows deleted so far}, so an interrupted purge can report and resume
+    deleted_counts = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='archived')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    purged_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-event_date']
+
+    def __str__(self):
+        return f"Archive: {self.event_title} ({self.event_date:%Y-%m-%d})"
@@ -0,0 +1,253 @@
+"""Outbound email.
+
+Emails are written to the ``OutboundEmail`` table (the outbox) in the same
+transaction as the change they announce, and sent later by the 'email' job
+queue, so no request ever waits on SMTP. ``drain_outbox`` claims due
+messages in batches and sends them over one reused SMTP connection.
+
+Each recipient domain gets at most ``EVENTS_EMAIL_DOMAIN_RATE`` messages a
+minute (``EVENTS_EMAIL_DOMAIN_RATES`` overrides single domains); the rest
+wait for the next window. Failed messages are retried with the job queue's
+backoff up to ``EVENTS_EMAIL_MAX_ATTEMPTS``; refused recipients fail at once.
+Delivery is at least once: a worker that dies mid-batch leaves its claim to
+expire after ``EVENTS_JOB_TIMEOUT``, and unconfirmed messages are sent again.
+"""
+import smtplib
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event, OutboundEmail
+from .qr import checkin_token, checkin_url, public_base_url
+from .tasks import DEFAULT_TIMEOUT, backoff, enqueue
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_DRAIN_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_DOMAIN_RATE = 1000
+THROTTLE_WINDOW = timedelta(minutes=1)
+REMINDER_CHUNK_SIZE = 1000
+
+
+def email_domain(address):
+    return address.rsplit('@', 1)[-1].lower()
+
+
+def build_email(participant, kind, event=None):
+    """An unsaved outbox message of ``kind`` for ``participant``"""
+    event = event or participant.event
+    context = {
+        'participant': participant,
+        'event': event,
+        'event_url': public_base_url() + reverse('event_public_detail', args=[event.pk]),
+        'checkin_url': checkin_url(checkin_token(participant.pk)),
+    }
+    subject = ' '.join(render_to_string(f'events/emails/{kind}_subject.txt', context).split())
+    return OutboundEmail(
+        event_id=event.pk,
+        participant_id=participant.pk,
+        kind=kind,
+        to_email=participant.email,
+        domain=email_domain(participant.email),
+        subject=subject[:255],
+        body=render_to_string(f'events/emails/{kind}.txt', context),
+    )
+
+
+def schedule_outbox(delay=0):
+    """Make sure a drain of the outbox is queued to run within ``delay`` seconds"""
+    enqueue(drain_outbox, queue='email', dedup_key='outbox', delay=delay)
+
+
+def queue_email(participant, kind):
+    """Put an email of ``kind`` for ``participant`` in the outbox unless one is already there"""
+    email = build_email(participant, kind)
+    OutboundEmail.objects.bulk_create([email], ignore_conflicts=True)
+    schedule_outbox()
+    return email
+
+
+def queue_event_reminders(event_id):
+    """Put a reminder for every registered attendee in the outbox; returns how many
+
+    Reminders are rendered a chunk at a time outside any transaction, and
+    each chunk is committed on its own, so the database is never locked
+    while templates render. An attendee gets one reminder per event, so a
+    job retried after failing partway only queues the ones still missing.
+    """
+    event = Event.objects.get(pk=event_id)
+    reminded = OutboundEmail.objects.filter(event_id=event_id, kind='reminder').values('participant_id')
+    participants = (
+        event.participants.filter(status='registered').exclude(pk__in=reminded)
+        .only('event_id', 'first_name', 'last_name', 'email')
+        .order_by('pk')
+    )
+    queued = 0
+    last_pk = 0
+    while True:
+        # Keyset pages, so no read stays open across the writes
+        batch = list(participants.filter(pk__gt=last_pk)[:REMINDER_CHUNK_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        emails = [build_email(participant, 'reminder', event) for participant in batch]
+        OutboundEmail.objects.bulk_create(emails, ignore_conflicts=True)
+        queued += len(emails)
+        # Earlier chunks start sending while later ones are rendered
+        schedule_outbox()
+    return queued
+
+
+def release_stale_claims():
+    """Hand back messages claimed by a sender that stopped before finishing"""
+    timeout = getattr(settings, 'EVENTS_JOB_TIMEOUT', DEFAULT_TIMEOUT)
+    return OutboundEmail.objects.filter(
+        status='sending', claimed_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status='pending', claimed_by='')
+
+
+def claim_batch(size):
+    """Mark up to ``size`` due messages as sending and return them"""
+    now = timezone.now()
+    pks = list(
+        OutboundEmail.objects.filter(status='pending', send_after__lte=now)
+        .order_by('send_after', 'pk')
+        .values_list('pk', flat=True)[:size]
+    )
+    if not pks:
+        return []
+    claim = uuid.uuid4().hex
+    # Another sender may have claimed some of these since they were read
+    OutboundEmail.objects.filter(pk__in=pks, status='pending').update(
+        status='sending', claimed_by=claim, claimed_at=now,
+    )
+    return list(OutboundEmail.objects.filter(pk__in=pks, claimed_by=claim).order_by('send_after', 'pk'))
+
+
+def domain_rate(domain):
+    rates = getattr(settings, 'EVENTS_EMAIL_DOMAIN_RATES', {})
+    return rates.get(domain, getattr(settings, 'EVENTS_EMAIL_DOMAIN_RATE', DEFAULT_DOMAIN_RATE))
+
+
+def domain_allowance(domains, now):
+    """How many more messages each domain may be sent in the current window"""
+    recent = dict(
+        OutboundEmail.objects
+        .filter(domain__in=domains, status='sent', sent_at__gte=now - THROTTLE_WINDOW)
+        .order_by().values_list('domain').annotate(count=Count('id'))
+    )
+    return {
+        domain: (domain_rate(domain) - recent.get(domain, 0)) if domain_rate(domain) else None
+        for domain in domains
+    }
+
+
+def send_batch(batch, connection):
+    """Send claimed messages over an open ``connection``; returns counts by outcome"""
+    now = timezone.now()
+    allowance = domain_allowance({email.domain for email in batch}, now)
+    max_attempts = getattr(settings, 'EVENTS_EMAIL_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    sent, deferred, failures = [], [], []
+    reconnect = False
+    for index, email in enumerate(batch):
+        remaining = allowance[email.domain]
+        if remaining is not None and remaining <= 0:
+            deferred.append(email.pk)
+            continue
+        if reconnect:
+            try:
+                connection.close()
+                connection.open()
+            except (smtplib.SMTPException, OSError) as error:
+                failures.extend((pending, str(error), False) for pending in batch[index:])
+                break
+            reconnect = False
+        message = EmailMessage(
+            email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email], connection=connection,
+        )
+        try:
+            connection.send_messages([message])
+        except smtplib.SMTPRecipientsRefused as error:
+            failures.append((email, str(error), True))
+            continue
+        except (smtplib.SMTPException, OSError) as error:
+            # The server may have dropped the connection; start a fresh one
+            failures.append((email, str(error), False))
+            reconnect = True
+            continue
+        sent.append(email.pk)
+        if remaining is not None:
+            allowance[email.domain] = remaining - 1
+
+    finished = timezone.now()
+    OutboundEmail.objects.filter(pk__in=sent).update(
+        status='sent', sent_at=finished, attempts=F('attempts') + 1, claimed_by='', last_error='',
+    )
+    # Throttled messages were not attempted, so they keep their attempt count
+    OutboundEmail.objects.filter(pk__in=deferred).update(
+        status='pending', send_after=now + THROTTLE_WINDOW, claimed_by='',
+    )
+    counts = Counter(sent=len(sent), deferred=len(deferred))
+    for email, error, permanent in failures:
+        attempts = email.attempts + 1
+        if permanent or attempts >= max_attempts:
+            outcome = {'status': 'failed'}
+            counts['failed'] += 1
+        else:
+            outcome = {'status': 'pending', 'send_after': finished + timedelta(seconds=backoff(attempts))}
+            counts['retried'] += 1
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            attempts=attempts, last_error=error, claimed_by='', **outcome,
+        )
+    return counts
+
+
+def drain_outbox(batch_size=None, time_limit=None):
+    """Send due outbox messages in batches over one connection; returns counts by outcome.
+
+    Stops after ``time_limit`` seconds so a long blast does not hold the
+    worker, and queues another drain for whatever is still waiting.
+    """
+    batch_size = batch_size or getattr(settings, 'EVENTS_EMAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    time_limit = time_limit or getattr(settings, 'EVENTS_EMAIL_DRAIN_SECONDS', DEFAULT_DRAIN_SECONDS)
+    deadline = time.monotonic() + time_limit
+    release_stale_claims()
+
+    counts = Counter()
+    connection = None
+    try:
+        while time.monotonic() < deadline:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            if connection is None:
+                connection = get_connection()
+                try:
+                    connection.open()
+                except (smtplib.SMTPException, OSError):
+                    # Leave the batch for the job's retry
+                    OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                        status='pending', claimed_by='',
+                    )
+                    connection = None
+                    raise
+            counts.update(send_batch(batch, connection))
+    finally:
+        if connection is not None:
+            connection.close()
+
+    next_due = (
+        OutboundEmail.objects.filter(status='pending')
+        .order_by('send_after').values_list('send_after', flat=True).first()
+    )
+    if next_due is not None:
+        schedule_outbox(delay=max((next_due - timezone.now()).total_seconds(), 0))
+    return dict(+counts)
@@ -0,0 +1,153 @@
+"""On-demand profiling of live requests.
+
+A request is profiled when a staff user adds ``?_profile=1``, when it
+carries an ``X-Profile-Token`` header minted on the profiles page (so a
+request can be profiled from curl without a session), or at random with
+probability ``EVENTS_PROFILE_SAMPLE_RATE``. Untriggered requests only pay
+for a dictionary lookup and, if sampling is on, one random draw.
+
+Profiles come from pyinstrument, a statistical sampler whose overhead is
+small enough that the timings still resemble an unprofiled request; a
+deterministic profiler such as cProfile would inflate every function call.
+Each profile is an HTML flame graph stored in ``EVENTS_PROFILE_DIR`` next
+to a small JSON file describing the request, and only the newest
+``EVENTS_PROFILE_KEEP`` are kept.
+"""
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from pyinstrument import Profiler
+
+PROFILE_PARAMETER = '_profile'
+PROFILE_HEADER = 'X-Profile-Token'
+TOKEN_SALT = 'events.profile'
+TOKEN_MAX_AGE = 60 * 60
+DEFAULT_KEEP = 50
+PROFILE_NAME_PATTERN = re.compile(r'^[\w-]+\.html$')
+
+
+def profile_dir():
+    return str(getattr(settings, 'EVENTS_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def profile_token():
+    """A header value that triggers profiling for the next hour"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(uuid.uuid4().hex)
+
+
+def valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def profile_trigger(request):
+    """Why this request should be profiled, or ``None``"""
+    if PROFILE_PARAMETER in request.GET:
+        # Only now look up the user, so other requests never load the session
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_active and user.is_staff:
+            return 'staff'
+    token = request.headers.get(PROFILE_HEADER)
+    if token and valid_token(token):
+        return 'token'
+    rate = getattr(settings, 'EVENTS_PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def save_profile(profiler, request, response, duration, trigger):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    match = getattr(request, 'resolver_match', None)
+    view = match.url_name if match is not None and match.url_name else 'unresolved'
+    name = f'{time.strftime("%Y%m%dT%H%M%S")}-{view}-{uuid.uuid4().hex[:8]}'
+    with open(os.path.join(directory, f'{name}.html'), 'w', encoding='utf-8') as output:
+        output.write(profiler.output_html())
+    with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as output:
+        json.dump({
+            'file': f'{name}.html',
+            'view': view,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'trigger': trigger,
+            'created_at': time.time(),
+        }, output)
+    prune_profiles(directory)
+
+
+def list_profiles(limit=None):
+    """Descriptions of stored profiles, newest first"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as description:
+                profiles.append(json.load(description))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda profile: profile.get('created_at', 0), reverse=True)
+    return profiles[:limit] if limit else profiles
+
+
+def prune_profiles(directory):
+    keep = getattr(settings, 'EVENTS_PROFILE_KEEP', DEFAULT_KEEP)
+    for profile in list_profiles()[keep:]:
+        stem = os.path.splitext(profile['file'])[0]
+        for name in (profile['file'], f'{stem}.json'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def profile_path(name):
+    """Absolute path of a stored profile, or ``None`` for anything else"""
+    if not PROFILE_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """Profile triggered requests; goes after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EVENTS_PROFILING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profiler = Profiler()
+        try:
+            profiler.start()
+        except RuntimeError:
+            # Another profiler is already running in this process
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        save_profile(profiler, request, response, time.perf_counter() - start, trigger)
+        return response
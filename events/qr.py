@@ -0,0 +1,186 @@
+"""Event registration and participant check-in QR codes.
+
+A stored QR image is named after the hash of the URL it encodes, so an
+identical payload is never rendered twice and an event whose URL has not
+changed never needs a new image. Rendering happens in the background after
+the event is saved; until it finishes the event's QR code is pending.
+
+Codes can also be rendered on demand as SVG or PNG; recent renders are kept
+in an in-process LRU cache, so stored files are only needed for print.
+"""
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .tasks import enqueue, enqueue_many
+
+QR_DIRECTORY = 'qr_codes'
+# Bump when the rendering below changes so every image is re-rendered
+QR_RENDER_VERSION = 1
+
+QR_FORMATS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+DEFAULT_SCALE = 10
+MAX_SCALE = 40
+QR_CACHE_SIZE = 512
+CHECKIN_SALT = 'events.checkin'
+
+
+def public_base_url(base_url=None):
+    return (base_url or getattr(settings, 'EVENTS_PUBLIC_BASE_URL', 'http://localhost:8000')).rstrip('/')
+
+
+def registration_url(event_id, base_url=None):
+    return public_base_url(base_url) + reverse('event_registration', args=[event_id])
+
+
+def payload_hash(payload):
+    return hashlib.sha256(f'{QR_RENDER_VERSION}:{payload}'.encode()).hexdigest()
+
+
+def qr_code_name(digest):
+    return f'{QR_DIRECTORY}/{digest}.png'
+
+
+def checkin_token(participant_id):
+    """Stable signed token identifying a participant at check-in"""
+    return signing.Signer(salt=CHECKIN_SALT).sign(str(participant_id))
+
+
+def participant_id_from_token(token):
+    try:
+        return int(signing.Signer(salt=CHECKIN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def checkin_url(token, base_url=None):
+    return public_base_url(base_url) + reverse('participant_checkin', args=[token])
+
+
+def _build_qr(payload, box_size=DEFAULT_SCALE, image_factory=None):
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=4,
+        image_factory=image_factory,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_svg(payload):
+    """Scalable SVG bytes of ``payload`` as a QR code"""
+    from qrcode.image.svg import SvgPathImage
+
+    stream = BytesIO()
+    _build_qr(payload, image_factory=SvgPathImage).make_image().save(stream)
+    return stream.getvalue()
+
+
+def render_qr_png(payload, box_size=DEFAULT_SCALE):
+    """PNG bytes of ``payload`` as a QR code on a padded white canvas"""
+    from PIL import Image
+
+    qr_img = _build_qr(payload, box_size).make_image(fill_color='black', back_color='white')
+    if qr_img.mode != 'RGB':
+        qr_img = qr_img.convert('RGB')
+
+    padding = 2 * box_size
+    width, height = qr_img.size
+    canvas = Image.new('RGB', (width + 2 * padding, height + 2 * padding), 'white')
+    canvas.paste(qr_img, (padding, padding))
+
+    stream = BytesIO()
+    canvas.save(stream, format='PNG')
+    return stream.getvalue()
+
+
+def save_qr_png(digest, image):
+    """Store ``image`` under the name for ``digest``; returns the name it was stored as
+
+    The image is written under a temporary name and renamed over the final
+    one, so readers see the old file or the new one but never neither, and
+    concurrent writers of one digest cannot leave a suffixed copy behind.
+    Storages without local paths cannot rename; there the name ``save()``
+    picks is returned and callers store it alongside the digest.
+    """
+    name = qr_code_name(digest)
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        return default_storage.save(name, ContentFile(image))
+    temp_name = default_storage.save(f'{name}.{uuid.uuid4().hex}.tmp', ContentFile(image))
+    os.replace(default_storage.path(temp_name), path)
+    return name
+
+
+def store_qr_png(digest, payload):
+    """Render and store the image for ``digest`` unless it already exists"""
+    name = qr_code_name(digest)
+    if default_storage.exists(name):
+        return name
+    return save_qr_png(digest, render_qr_png(payload))
+
+
+def qr_code_pending(event):
+    return event.qr_code_hash != payload_hash(registration_url(event.pk))
+
+
+def qr_code_url(event):
+    """Where the up-to-date image for ``event`` is, or will be once rendered"""
+    if event.qr_code and not qr_code_pending(event):
+        return default_storage.url(event.qr_code.name)
+    return default_storage.url(qr_code_name(payload_hash(registration_url(event.pk))))
+
+
+def generate_event_qr(event_id):
+    """Bring one event's stored QR code up to date; returns ``(name, digest)``"""
+    from .models import Event
+
+    payload = registration_url(event_id)
+    digest = payload_hash(payload)
+    name = store_qr_png(digest, payload)
+    Event.objects.filter(pk=event_id).update(qr_code=name, qr_code_hash=digest)
+    return name, digest
+
+
+def schedule_qr_code(event):
+    """Queue a render if ``event`` does not already have the right image"""
+    if qr_code_pending(event):
+        enqueue(generate_event_qr, args=[event.pk], queue='qr', dedup_key=f'qr:{event.pk}', event_id=event.pk)
+        return True
+    return False
+
+
+def schedule_qr_codes(events):
+    """``schedule_qr_code`` for many events at once"""
+    enqueue_many(generate_event_qr, [
+        ([event.pk], f'qr:{event.pk}', event.pk) for event in events if qr_code_pending(event)
+    ], queue='qr')
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr(payload, qr_format, scale=DEFAULT_SCALE):
+    """Rendered bytes of ``payload`` in ``qr_format``, memoized per process"""
+    if qr_format == 'svg':
+        return render_qr_svg(payload)
+    return render_qr_png(payload, scale)
+
+
+def qr_etag(payload, qr_format, scale=DEFAULT_SCALE):
+    return hashlib.sha256(f'{QR_RENDER_VERSION}:{qr_format}:{scale}:{payload}'.encode()).hexdigest()
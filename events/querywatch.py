@@ -0,0 +1,161 @@
+"""Slow-query log and N+1 detector for development and staging.
+
+When ``EVENTS_QUERY_INSPECTION`` is on, ``QueryInspectionMiddleware`` wraps
+database execution for each request. Queries slower than
+``EVENTS_SLOW_QUERY_MS`` are logged with the view and template line that ran
+them. Queries are also grouped by shape (the SQL with its parameters left as
+placeholders and ``IN`` lists collapsed). A shape that runs
+``EVENTS_N_PLUS_ONE_THRESHOLD`` times in one request is reported with the
+stack that issued it. With ``EVENTS_N_PLUS_ONE_RAISE`` the request fails
+instead, which is how the test suite uses it.
+"""
+import logging
+import os
+import re
+import sys
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+STACK_LIMIT = 8
+# Frames from these files are left out of reported stacks
+INSTRUMENTATION_MODULES = ('querywatch.py', 'metrics.py', 'manage.py')
+
+IN_LIST_PATTERN = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    """Raised at the end of a request that repeated a query shape"""
+
+
+def query_shape(sql):
+    """``sql`` with ``IN`` lists of any length collapsed to one form"""
+    return WHITESPACE_PATTERN.sub(' ', IN_LIST_PATTERN.sub('(...)', sql)).strip()
+
+
+def template_origin():
+    """``name:line`` of the template node being rendered, if any"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None:
+                return f'{origin.template_name}:{token.lineno if token else "?"}'
+        frame = frame.f_back
+    return None
+
+
+def application_stack():
+    """The innermost frames of this project's own code, outermost first"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and os.path.basename(frame.filename) not in INSTRUMENTATION_MODULES
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_LIMIT:]))
+
+
+class RepeatedQuery:
+    """One query shape that ran too often within a request"""
+
+    def __init__(self, shape, count, template, stack):
+        self.shape = shape
+        self.count = count
+        self.template = template
+        self.stack = stack
+
+    def __str__(self):
+        where = f' (template {self.template})' if self.template else ''
+        return f'{self.count}x {self.shape}{where}\n{self.stack}'
+
+
+class QueryInspector:
+    """Watch the queries run inside a ``with`` block"""
+
+    def __init__(self, label='', slow_ms=None, threshold=None, request=None):
+        self._label = label
+        self.request = request
+        self.slow_ms = getattr(settings, 'EVENTS_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS) if slow_ms is None else slow_ms
+        self.threshold = (
+            getattr(settings, 'EVENTS_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+            if threshold is None else threshold
+        )
+        self.counts = {}
+        self.repeated = {}
+        self.slow = []
+        self._stack = None
+
+    @property
+    def label(self):
+        """The view being served once the URL has been resolved, else the given label"""
+        match = getattr(self.request, 'resolver_match', None)
+        if match is not None:
+            return f'{match.view_name} ({self.request.method} {self.request.path})'
+        return self._label
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        for finding in self.repeated.values():
+            logger.warning('Repeated query in %s: %s', self.label, finding)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            shape = query_shape(sql)
+            count = self.counts[shape] = self.counts.get(shape, 0) + 1
+            if elapsed_ms >= self.slow_ms:
+                self.slow.append((elapsed_ms, shape))
+                template = template_origin()
+                logger.warning(
+                    'Slow query (%.1f ms) in %s%s: %s\n%s', elapsed_ms, self.label,
+                    f' (template {template})' if template else '', sql, application_stack(),
+                )
+            if count >= self.threshold:
+                finding = self.repeated.get(shape)
+                if finding is None:
+                    # Capture where it happened the first time the threshold is hit
+                    self.repeated[shape] = RepeatedQuery(shape, count, template_origin(), application_stack())
+                else:
+                    finding.count = count
+
+    def report(self):
+        return '\n'.join(str(finding) for finding in self.repeated.values())
+
+
+class QueryInspectionMiddleware:
+    """Inspect each request's queries; only installed with EVENTS_QUERY_INSPECTION"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EVENTS_QUERY_INSPECTION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inspector = QueryInspector(label=f'{request.method} {request.path}', request=request)
+        with inspector:
+            response = self.get_response(request)
+        if inspector.repeated and getattr(settings, 'EVENTS_N_PLUS_ONE_RAISE', False):
+            raise NPlusOneError(f'{inspector.label} repeated queries:\n{inspector.report()}')
+        return response
@@ -0,0 +1,216 @@
+"""Sliding-window rate limiting for the unauthenticated public endpoints.
+
+Each client gets ``capacity`` requests per ``period`` seconds, counted in the
+shared Django cache so every worker sees the same budget. Requests are
+counted per fixed window with ``cache.add`` and ``cache.incr``, which are
+atomic in every backend, so concurrent requests from one client each get
+their own count and cannot slip past the limit together. The limit is
+checked against the current window plus the previous one weighted by how
+much of it still overlaps the last ``period`` seconds, so a client cannot
+burst to twice its capacity across a window boundary. Shed requests are
+taken back out of the count and do not use up the budget.
+If the cache is unavailable we log it and fall back to a per-process store.
+The check runs before the view body, so shed requests never touch the ORM.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# endpoint -> scope -> (capacity, period in seconds). ``methods`` restricts
+# which HTTP methods are counted; omit it to count every request.
+DEFAULT_RATE_LIMITS = {
+    'event_registration': {
+        'ip': (60, 60),
+        'participant': (5, 300),
+    },
+    'event_qa': {
+        'ip': (120, 60),
+        'participant': (10, 60),
+    },
+    'vote_question': {
+        'methods': ['POST'],
+        'ip': (120, 60),
+        'participant': (60, 60),
+    },
+    'event_chat': {
+        'methods': ['POST'],
+        'ip': (30, 60),
+    },
+}
+
+LOCAL_STORE_MAX_ENTRIES = 10000
+
+
+class LocalCounterStore:
+    """Bounded in-process window counters used when the shared cache fails"""
+
+    def __init__(self, max_entries=LOCAL_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            count = self._counts.pop(key, 0) + delta
+            self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+    def decr(self, key):
+        return self.incr(key, -1)
+
+    def get(self, key, default=0):
+        with self._lock:
+            return self._counts.get(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+local_store = LocalCounterStore()
+
+_metrics_lock = threading.Lock()
+_shed_counts = Counter()
+_allowed_counts = Counter()
+
+
+def _window(period, now):
+    """The fixed window ``now`` falls in and the seconds since it began"""
+    window = int(now // period)
+    return window, now - window * period
+
+
+def _retry_after(previous, current, capacity, period, elapsed):
+    """Seconds until one more request fits, if no other is allowed meanwhile"""
+    if current < capacity:
+        # Only the previous window's weight is in the way, and it shrinks
+        return max(period * (1 - (capacity - current - 1) / previous) - elapsed, 0)
+    # Wait for the next window, then for this one's weight to shrink enough
+    return period - elapsed + period * (1 - (capacity - 1) / current)
+
+
+def get_rate_limits():
+    return getattr(settings, 'EVENTS_RATE_LIMITS', DEFAULT_RATE_LIMITS)
+
+
+def get_client_ip(request):
+    if getattr(settings, 'EVENTS_RATE_LIMIT_TRUST_FORWARDED', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_participant_token(request):
+    """Participants are identified by the email they post with"""
+    if request.method != 'POST':
+        return None
+    email = request.POST.get('email', '').strip().lower()
+    return email or None
+
+
+def _count(key, previous_key, period):
+    """Atomically count one more request against ``key``.
+
+    Returns the new count, ``previous_key``'s count and the store holding them.
+    """
+    alias = getattr(settings, 'EVENTS_RATE_LIMIT_CACHE', 'default')
+    if alias:
+        try:
+            cache = caches[alias]
+            # The key outlives the next window too, which reads it as the previous one
+            count = 1 if cache.add(key, 1, timeout=2 * int(period) + 1) else cache.incr(key)
+            return count, cache.get(previous_key, 0), cache
+        except Exception:
+            logger.warning('Rate limit cache %r failed; counting in this process', alias, exc_info=True)
+    return local_store.incr(key), local_store.get(previous_key), local_store
+
+
+def _take(key, capacity, period):
+    window, elapsed = _window(period, time.time())
+    current_key = f'{key}:{window}'
+    count, previous, store = _count(current_key, f'{key}:{window - 1}', period)
+    if previous * (1 - elapsed / period) + count <= capacity:
+        return True, 0
+    # Shed requests do not use up the budget
+    try:
+        store.decr(current_key)
+    except Exception:
+        logger.warning('Could not uncount a shed request', exc_info=True)
+    return False, _retry_after(previous, count - 1, capacity, period, elapsed)
+
+
+def check_rate_limit(request, endpoint):
+    """Return ``(allowed, retry_after)`` for this request against ``endpoint``"""
+    config = get_rate_limits().get(endpoint)
+    if not config or not getattr(settings, 'EVENTS_RATE_LIMIT_ENABLED', True):
+        return True, 0
+    methods = config.get('methods')
+    if methods and request.method not in methods:
+        return True, 0
+
+    identities = {
+        'ip': get_client_ip(request),
+        'participant': get_participant_token(request),
+    }
+    for scope, identity in identities.items():
+        if scope not in config or not identity:
+            continue
+        capacity, period = config[scope]
+        digest = hashlib.sha1(identity.encode()).hexdigest()
+        allowed, retry_after = _take(f'ratelimit:{endpoint}:{scope}:{digest}', capacity, period)
+        if not allowed:
+            with _metrics_lock:
+                _shed_counts[(endpoint, scope)] += 1
+            return False, retry_after
+
+    with _metrics_lock:
+        _allowed_counts[endpoint] += 1
+    return True, 0
+
+
+def rate_limit(endpoint):
+    """Shed requests over the configured budget with a 429 before the view runs"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            allowed, retry_after = check_rate_limit(request, endpoint)
+            if not allowed:
+                response = JsonResponse({'error': 'Too many requests. Please slow down.'}, status=429)
+                response['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_metrics():
+    """Snapshot of allowed and shed request counts for this process"""
+    with _metrics_lock:
+        shed = dict(_shed_counts)
+        allowed = dict(_allowed_counts)
+    endpoints = set(allowed) | {endpoint for endpoint, _ in shed}
+    return {
+        endpoint: {
+            'allowed': allowed.get(endpoint, 0),
+            'shed': {scope: count for (name, scope), count in shed.items() if name == endpoint},
+        }
+        for endpoint in sorted(endpoints)
+    }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _shed_counts.clear()
+        _allowed_counts.clear()
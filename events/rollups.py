@@ -0,0 +1,124 @@
+"""Per-event rollups that feed the cross-event host analytics page.
+
+A rollup is computed once, when an event completes, so analytics pages only
+ever read one small row per event instead of joining every participant a
+host has ever had.
+"""
+from collections import Counter, OrderedDict
+
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .insights import PARTICIPANT_FIELDS, aggregate_participants
+from .models import Event, EventRollup, EventStats, Participant
+from .tasks import enqueue
+
+TOP_LABELS = 10
+
+
+def build_event_rollup(event):
+    """Compute and store the rollup for ``event``"""
+    counts = event.participants.aggregate(
+        **{field: Count('id', filter=Q(status=status)) for status, field in EventStats.STATUS_FIELDS.items()}
+    )
+
+    # Attendees whose email registered for one of this host's earlier events
+    earlier = Participant.objects.filter(
+        event__host_id=event.host_id,
+        event__date__lt=event.date,
+        email__iexact=OuterRef('email'),
+    )
+    returning_count = (
+        event.participants
+        .filter(status__in=['registered', 'attended'])
+        .filter(Exists(earlier))
+        .count()
+    )
+
+    rows = (
+        event.participants
+        .filter(status__in=['registered', 'attended'])
+        .order_by()
+        .values_list(*PARTICIPANT_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+    insights = aggregate_participants(rows)
+
+    rollup, _ = EventRollup.objects.update_or_create(
+        event=event,
+        defaults={
+            'host_id': event.host_id,
+            'event_title': event.title,
+            'event_date': event.date,
+            'returning_count': returning_count,
+            'top_skills': _top_labels(insights['skill_distribution']),
+            'top_industries': _top_labels(insights['industry_spread']),
+            **counts,
+        },
+    )
+    return rollup
+
+
+def _top_labels(distribution):
+    return {item['label']: item['count'] for item in distribution['items'][:TOP_LABELS]}
+
+
+def build_rollup_for_event_id(event_id):
+    event = Event.objects.filter(pk=event_id).first()
+    if event is not None:
+        build_event_rollup(event)
+
+
+def schedule_event_rollup(event_id):
+    enqueue(
+        build_rollup_for_event_id, args=[event_id], queue='rollups',
+        dedup_key=f'rollup:{event_id}', event_id=event_id,
+    )
+
+
+def summarize_rollups(rollups):
+    """Totals, monthly trends and label mix over a host's rollups"""
+    totals = Counter()
+    months = OrderedDict()
+    skills_by_month = OrderedDict()
+    industries = Counter()
+
+    for rollup in rollups:
+        totals['events'] += 1
+        totals['signups'] += rollup.signups
+        totals['attended'] += rollup.attended_count
+        totals['no_shows'] += rollup.registered_count
+        totals['returning'] += rollup.returning_count
+
+        month = rollup.event_date.strftime('%Y-%m')
+        bucket = months.setdefault(month, Counter())
+        bucket['events'] += 1
+        bucket['signups'] += rollup.signups
+        bucket['attended'] += rollup.attended_count
+        bucket['returning'] += rollup.returning_count
+        skills_by_month.setdefault(month, Counter()).update(rollup.top_skills)
+        industries.update(rollup.top_industries)
+
+    def rate(part, whole):
+        return round(100 * part / whole, 1) if whole else None
+
+    trend = [
+        {
+            'month': month,
+            'events': bucket['events'],
+            'signups': bucket['signups'],
+            'attendance_rate': rate(bucket['attended'], bucket['signups']),
+            'no_show_rate': rate(bucket['signups'] - bucket['attended'], bucket['signups']),
+            'returning_rate': rate(bucket['returning'], bucket['signups']),
+            'top_skills': [label for label, _ in skills_by_month[month].most_common(3)],
+        }
+        for month, bucket in months.items()
+    ]
+    return {
+        'events': totals['events'],
+        'signups': totals['signups'],
+        'attendance_rate': rate(totals['attended'], totals['signups']),
+        'no_show_rate': rate(totals['no_shows'], totals['signups']),
+        'returning_rate': rate(totals['returning'], totals['signups']),
+        'trend': trend,
+        'top_industries': industries.most_common(TOP_LABELS),
+    }
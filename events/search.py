@@ -0,0 +1,213 @@
+"""Ranked full-text search over events.
+
+SQLite databases keep a separate FTS5 table that ``Event.save`` and
+``Event.delete`` keep in step; MySQL uses a FULLTEXT index on the event
+table itself, which the database maintains. Any other database falls back
+to substring matching. Every backend returns ``(event_id, rank)`` pairs,
+lowest rank first, so callers paginate them the same way: by keyset on
+``(rank, id)`` rather than OFFSET.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'events_event_fts'
+SEARCH_COLUMNS = ('title', 'description', 'location')
+DEFAULT_PAGE_SIZE = 24
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_PATTERN.findall(query.lower())[:10]
+
+
+class SearchBackend:
+    """Interface every search backend implements"""
+
+    def index(self, event):
+        pass
+
+    def index_many(self, events):
+        for event in events:
+            self.index(event)
+
+    def remove(self, event_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def ranked_ids(self, queryset, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        """``(event_id, rank)`` pairs for ``query`` within ``queryset``, after a cursor"""
+        raise NotImplementedError
+
+    def _candidates(self, queryset):
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        return sql, list(params)
+
+    def _run(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table keyed by event id, ranked with bm25 (title weighted highest)"""
+    RANK = f'bm25({FTS_TABLE}, 10.0, 1.0, 4.0)'
+
+    def index(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [event.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)',
+                [event.pk, event.title, event.description, event.location],
+            )
+
+    def index_many(self, events):
+        pks = [event.pk for event in events]
+        if not pks:
+            return
+        placeholders = ', '.join(['%s'] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', pks)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, location) '
+                f'SELECT id, title, description, location FROM events_event WHERE id IN ({placeholders})',
+                pks,
+            )
+
+    def remove(self, event_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [event_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, location) '
+                f'SELECT id, title, description, location FROM events_event'
+            )
+
+    @staticmethod
+    def match_expression(tokens):
+        # Every term must match, each as a prefix
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def ranked_ids(self, queryset, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        candidates, params = self._candidates(queryset)
+        sql = (
+            f'SELECT id, rank FROM ('
+            f'SELECT rowid AS id, {self.RANK} AS rank FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({candidates})'
+            f')'
+        )
+        params = [self.match_expression(tokens)] + params
+        if after is not None:
+            sql += ' WHERE rank > %s OR (rank = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, id LIMIT %s'
+        return self._run(sql, params + [limit])
+
+
+class MySQLSearchBackend(SearchBackend):
+    """Boolean-mode FULLTEXT search; the score is negated so lower ranks first"""
+    MATCH = f'MATCH ({", ".join(SEARCH_COLUMNS)}) AGAINST (%s IN BOOLEAN MODE)'
+
+    @staticmethod
+    def match_expression(tokens):
+        return ' '.join(f'+{token}*' for token in tokens)
+
+    def ranked_ids(self, queryset, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        candidates, params = self._candidates(queryset)
+        expression = self.match_expression(tokens)
+        sql = (
+            f'SELECT id, rank_ FROM ('
+            f'SELECT id, -{self.MATCH} AS rank_ FROM events_event '
+            f'WHERE {self.MATCH} AND id IN ({candidates})'
+            f') AS ranked'
+        )
+        params = [expression, expression] + params
+        if after is not None:
+            sql += ' WHERE rank_ > %s OR (rank_ = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank_, id LIMIT %s'
+        return self._run(sql, params + [limit])
+
+
+class BasicSearchBackend(SearchBackend):
+    """Unranked substring matching for databases without a full-text index"""
+
+    def ranked_ids(self, queryset, query, after=None, limit=DEFAULT_PAGE_SIZE):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(title__icontains=token) | Q(description__icontains=token) | Q(location__icontains=token)
+            )
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after[1])
+        return [(pk, 0.0) for pk in queryset.order_by('pk').values_list('pk', flat=True)[:limit]]
+
+
+_fts_available = None
+
+
+def fts_available():
+    """Whether the FTS5 table exists (it is skipped if SQLite lacks FTS5)"""
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            _fts_available = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_available
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite' and fts_available():
+        return SQLiteSearchBackend()
+    if connection.vendor == 'mysql':
+        return MySQLSearchBackend()
+    return BasicSearchBackend()
+
+
+def index_event(event):
+    get_search_backend().index(event)
+
+
+def index_events(events):
+    get_search_backend().index_many(events)
+
+
+def remove_event(event_id):
+    get_search_backend().remove(event_id)
+
+
+def parse_cursor(value):
+    """``'<rank>_<id>'`` -> ``(rank, id)``, or ``None`` if missing or malformed"""
+    try:
+        rank, pk = value.rsplit('_', 1)
+        return float(rank), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_cursor(rank, pk):
+    return f'{rank!r}_{pk}'
+
+
+def search_events(queryset, query, after=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of ranked events matching ``query``, and the next page's cursor"""
+    ranked = get_search_backend().ranked_ids(queryset, query, parse_cursor(after), limit + 1)
+    page = ranked[:limit]
+    events = queryset.in_bulk([pk for pk, _ in page])
+    results = [events[pk] for pk, _ in page if pk in events]
+    next_cursor = format_cursor(page[-1][1], page[-1][0]) if len(ranked) > limit else None
+    return results, next_cursor
@@ -0,0 +1,259 @@
+"""Run work outside the request/response cycle.
+
+Work is queued as ``Job`` rows and run by ``manage.py run_workers``; no
+broker is needed. ``enqueue`` writes the row in the caller's transaction, so
+a worker picks the job up exactly when the data it refers to commits, and
+never if it rolls back. A job carrying a ``dedup_key`` is not queued again
+while an earlier one with the same key is still waiting; the waiting job
+is brought forward if the new one was due sooner. Waiting jobs also carry
+the key in ``pending_dedup_key``, a unique column cleared when a worker
+claims them, so the rule holds on backends without partial indexes.
+
+``run_workers`` starts ``EVENTS_JOB_QUEUES[queue]`` worker processes for
+each queue, so a queue runs that many jobs at a time per supervisor; the
+limit is not shared, and two supervisors on one database run twice as
+many. Failed jobs are retried with exponential backoff
+until ``max_attempts``. A worker refreshes a running job's ``heartbeat_at``
+while it runs, and jobs whose heartbeat is older than ``EVENTS_JOB_TIMEOUT``
+seconds, because their worker died, are handed back; long jobs keep theirs.
+
+With ``EVENTS_BACKGROUND_TASKS_EAGER`` set, no row is written and the call
+runs inline after commit, which keeps management commands deterministic.
+Delayed calls are dropped in that mode, as nothing would run them later.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUES = {'default': 1}
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+DEFAULT_TIMEOUT = 15 * 60
+DEFAULT_RETENTION_DAYS = 7
+
+
+def get_queues():
+    """``{queue: concurrency}`` for every configured queue"""
+    return getattr(settings, 'EVENTS_JOB_QUEUES', DEFAULT_QUEUES)
+
+
+def task_path(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, args=(), kwargs=None, queue='default', dedup_key=None, event_id=None,
+            max_attempts=DEFAULT_MAX_ATTEMPTS, delay=0):
+    """Queue ``func(*args, **kwargs)`` and return its ``Job`` (``None`` when run eagerly).
+
+    ``func`` is a module-level function or its dotted path; arguments must be
+    JSON serializable.
+    """
+    kwargs = kwargs or {}
+    if getattr(settings, 'EVENTS_BACKGROUND_TASKS_EAGER', False):
+        if delay:
+            return None
+        target = import_string(task_path(func))
+        transaction.on_commit(lambda: _run_eagerly(target, args, kwargs))
+        return None
+
+    job = Job(
+        queue=queue, task=task_path(func), args=list(args), kwargs=kwargs, dedup_key=dedup_key,
+        pending_dedup_key=dedup_key, event_id=event_id, max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    if dedup_key is None:
+        job.save()
+        return job
+    existing = Job.objects.filter(pending_dedup_key=dedup_key).first()
+    if existing is not None:
+        if existing.run_after > job.run_after:
+            Job.objects.filter(pk=existing.pk, status='pending').update(run_after=job.run_after)
+            existing.run_after = job.run_after
+        return existing
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Another request queued the same key in the meantime
+        return Job.objects.filter(pending_dedup_key=dedup_key).first()
+    return job
+
+
+def enqueue_many(func, calls, queue='default', max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Queue one job per ``(args, dedup_key, event_id)`` in ``calls`` with a single insert.
+
+    Calls whose dedup key already has a pending job are skipped.
+    """
+    path = task_path(func)
+    if getattr(settings, 'EVENTS_BACKGROUND_TASKS_EAGER', False):
+        target = import_string(path)
+        for args, _, _ in calls:
+            transaction.on_commit(partial(_run_eagerly, target, args, {}))
+        return
+    Job.objects.bulk_create([
+        Job(
+            queue=queue, task=path, args=list(args), dedup_key=dedup_key, pending_dedup_key=dedup_key,
+            event_id=event_id, max_attempts=max_attempts,
+        )
+        for args, dedup_key, event_id in calls
+    ], ignore_conflicts=True)
+
+
+def _run_eagerly(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', task_path(func))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``, doubling each time, with jitter"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_job(queues, worker=None):
+    """Mark the next due job in ``queues`` as running and return it, or ``None``"""
+    worker = worker or worker_name()
+    candidates = (
+        Job.objects
+        .filter(queue__in=queues, status='pending', run_after__lte=timezone.now())
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:5]
+    )
+    for pk in candidates:
+        # The status check makes the claim safe against other workers
+        now = timezone.now()
+        # Clearing the key lets the same work be queued again while this runs
+        if Job.objects.filter(pk=pk, status='pending').update(
+            status='running', pending_dedup_key=None, locked_by=worker, started_at=now, heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        ):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def heartbeat_interval():
+    return getattr(settings, 'EVENTS_JOB_TIMEOUT', DEFAULT_TIMEOUT) / 3
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """Refresh ``job``'s heartbeat from a side thread until the block exits"""
+    interval = interval or heartbeat_interval()
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                try:
+                    Job.objects.filter(pk=job.pk, status='running').update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.warning('Could not refresh the heartbeat of job %s', job.pk, exc_info=True)
+        finally:
+            # The thread has its own connection
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job):
+    """Call a claimed job's task and record the outcome"""
+    try:
+        with heartbeat(job):
+            import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s (%s) failed on attempt %s:\n%s', job.pk, job.task, job.attempts, error)
+        return _retry_or_fail(job, error, backoff(job.attempts))
+    Job.objects.filter(pk=job.pk).update(status='succeeded', finished_at=timezone.now(), locked_by='')
+    return True
+
+
+def _retry_or_fail(job, error, delay):
+    """Put a running job back in its queue after ``delay`` seconds, or give up on it"""
+    running = Job.objects.filter(pk=job.pk, status='running')
+    failed = {'status': 'failed', 'finished_at': timezone.now(), 'last_error': error, 'locked_by': ''}
+    if job.attempts >= job.max_attempts:
+        running.update(**failed)
+        return False
+    try:
+        with transaction.atomic():
+            running.update(
+                status='pending', pending_dedup_key=F('dedup_key'), run_after=timezone.now() + timedelta(seconds=delay),
+                last_error=error, locked_by='',
+            )
+    except IntegrityError:
+        # A newer pending job with the same dedup key already covers the retry
+        running.update(**failed)
+    return False
+
+
+def requeue_stale_jobs():
+    """Hand back jobs whose worker stopped without finishing them"""
+    timeout = getattr(settings, 'EVENTS_JOB_TIMEOUT', DEFAULT_TIMEOUT)
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=timezone.now() - timedelta(seconds=timeout))
+    for job in stale:
+        _retry_or_fail(job, 'Worker stopped before the job finished', 0)
+    return len(stale)
+
+
+def prune_finished_jobs():
+    days = getattr(settings, 'EVENTS_JOB_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(
+        status__in=['succeeded', 'failed'], finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def work(queues, once=False, poll_interval=1.0, stop=None, sleep=None):
+    """Run jobs from ``queues`` one at a time; returns how many ran.
+
+    With ``once`` it stops when no job is due, otherwise it polls until
+    ``stop()`` returns true.
+    """
+    sleep = sleep or time.sleep
+    worker = worker_name()
+    processed = 0
+    while not (stop and stop()):
+        close_old_connections()
+        job = claim_job(queues, worker)
+        if job is None:
+            if once:
+                break
+            sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    close_old_connections()
+    return processed
@@ -1,3 +1,1444 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import shutil
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, default_storage
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import PdfParser
+
+from . import urls as event_urls
+from .answers import MAX_DISTRIBUTION_BUCKETS, backfill_values, pack_answers, question_summary, unpack_answers
+from .archive import archive_event, purge_event
+from .badges import BADGES_PER_PAGE, write_badges
+from .exports import PARTICIPANT_COLUMNS, export_participants as stream_participant_export
+from .facets import AttendeeFilter, facet_counts, filter_attendees
+from .forms import DynamicParticipantForm
+from .insights import aggregate_participants, generate_event_insights, schedule_event_insights
+from .cloning import clone_event, series_dates
+from .chat import ChatBackend, answer_query, build_context, estimate_tokens
+from .management.commands.run_workers import Command as RunWorkersCommand
+from .metrics import RequestMetrics, record_request, registry as metrics_registry
+from .outbox import build_email, drain_outbox, queue_email, queue_event_reminders
+from .profiling import list_profiles, profile_token
+from .qr import (
+    checkin_token, generate_event_qr, payload_hash, qr_code_name, qr_code_pending, qr_code_url, registration_url,
+    save_qr_png, schedule_qr_code,
+)
+from .rollups import summarize_rollups
+from .querywatch import NPlusOneError, QueryInspector
+from .ratelimit import local_store
+from .search import search_events
+from .tasks import backoff, claim_job, enqueue, enqueue_many, heartbeat, requeue_stale_jobs, work
+from .models import (
+    Host, Event, EventStats, EventTemplate, OnboardingQuestion, Participant, QuestionResponse, PublicQuestion,
+    QuestionVote, ParticipantMatch, EventInsight, ChatQuery, Job, OutboundEmail, EventArchive, EventRollup
+)
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+TEST_PROFILE_DIR = os.path.join(TEST_MEDIA_ROOT, 'profiles')
+# Fail any request that repeats a query shape, as an N+1 loop would
+STRICT_QUERIES = {
+    'EVENTS_QUERY_INSPECTION': True,
+    'EVENTS_N_PLUS_ONE_THRESHOLD': 3,
+    'EVENTS_N_PLUS_ONE_RAISE': True,
+}
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+class QueryBudgetMixin:
+    """Assert a block of code stays within a maximum number of queries"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, label=''):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f'{label} ran {executed} queries, budget is {budget}:\n{queries}')
+
+
+class EventDataMixin:
+    """Several events with enough related rows to expose per-row queries"""
+    EVENTS = 3
+    PARTICIPANTS_PER_EVENT = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('create_templates', stdout=StringIO())
+        cls.template = EventTemplate.objects.get(template_type='tech_meetup')
+        cls.user = User.objects.create_user('host', 'host@example.com', 'password')
+        cls.host = Host.objects.create(user=cls.user, name='Host', email='host@example.com')
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+        cls.events = []
+        for i in range(cls.EVENTS):
+            event = Event.objects.create(
+                host=cls.host,
+                title=f'Meetup {i}',
+                description='Monthly meetup',
+                date=timezone.now() + timedelta(days=i + 1),
+                status='published',
+                template=cls.template,
+                max_participants=50,
+            )
+            cls.events.append(event)
+            questions = []
+            for template_question in cls.template.template_questions.all():
+                template_question.pk = None
+                template_question.event = event
+                template_question.template = None
+                template_question.save()
+                questions.append(template_question)
+
+            participants = []
+            for j in range(cls.PARTICIPANTS_PER_EVENT):
+                participant = Participant.objects.create(
+                    event=event,
+                    first_name='Attendee',
+                    last_name=str(j),
+                    email=f'attendee{j}@example.com',
+                    status='registered' if j % 3 else 'waitlisted',
+                    skills='Python, Go',
+                    interests='AI',
+                    role='Engineer',
+                    industry='FinTech',
+                    experience_years=j,
+                )
+                participants.append(participant)
+                for question in questions:
+                    QuestionResponse.objects.create(participant=participant, question=question, answer='Answer')
+
+            for j, participant in enumerate(participants[:3]):
+                question = PublicQuestion.objects.create(
+                    event=event, participant=participant, question_text=f'Question {j}?'
+                )
+                QuestionVote.objects.create(question=question, participant=participants[-1])
+            ParticipantMatch.objects.create(
+                event=event, participant1=participants[0], participant2=participants[1],
+                match_score=0.9, match_reasons='Shared skills'
+            )
+            EventInsight.objects.create(
+                event=event, insight_type='skill_distribution', title='Top skills', content='{}'
+            )
+            ChatQuery.objects.create(event=event, user=cls.user, query='Who is coming?', response='Everyone')
+
+        cls.event = cls.events[0]
+        cls.public_question = cls.event.public_questions.first()
+
+    def registration_data(self, event):
+        data = {
+            'first_name': 'New',
+            'last_name': 'Attendee',
+            'email': 'new@example.com',
+        }
+        for question in event.onboarding_questions.all():
+            field = f'question_{question.id}'
+            choices = question.get_choices_list()
+            if question.question_type == 'checkboxes':
+                data[field] = choices[:2]
+            elif question.question_type == 'multiple_choice':
+                data[field] = choices[0]
+            else:
+                data[field] = 'Answer'
+        return data
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, EVENTS_PROFILE_DIR=TEST_PROFILE_DIR, **STRICT_QUERIES)
+class URLQueryBudgetTests(EventDataMixin, QueryBudgetMixin, TestCase):
+    """Every page has a query budget that must not grow with the data"""
+
+    # url name -> (method, maximum queries)
+    URL_BUDGETS = {
+        'home': ('get', 2),
+        'event_list': ('get', 2),
+        'event_public_detail': ('get', 1),
+        'event_registration': ('get', 2),
+        'event_qa': ('get', 2),
+        'host_register': ('get', 0),
+        'login': ('get', 0),
+        'logout': ('post', 4),
+        'host_dashboard': ('get', 5),
+        'host_analytics': ('get', 4),
+        'host_jobs': ('get', 5),
+        'host_profile': ('get', 3),
+        'create_event': ('get', 4),
+        'event_detail': ('get', 6),
+        'edit_event': ('get', 4),
+        'clone_event': ('get', 3),
+        'manage_questions': ('get', 4),
+        'event_attendees': ('get', 10),
+        'event_chat': ('get', 4),
+        'export_participants': ('get', 6),
+        'event_badges': ('get', 8),
+        'vote_question': ('post', 13),
+        'event_qr': ('get', 1),
+        'participant_qr': ('get', 0),
+        'participant_checkin': ('get', 3),
+        'rate_limit_metrics': ('get', 2),
+        'metrics': ('get', 2),
+        'profile_list': ('get', 2),
+        'profile_download': ('get', 2),
+    }
+
+    STAFF_URLS = {'rate_limit_metrics', 'metrics', 'profile_list', 'profile_download'}
+    HOST_URLS = {
+        'logout', 'host_dashboard', 'host_analytics', 'host_jobs', 'host_profile', 'create_event', 'event_detail',
+        'edit_event', 'clone_event', 'manage_questions', 'event_attendees', 'event_chat',
+        'export_participants', 'event_badges', 'participant_checkin',
+    }
+
+    def url_for(self, name):
+        if name == 'vote_question':
+            return reverse(name, args=[self.public_question.pk])
+        if name == 'profile_download':
+            os.makedirs(TEST_PROFILE_DIR, exist_ok=True)
+            with open(os.path.join(TEST_PROFILE_DIR, 'budget.html'), 'wb'):
+                pass
+            return reverse(name, args=['budget.html'])
+        if name == 'event_qr':
+            return reverse(name, args=[self.event.pk, 'svg'])
+        if name == 'participant_qr':
+            return reverse(name, args=[checkin_token(self.public_question.participant_id), 'png'])
+        if name == 'participant_checkin':
+            return reverse(name, args=[checkin_token(self.public_question.participant_id)])
+        if name in {'event_public_detail', 'event_registration', 'event_qa', 'event_detail',
+                    'edit_event', 'clone_event', 'manage_questions', 'event_attendees', 'event_chat',
+                    'export_participants', 'event_badges'}:
+            return reverse(name, args=[self.event.pk])
+        return reverse(name)
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in event_urls.urlpatterns if pattern.name}
+        self.assertEqual(names - set(self.URL_BUDGETS), set())
+
+    def test_url_query_budgets(self):
+        for name, (method, budget) in self.URL_BUDGETS.items():
+            with self.subTest(url=name):
+                self.client.logout()
+                if name in self.STAFF_URLS:
+                    self.client.force_login(self.staff)
+                elif name in self.HOST_URLS:
+                    self.client.force_login(self.user)
+                data = {'email': 'attendee0@example.com'} if method == 'post' else None
+                url = self.url_for(name)
+                with self.assertMaxQueries(budget, label=url):
+                    response = getattr(self.client, method)(url, data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400, url)
+
+    def test_event_search_budget(self):
+        with self.assertMaxQueries(2, label='event search'):
+            response = self.client.get(reverse('event_list'), {'search': 'meet'})
+        self.assertEqual(len(response.context['event_cards']), self.EVENTS)
+
+    def test_public_pages_are_served_from_cache(self):
+        urls = [reverse('home'), reverse('event_list'), reverse('event_public_detail', args=[self.event.pk])]
+        for url in urls:
+            self.client.get(url)
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertMaxQueries(0, label=url):
+                    self.client.get(url)
+
+    def test_cached_pages_change_with_the_data(self):
+        url = reverse('event_public_detail', args=[self.event.pk])
+        self.assertContains(self.client.get(url), self.event.title)
+        registered = EventStats.objects.get(event=self.event).registered_count
+        Participant.objects.create(event=self.event, first_name='Late', last_name='Comer', email='late@example.com')
+        self.event.title = 'Renamed meetup'
+        self.event.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed meetup')
+        self.assertContains(response, f'{registered + 1} Registered')
+        self.assertContains(self.client.get(reverse('home')), 'Renamed meetup')
+
+    def test_registration_post_budget(self):
+        event = self.event
+        data = self.registration_data(event)
+        with self.assertMaxQueries(21, label='registration POST'):
+            response = self.client.post(reverse('event_registration', args=[event.pk]), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Participant.objects.filter(event=event, email='new@example.com').exists())
+
+    @override_settings(EVENTS_PACKED_ANSWERS=True)
+    def test_packed_registration_post_budget(self):
+        event = self.event
+        data = self.registration_data(event)
+        with self.assertMaxQueries(20, label='packed registration POST'):
+            response = self.client.post(reverse('event_registration', args=[event.pk]), data)
+        self.assertEqual(response.status_code, 200)
+        participant = Participant.objects.get(event=event, email='new@example.com')
+        self.assertFalse(participant.responses.exists())
+        answers = participant.get_answers()
+        self.assertEqual(len(answers), event.onboarding_questions.count())
+        self.assertEqual(answers[event.onboarding_questions.get(maps_to_field='role').pk], participant.role)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, **STRICT_QUERIES)
+class AdminChangelistQueryBudgetTests(EventDataMixin, QueryBudgetMixin, TestCase):
+    """Admin changelists must not issue a query per listed row"""
+
+    CHANGELIST_BUDGET = 8
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_changelist_query_budgets(self):
+        from django.contrib import admin
+        for model in admin.site._registry:
+            if model._meta.app_label != 'events':
+                continue
+            url = reverse(f'admin:events_{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__):
+                with self.assertMaxQueries(self.CHANGELIST_BUDGET, label=url):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class RecordingBackend(ChatBackend):
+    """Backend that remembers what it was asked"""
+
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, event, query, context):
+        self.calls.append((query, context))
+        return 'Backend answer'
+
+
+class ContextBackend(ChatBackend):
+    """Backend that answers with the context it was given"""
+
+    def complete(self, event, query, context):
+        return context
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ChatQueryTests(EventDataMixin, TestCase):
+    """Common questions are answered from the database, the rest from the backend"""
+
+    def ask(self, query, backend=None):
+        return answer_query(self.event, self.user, query, backend=backend or RecordingBackend())
+
+    def test_common_intents_skip_the_backend(self):
+        backend = RecordingBackend()
+        cases = {
+            'How many people are waitlisted?': '2 waitlisted participants.',
+            'How many attendees work in fintech?': '6 participants working in fintech.',
+            'How many people know Python with more than 3 years of experience?':
+                '2 participants skilled in python with 4+ years of experience.',
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.ask(query, backend).response, expected)
+        self.assertIn('Attendee 1', self.ask('Who knows Go?', backend).response)
+        self.assertTrue(self.ask('What are the top skills?', backend).response.startswith('Top skills: Go'))
+        self.assertEqual(backend.calls, [])
+
+    def test_open_questions_use_the_backend_and_are_cached(self):
+        backend = RecordingBackend()
+        first = self.ask('What should I plan for?', backend)
+        second = self.ask('what should I plan for', backend)
+        self.assertEqual(first.response, 'Backend answer')
+        self.assertEqual(len(backend.calls), 1)
+        self.assertTrue(second.cached)
+        self.assertEqual(ChatQuery.objects.filter(event=self.event, query__icontains='plan').count(), 2)
+
+        Participant.objects.create(event=self.event, first_name='Late', last_name='Comer', email='late@example.com')
+        self.ask('What should I plan for?', backend)
+        self.assertEqual(len(backend.calls), 2)
+
+    def test_cached_answers_follow_event_data(self):
+        generate_event_insights(self.event)
+        first = self.ask('Summarize the crowd', ContextBackend())
+        self.assertTrue(self.ask('Summarize the crowd', ContextBackend()).cached)
+
+        insight = self.event.insights.get(insight_type='industry_spread')
+        insight.content = json.dumps({'items': [{'label': 'Robotics', 'count': 6}]})
+        insight.save()
+        second = self.ask('Summarize the crowd', ContextBackend())
+        self.assertFalse(second.cached)
+        self.assertIn('Robotics (6)', second.response)
+        self.assertNotEqual(first.response, second.response)
+
+        for change in (
+            lambda: OnboardingQuestion.objects.create(event=self.event, question_text='Diet?', question_type='short_text'),
+            lambda: PublicQuestion.objects.filter(event=self.event).first().save(),
+            lambda: self.event.participants.first().save(),
+        ):
+            change()
+            self.assertFalse(self.ask('Summarize the crowd', ContextBackend()).cached)
+
+    def test_context_stays_within_budget(self):
+        context = build_context(self.event, max_tokens=40)
+        self.assertLessEqual(estimate_tokens(context), 41)
+        self.assertIn(self.event.title, context)
+
+
+@override_settings(EVENTS_RATE_LIMITS={'event_registration': {'ip': (2, 60)}})
+class RateLimitTests(EventDataMixin, TestCase):
+    """Clients over their budget get a 429 until the last minute has room again"""
+
+    def setUp(self):
+        caches['default'].clear()
+        local_store.clear()
+        self.url = reverse('event_registration', args=[self.event.pk])
+
+    def get_at(self, now):
+        with patch('events.ratelimit.time.time', return_value=now):
+            return self.client.get(self.url)
+
+    def test_limit_sheds_with_retry_after_and_recovers(self):
+        self.assertEqual(self.get_at(6000.0).status_code, 200)
+        self.assertEqual(self.get_at(6000.0).status_code, 200)
+        response = self.get_at(6000.0)
+        self.assertEqual(response.status_code, 429)
+        # Both requests weigh on the next window until half of it has passed
+        self.assertEqual(response['Retry-After'], '90')
+        self.assertEqual(self.get_at(6045.5)['Retry-After'], '45')
+        self.assertEqual(self.get_at(6060.0)['Retry-After'], '30')
+        # Shed requests were not counted, so the budget returns on time
+        self.assertEqual(self.get_at(6090.0).status_code, 200)
+        self.assertEqual(self.get_at(6090.0).status_code, 429)
+
+    def test_no_double_burst_across_a_window_boundary(self):
+        self.assertEqual(self.get_at(6059.0).status_code, 200)
+        self.assertEqual(self.get_at(6059.0).status_code, 200)
+        self.assertEqual(self.get_at(6061.0).status_code, 429)
+        self.assertEqual(self.get_at(6061.0).status_code, 429)
+
+    @override_settings(EVENTS_RATE_LIMIT_CACHE='missing')
+    def test_cache_failure_is_logged_and_counted_locally(self):
+        with self.assertLogs('events.ratelimit', 'WARNING'):
+            for _ in range(2):
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(self.client.get(self.url).status_code, 429)
+
+
+class InsightTests(EventDataMixin, TestCase):
+    """Insight payloads match the participants they were built from"""
+
+    def test_payloads_from_fixture(self):
+        payloads = aggregate_participants([
+            ('Python, Go', 'AI, Music', 'Engineer', 'FinTech', 2),
+            ('Python', 'AI, Music', 'Engineer', 'Health', 6),
+            ('Go', 'Art', 'Designer', '', None),
+        ])
+
+        def counts(payload):
+            return {item['label']: item['count'] for item in payload['items']}
+
+        self.assertEqual(counts(payloads['skill_distribution']), {'Python': 2, 'Go': 2})
+        self.assertEqual(counts(payloads['industry_spread']), {'FinTech': 1, 'Health': 1})
+        self.assertEqual(counts(payloads['interests_analysis']), {'AI': 2, 'Music': 2, 'Art': 1})
+        experience = payloads['experience_levels']
+        self.assertEqual(
+            {label: count for label, count in counts(experience).items() if count},
+            {'1-3 years': 1, '5-8 years': 1, 'Not specified': 1},
+        )
+        self.assertEqual(experience['average_years'], 4.0)
+        # The first two attendees share two interests, so their pair counts twice
+        self.assertEqual(payloads['networking_potential'], {
+            'participants': 3,
+            'interest_cooccurrences': 2,
+            'interest_overlap': 0.667,
+            'industry_diversity': 1.0,
+            'role_diversity': 0.918,
+            'score': 86,
+        })
+
+    def test_generate_skips_cancelled_participants(self):
+        self.event.participants.filter(last_name='0').update(status='cancelled')
+        insights = generate_event_insights(self.event)
+        self.assertEqual(len(insights), 5)
+        skills = self.event.insights.get(insight_type='skill_distribution').get_data()
+        self.assertEqual(skills['total'], self.PARTICIPANTS_PER_EVENT - 1)
+        self.assertEqual(skills['items'][0]['count'], self.PARTICIPANTS_PER_EVENT - 1)
+
+    @override_settings(EVENTS_INSIGHTS_BATCH_SIZE=3)
+    def test_schedule_runs_on_first_and_every_batch(self):
+        caches['default'].clear()
+        Job.objects.all().delete()
+        scheduled = [schedule_event_insights(self.event.pk) for _ in range(4)]
+        self.assertEqual(scheduled, [True, False, True, False])
+        self.assertTrue(schedule_event_insights(self.event.pk, force=True))
+        self.assertEqual(Job.objects.filter(queue='insights', status='pending').count(), 1)
+
+
+class EventStatsTests(EventDataMixin, TestCase):
+    """Stats counters follow every participant write that goes through the model"""
+
+    def assertStatsMatchParticipants(self, event):
+        stats = EventStats.objects.get(event=event)
+        for status, field in EventStats.STATUS_FIELDS.items():
+            self.assertEqual(getattr(stats, field), event.participants.filter(status=status).count(), field)
+
+    def test_counters_follow_register_waitlist_cancel_and_delete(self):
+        event = self.event
+        self.assertStatsMatchParticipants(event)
+        registered = Participant.objects.create(
+            event=event, first_name='New', last_name='One', email='new1@example.com', status='registered',
+        )
+        waitlisted = Participant.objects.create(
+            event=event, first_name='New', last_name='Two', email='new2@example.com', status='waitlisted',
+        )
+        self.assertStatsMatchParticipants(event)
+        waitlisted.status = 'registered'
+        waitlisted.save()
+        registered.status = 'cancelled'
+        registered.save()
+        self.assertStatsMatchParticipants(event)
+        waitlisted.delete()
+        registered.delete()
+        self.assertStatsMatchParticipants(event)
+
+    def test_rebuild_repairs_queryset_updates(self):
+        event = self.event
+        event.participants.filter(status='waitlisted').update(status='attended')
+        stats = EventStats.objects.get(event=event)
+        self.assertEqual(stats.attended_count, 0)
+        EventStats.rebuild(event.pk)
+        self.assertStatsMatchParticipants(event)
+
+
+class QuestionVoteTests(EventDataMixin, TestCase):
+    """Vote responses report the stored tally, including other voters' votes"""
+
+    def test_vote_returns_total_after_concurrent_votes(self):
+        question = self.public_question
+        url = reverse('vote_question', args=[question.pk])
+        get_or_create = QuestionVote.objects.get_or_create
+
+        def vote_elsewhere_first(**kwargs):
+            # Another voter's update lands between our read and our update
+            PublicQuestion.objects.filter(pk=question.pk).update(votes=F('votes') + 1)
+            return get_or_create(**kwargs)
+
+        with patch.object(QuestionVote.objects, 'get_or_create', side_effect=vote_elsewhere_first):
+            response = self.client.post(url, {'email': 'attendee0@example.com'})
+        self.assertEqual(response.json(), {'votes': question.votes + 2, 'voted': True})
+        response = self.client.post(url, {'email': 'attendee0@example.com'})
+        self.assertEqual(response.json(), {'votes': question.votes + 1, 'voted': False})
+
+
+class ParticipantExportTests(EventDataMixin, TestCase):
+    """CSV exports put each answer under its question and never emit formulas"""
+
+    def test_csv_layout_and_formula_escaping(self):
+        event = self.event
+        first = event.onboarding_questions.first()
+        duplicate = OnboardingQuestion.objects.create(
+            event=event, question_text=first.question_text, question_type='short_text', order=999,
+        )
+        participant = event.participants.order_by('pk').first()
+        participant.first_name = '=HYPERLINK("http://example.com")'
+        participant.save()
+        QuestionResponse.objects.create(participant=participant, question=duplicate, answer='@SUM(A1:A9)')
+        QuestionResponse.objects.filter(participant=participant, question=first).update(answer='-1')
+
+        header, *rows = csv.reader(StringIO(''.join(stream_participant_export(event, 'csv'))))
+        question_texts = [question.question_text for question in event.get_onboarding_questions()]
+        self.assertEqual(
+            header, PARTICIPANT_COLUMNS + question_texts[:-1] + [f'{first.question_text} ({duplicate.pk})'],
+        )
+        self.assertEqual(len(rows), self.PARTICIPANTS_PER_EVENT)
+        row = dict(zip(header, rows[0]))
+        self.assertEqual(row['first_name'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row[first.question_text], "'-1")
+        self.assertEqual(row[f'{first.question_text} ({duplicate.pk})'], "'@SUM(A1:A9)")
+        self.assertEqual(dict(zip(header, rows[1]))[first.question_text], 'Answer')
+
+
+class EventRollupTests(EventDataMixin, TestCase):
+    """Completing an event rolls its participants up for host analytics"""
+
+    def test_completed_event_rollup_matches_participants(self):
+        event = self.events[1]
+        changes = {
+            '1': {'status': 'attended'},
+            '2': {'status': 'attended'},
+            '3': {'status': 'cancelled'},
+            '4': {'email': 'first-time@example.com'},
+        }
+        for participant in event.participants.all():
+            for field, value in changes.get(participant.last_name, {}).items():
+                setattr(participant, field, value)
+            participant.save()
+
+        Job.objects.all().delete()
+        event.status = 'completed'
+        event.save()
+        self.assertEqual(work(['rollups'], once=True), 1)
+        rollup = EventRollup.objects.get(event=event)
+        self.assertEqual(
+            (rollup.registered_count, rollup.attended_count, rollup.waitlisted_count, rollup.cancelled_count),
+            (2, 2, 1, 1),
+        )
+        # Everyone but the new email also registered for the earlier meetup
+        self.assertEqual(rollup.returning_count, 3)
+        self.assertEqual(rollup.top_skills, {'Python': 4, 'Go': 4})
+
+        summary = summarize_rollups([rollup])
+        self.assertEqual(
+            {key: summary[key] for key in ('events', 'signups', 'attendance_rate', 'no_show_rate', 'returning_rate')},
+            {'events': 1, 'signups': 4, 'attendance_rate': 50.0, 'no_show_rate': 50.0, 'returning_rate': 75.0},
+        )
+        self.assertEqual(summary['top_industries'], [('FinTech', 4)])
+        self.assertEqual(summary['trend'][0]['top_skills'], ['Python', 'Go'])
+
+
+class AttendeeFacetTests(EventDataMixin, TestCase):
+    """Tag filters match whole tags and facet counts follow the filter"""
+
+    def test_whole_tag_matching_and_counts(self):
+        event = self.event
+        for name, skills, years in (('Script', 'JavaScript', 9), ('Java', 'java, Python', 1)):
+            Participant.objects.create(
+                event=event, first_name=name, last_name='Dev', email=f'{name}@example.com',
+                skills=skills, experience_years=years,
+            )
+
+        java = filter_attendees(event, AttendeeFilter(skills=['Java']))
+        self.assertEqual(list(java.values_list('first_name', flat=True)), ['Java'])
+        both = filter_attendees(event, AttendeeFilter(skills=['Python', 'Go']))
+        self.assertEqual(both.count(), self.PARTICIPANTS_PER_EVENT)
+
+        everyone = filter_attendees(event, AttendeeFilter())
+        facets = facet_counts(event, everyone)
+        skills = {item['value'].lower(): item['count'] for item in facets['skills']}
+        self.assertEqual(skills, {'python': 7, 'go': 6, 'javascript': 1, 'java': 1})
+        # Experience 0-5 from the fixture, plus 1 and 9 years
+        self.assertEqual(
+            {item['value']: item['count'] for item in facets['experience']},
+            {'0-1': 1, '1-3': 3, '3-5': 2, '5-8': 1, '8+': 1},
+        )
+        industries = facet_counts(event, both)['industry']
+        self.assertEqual(industries, [{'value': 'FinTech', 'count': self.PARTICIPANTS_PER_EVENT}])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class EventSearchTests(TestCase):
+    """Ranked, prefix-matching search kept in step with event writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('host', 'host@example.com', 'password')
+        cls.host = Host.objects.create(user=user, name='Host', email='host@example.com')
+
+    def create_event(self, title, description='', days=1):
+        return Event.objects.create(
+            host=self.host, title=title, description=description, status='published',
+            date=timezone.now() + timedelta(days=days),
+        )
+
+    def search(self, query, after=None, limit=10):
+        return search_events(Event.objects.all(), query, after=after, limit=limit)
+
+    def test_title_matches_rank_first_and_prefixes_match(self):
+        in_description = self.create_event('Evening talks', 'All about Python packaging')
+        in_title = self.create_event('Python Meetup')
+        events, _ = self.search('pyth')
+        self.assertEqual(events, [in_title, in_description])
+
+    def test_keyset_pagination_covers_every_match_once(self):
+        created = {self.create_event(f'Data night {i}', days=i + 1) for i in range(7)}
+        seen = []
+        cursor = None
+        while True:
+            events, cursor = self.search('data', after=cursor, limit=3)
+            seen.extend(events)
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), created)
+
+    def test_index_follows_save_and_delete(self):
+        event = self.create_event('Cloud summit')
+        event.title = 'Edge summit'
+        event.save()
+        self.assertEqual(self.search('cloud')[0], [])
+        self.assertEqual(self.search('edge')[0], [event])
+        event.delete()
+        self.assertEqual(self.search('edge')[0], [])
+
+
+class RemoteStorage(Storage):
+    """Storage without local paths, like S3"""
+
+    def __init__(self):
+        self.files = {}
+
+    def _save(self, name, content):
+        self.files[name] = content.read()
+        return name
+
+    def exists(self, name):
+        return name in self.files
+
+    def url(self, name):
+        return f'https://cdn.example.com/{name}'
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class QRCodeTests(EventDataMixin, QueryBudgetMixin, TestCase):
+    """On-demand QR codes are cacheable and check participants in"""
+
+    def test_event_qr_etag_and_formats(self):
+        url = reverse('event_qr', args=[self.event.pk, 'svg'])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('max-age', response['Cache-Control'])
+        with self.assertMaxQueries(0, label='conditional QR request'):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get(reverse('event_qr', args=[self.event.pk, 'png']))['Content-Type'], 'image/png')
+        self.assertEqual(self.client.get(reverse('event_qr', args=[self.event.pk, 'gif'])).status_code, 404)
+
+        def etag(qr_format, scale):
+            return self.client.get(reverse('event_qr', args=[self.event.pk, qr_format]), {'scale': scale})['ETag']
+
+        self.assertEqual(etag('svg', 5), etag('svg', 20))
+        self.assertNotEqual(etag('png', 5), etag('png', 20))
+
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_stored_codes_are_scheduled_once_and_content_addressed(self):
+        event = self.event
+        Job.objects.all().delete()
+        self.assertTrue(schedule_qr_code(event))
+        self.assertTrue(schedule_qr_code(event))
+        self.assertEqual(Job.objects.filter(queue='qr', status='pending').count(), 1)
+
+        name, digest = generate_event_qr(event.pk)
+        self.assertEqual((name, digest), (qr_code_name(payload_hash(registration_url(event.pk))), digest))
+        event.refresh_from_db()
+        self.assertEqual((event.qr_code.name, event.qr_code_hash), (name, digest))
+        self.assertFalse(schedule_qr_code(event))
+        self.assertEqual(qr_code_url(event), default_storage.url(name))
+        with patch('events.qr.render_qr_png') as render:
+            self.assertEqual(generate_event_qr(event.pk), (name, digest))
+        render.assert_not_called()
+        self.assertEqual(
+            [entry for entry in os.listdir(os.path.dirname(default_storage.path(name))) if entry.endswith('.tmp')], [],
+        )
+
+    def test_remote_storage_name_is_authoritative(self):
+        digest = payload_hash('remote')
+        storage = RemoteStorage()
+        storage.save(qr_code_name(digest), ContentFile(b'taken'))
+        with patch('events.qr.default_storage', storage):
+            name = save_qr_png(digest, b'png')
+            self.assertNotEqual(name, qr_code_name(digest))
+            Event.objects.filter(pk=self.event.pk).update(qr_code=name, qr_code_hash=digest)
+            with patch('events.qr.payload_hash', return_value=digest):
+                self.assertEqual(qr_code_url(Event.objects.get(pk=self.event.pk)), storage.url(name))
+
+    def test_participant_checkin(self):
+        participant = self.event.participants.filter(status='registered').first()
+        token = checkin_token(participant.pk)
+        self.assertEqual(self.client.get(reverse('participant_qr', args=[token + 'x', 'svg'])).status_code, 404)
+        self.client.force_login(self.user)
+        self.client.post(reverse('participant_checkin', args=[token]))
+        participant.refresh_from_db()
+        self.assertEqual(participant.status, 'attended')
+        self.assertEqual(EventStats.objects.get(event=self.event).attended_count, 1)
+
+        waitlisted = self.event.participants.filter(status='waitlisted').first()
+        response = self.client.post(reverse('participant_checkin', args=[checkin_token(waitlisted.pk)]), follow=True)
+        self.assertContains(response, 'cannot be checked in')
+        waitlisted.refresh_from_db()
+        self.assertEqual(waitlisted.status, 'waitlisted')
+
+    def test_badge_sheets(self):
+        self.client.force_login(self.user)
+        url = reverse('event_badges', args=[self.event.pk])
+        Job.objects.all().delete()
+        # Rendered by a background job, not in the request
+        self.assertContains(self.client.get(url, {'format': 'pdf'}), 'Preparing badges', status_code=202)
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, 202)
+        self.assertEqual(work(['default'], once=True), 1)
+        pdf = self.client.get(url, {'format': 'pdf'})
+        self.assertEqual(pdf['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(pdf.streaming_content).startswith(b'%PDF'))
+
+        # A new registration changes the badges, so they are built again
+        Participant.objects.create(event=self.event, first_name='Late', last_name='Comer', email='late@example.com')
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, 202)
+        self.assertEqual(self.client.get(url, {'format': 'png'}).status_code, 202)
+        self.assertEqual(work(['default'], once=True), 2)
+        sheets = self.client.get(url, {'format': 'png'})
+        with zipfile.ZipFile(BytesIO(b''.join(sheets.streaming_content))) as bundle:
+            registered = self.event.participants.filter(status='registered').count()
+            self.assertEqual(len(bundle.namelist()), -(-registered // BADGES_PER_PAGE))
+        # The rebuild replaced the first PDF
+        _, files = default_storage.listdir('badges')
+        stored = sorted(name.rsplit('.', 1)[1] for name in files if name.startswith(f'event-{self.event.pk}-'))
+        self.assertEqual(stored, ['pdf', 'zip'])
+
+    def test_badge_pdf_is_written_in_one_pass(self):
+        Participant.objects.bulk_create([
+            Participant(event=self.event, first_name='Guest', last_name=str(i), email=f'guest{i}@example.com')
+            for i in range(36)
+        ])
+        pages = -(-self.event.participants.filter(status='registered').count() // BADGES_PER_PAGE)
+        output = os.path.join(tempfile.mkdtemp(dir=TEST_MEDIA_ROOT), 'badges.pdf')
+        written = []
+        with patch('PIL.PdfImagePlugin.PdfParser.PdfParser', wraps=PdfParser.PdfParser) as parser:
+            self.assertEqual(write_badges(self.event, output, progress=written.append), pages)
+        # Appending page by page would parse the growing file once per page
+        self.assertEqual(parser.call_count, 1)
+        self.assertEqual(written, list(range(1, pages + 1)))
+        with open(output, 'rb') as document:
+            self.assertEqual(len(PdfParser.PdfParser(buf=document.read()).pages), pages)
+
+
+class RegenerateQRCodesTests(EventDataMixin, TestCase):
+    """regenerate_qr_codes finds stale codes by hash and saves progress per batch"""
+
+    def setUp(self):
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=TEST_MEDIA_ROOT))
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def regenerate(self, **options):
+        output = StringIO()
+        call_command('regenerate_qr_codes', workers=1, stdout=output, **options)
+        return output.getvalue()
+
+    def stored(self):
+        return dict(Event.objects.values_list('pk', 'qr_code_hash'))
+
+    def test_stale_then_unchanged(self):
+        self.assertIn(f'{self.EVENTS} updated, {self.EVENTS} rendered', self.regenerate())
+        for pk, digest in self.stored().items():
+            self.assertEqual(digest, payload_hash(registration_url(pk)))
+        with patch('events.management.commands.regenerate_qr_codes.save_qr_png') as save:
+            self.assertIn(f'{self.EVENTS} up to date, 0 updated', self.regenerate())
+        save.assert_not_called()
+
+        # A new base URL changes every digest, although each event has a code
+        with self.settings(EVENTS_PUBLIC_BASE_URL='https://events.example.com'):
+            output = self.regenerate()
+            self.assertIn(f'{self.EVENTS} updated, {self.EVENTS} rendered', output)
+            self.assertEqual(
+                self.stored()[self.event.pk], payload_hash(registration_url(self.event.pk, 'https://events.example.com')),
+            )
+            # Saving an event afterwards finds its code current and queues nothing
+            event = Event.objects.get(pk=self.event.pk)
+            self.assertFalse(qr_code_pending(event))
+            Job.objects.all().delete()
+            event.save()
+            self.assertFalse(Job.objects.filter(queue='qr').exists())
+
+    def test_existing_images_are_reused_and_force_swaps_them_in(self):
+        self.regenerate()
+        Event.objects.filter(pk=self.event.pk).update(qr_code_hash='')
+        self.assertIn('1 updated, 0 rendered, 1 reused', self.regenerate())
+
+        name = Event.objects.get(pk=self.event.pk).qr_code.name
+        with patch('events.management.commands.regenerate_qr_codes.render_qr_png', return_value=b'new'):
+            self.assertIn(f'{self.EVENTS} updated, {self.EVENTS} rendered, 0 reused', self.regenerate(force=True))
+        with default_storage.open(name) as image:
+            self.assertEqual(image.read(), b'new')
+        directory = os.path.dirname(default_storage.path(name))
+        self.assertEqual(len(os.listdir(directory)), self.EVENTS)
+
+    def test_interrupted_run_keeps_finished_batches(self):
+        save_qr_png_before = save_qr_png
+        calls = []
+
+        def save_then_fail(digest, image):
+            calls.append(digest)
+            if len(calls) > 1:
+                raise KeyboardInterrupt
+            return save_qr_png_before(digest, image)
+
+        with patch('events.management.commands.regenerate_qr_codes.save_qr_png', side_effect=save_then_fail):
+            with self.assertRaises(KeyboardInterrupt):
+                self.regenerate(batch_size=1)
+        first = min(self.stored())
+        self.assertEqual(self.stored()[first], payload_hash(registration_url(first)))
+        self.assertIn(f'1 up to date, {self.EVENTS - 1} updated', self.regenerate())
+
+
+class QueryPlanTests(EventDataMixin, TestCase):
+    """The composite indexes serve the hot query shapes, sorting included"""
+
+    def query_shapes(self):
+        participant = self.event.participants.order_by('pk').first()
+        return {
+            'participant_event_status_idx': self.event.participants.filter(status='registered').order_by().values('pk'),
+            'participant_event_recent_idx': self.event.participants.all(),
+            'event_status_date_idx': Event.objects.filter(
+                status='published', date__gte=timezone.now()
+            ).order_by('date', 'pk').values('date', 'pk'),
+            'question_event_ranking_idx': self.event.public_questions.all(),
+            'match_event_p1_score_idx': ParticipantMatch.objects.filter(event=self.event, participant1=participant),
+        }
+
+    def test_pragmas_are_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    @staticmethod
+    def plan_cost(plan):
+        """Orders plans worst first: a table scan, then a sort, then fewer keyed columns"""
+        return ('SCAN ' in plan, 'TEMP B-TREE' in plan, -plan.count('?'))
+
+    def test_query_plans_use_composite_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite query plans only')
+        for index, queryset in self.query_shapes().items():
+            with self.subTest(index=index):
+                plan = queryset.explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+                # Without the index the migrated schema must plan the query
+                # worse, or the index is not what serves it. Dropped inside the
+                # test transaction, so it is restored afterwards; sqlite3 caches
+                # prepared statements by their text, hence the comment.
+                sql, params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP INDEX {index}')
+                    cursor.execute(f'EXPLAIN QUERY PLAN /* without {index} */ {sql}', params)
+                    without = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertLess(self.plan_cost(plan), self.plan_cost(without), without)
+
+
+class EventCapacityTests(EventDataMixin, QueryBudgetMixin, TestCase):
+    """Capacity figures are read once per event instance and refreshed on write"""
+
+    def test_snapshot_is_shared_and_invalidated(self):
+        event = Event.objects.get(pk=self.event.pk)
+        with self.assertMaxQueries(1, label='capacity snapshot'):
+            figures = [event.participant_count, event.waitlist_count, event.spots_remaining,
+                       event.fill_percent, event.is_full, event.participant_count]
+        self.assertEqual(figures, [4, 2, 46, 8, False, 4])
+
+        Participant.objects.create(event=event, first_name='New', last_name='Person', email='new@example.com')
+        self.assertEqual(event.participant_count, 5)
+        self.assertEqual(event.spots_remaining, 45)
+
+    def test_without_stats_row(self):
+        EventStats.objects.filter(event=self.event).delete()
+        event = Event.objects.get(pk=self.event.pk)
+        with self.assertMaxQueries(2, label='capacity from participants'):
+            self.assertEqual((event.participant_count, event.waitlist_count), (4, 2))
+            self.assertEqual(event.participant_count, 4)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, EVENTS_METRICS_TOKEN='scrape-token')
+class PerformanceMetricsTests(EventDataMixin, TestCase):
+    """Requests are timed into Server-Timing headers and the /metrics endpoint"""
+
+    def setUp(self):
+        metrics_registry.reset()
+
+    def test_server_timing_and_prometheus_metrics(self):
+        url = reverse('event_public_detail', args=[self.event.pk])
+        with self.settings(EVENTS_SERVER_TIMING=False):
+            self.assertFalse(self.client.get(url).has_header('Server-Timing'))
+        caches['default'].clear()
+        metrics_registry.reset()
+        with self.settings(EVENTS_SERVER_TIMING=True):
+            response = self.client.get(url)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        scrape = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(scrape.status_code, 200)
+        body = scrape.content.decode()
+        self.assertIn('eventm_http_requests_total{view="event_public_detail",status="2xx"} 1.0', body)
+        self.assertIn('eventm_http_request_duration_seconds_bucket{view="event_public_detail",le="+Inf"} 1', body)
+        self.assertIn('eventm_cache_requests_total{view="event_public_detail",result="miss"} 1.0', body)
+        self.assertIn('# TYPE eventm_ratelimit_shed_total counter', body)
+
+    def test_finished_threads_fold_into_retired_totals(self):
+        before = len(metrics_registry._shards)
+        threads = [
+            threading.Thread(target=record_request, args=('home', 200, 0.01, RequestMetrics()))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertEqual(len(metrics_registry._shards), before)
+        counters, histograms = metrics_registry.snapshot()
+        self.assertEqual(counters[('eventm_http_requests_total', (('view', 'home'), ('status', '2xx')))], 20)
+        self.assertEqual(histograms[('eventm_http_request_duration_seconds', (('view', 'home'),))][-1], 20)
+
+    def test_streaming_queries_are_counted_when_sent(self):
+        self.client.force_login(self.user)
+        with self.settings(EVENTS_SERVER_TIMING=True):
+            response = self.client.get(reverse('export_participants', args=[self.event.pk]))
+        self.assertFalse(response.has_header('Server-Timing'))
+        with CaptureQueriesContext(connection) as streamed:
+            b''.join(response.streaming_content)
+        counters, _ = metrics_registry.snapshot()
+        recorded = counters[('eventm_db_queries_total', (('view', 'export_participants'),))]
+        self.assertGreaterEqual(recorded, len(streamed) + 1)
+
+
+class QueryInspectionTests(EventDataMixin, TestCase):
+    """Repeated query shapes are reported with where they came from"""
+
+    def test_repeated_queries_are_reported(self):
+        with self.assertLogs('events.querywatch', 'WARNING'):
+            with QueryInspector('participant loop', threshold=3) as inspector:
+                for participant in Participant.objects.filter(event=self.event):
+                    participant.event.title
+        self.assertEqual(len(inspector.repeated), 1)
+        finding = next(iter(inspector.repeated.values()))
+        self.assertEqual(finding.count, self.PARTICIPANTS_PER_EVENT)
+        self.assertIn('test_repeated_queries_are_reported', finding.stack)
+
+        with self.assertLogs('events.querywatch', 'WARNING'):
+            with QueryInspector('batched', threshold=3) as inspector:
+                for pks in ([1], [1, 2], [1, 2, 3]):
+                    list(Participant.objects.filter(pk__in=pks))
+        self.assertIn('IN (...)', next(iter(inspector.repeated)))
+
+    @override_settings(**STRICT_QUERIES)
+    def test_request_fails_on_n_plus_one(self):
+        self.client.force_login(self.staff)
+        with patch('events.admin.ParticipantTagAdmin.list_select_related', []):
+            with self.assertRaises(NPlusOneError), self.assertLogs('events.querywatch', 'WARNING'):
+                self.client.get(reverse('admin:events_participanttag_changelist'))
+
+
+@override_settings(EVENTS_PROFILE_DIR=TEST_PROFILE_DIR, EVENTS_PROFILE_KEEP=2)
+class ProfilingTests(EventDataMixin, TestCase):
+    """Staff can profile a single request and browse the results"""
+
+    def setUp(self):
+        shutil.rmtree(TEST_PROFILE_DIR, ignore_errors=True)
+
+    def test_staff_trigger_and_listing(self):
+        self.client.get(reverse('home'), {'_profile': '1'})
+        self.assertEqual(list_profiles(), [])
+
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse('event_public_detail', args=[self.event.pk]), {'_profile': '1'})
+        profiles = list_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0]['view'], 'event_public_detail')
+        self.assertEqual(profiles[0]['trigger'], 'staff')
+        self.assertTrue(profiles[0]['file'].endswith('.html'))
+
+        listing = self.client.get(reverse('profile_list'))
+        self.assertContains(listing, profiles[0]['file'])
+        download = self.client.get(reverse('profile_download', args=[profiles[0]['file']]))
+        self.assertEqual(download['Content-Type'], 'text/html')
+        self.assertIn(b'pyinstrument', b''.join(download.streaming_content))
+        self.assertEqual(self.client.get(reverse('profile_download', args=['..settings.py'])).status_code, 404)
+
+    def test_signed_header_trigger(self):
+        self.client.get(reverse('home'), HTTP_X_PROFILE_TOKEN='forged')
+        self.assertEqual(list_profiles(), [])
+        self.client.get(reverse('home'), HTTP_X_PROFILE_TOKEN=profile_token())
+        self.assertEqual([profile['trigger'] for profile in list_profiles()], ['token'])
+
+
+def failing_task(event_id):
+    raise RuntimeError(f'Could not process event {event_id}')
+
+
+class JobQueueTests(EventDataMixin, TestCase):
+    """Background work is queued as rows and run by workers"""
+
+    def test_pending_jobs_are_deduplicated_and_run(self):
+        Job.objects.all().delete()
+        first = enqueue('events.rollups.build_rollup_for_event_id', args=[self.event.pk], queue='rollups',
+                        dedup_key=f'rollup:{self.event.pk}', event_id=self.event.pk)
+        second = enqueue('events.rollups.build_rollup_for_event_id', args=[self.event.pk], queue='rollups',
+                         dedup_key=f'rollup:{self.event.pk}', event_id=self.event.pk)
+        self.assertEqual(first.pk, second.pk)
+
+        self.assertEqual(work(['qr'], once=True), 0)
+        self.assertEqual(work(['rollups'], once=True), 1)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ('succeeded', 1))
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('host_jobs')), 'Succeeded')
+
+    def test_failed_jobs_back_off_then_fail(self):
+        job = enqueue(failing_task, args=[self.event.pk], max_attempts=2)
+        with self.assertLogs('events.tasks', 'WARNING'):
+            self.assertEqual(work(['default'], once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('Could not process event', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(work(['default'], once=True), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('events.tasks', 'WARNING'):
+            work(['default'], once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertLess(backoff(1), backoff(4))
+
+    def test_dedup_uses_a_plain_unique_column(self):
+        # Conditional constraints are skipped on MySQL, so none may be relied on
+        self.assertFalse([constraint for constraint in Job._meta.constraints if constraint.condition])
+        Job.objects.all().delete()
+        enqueue_many('events.rollups.build_rollup_for_event_id', [
+            ([self.event.pk], 'rollup:many', self.event.pk), ([self.event.pk], 'rollup:many', self.event.pk),
+        ], queue='rollups')
+        enqueue_many('events.rollups.build_rollup_for_event_id', [
+            ([self.event.pk], 'rollup:many', self.event.pk),
+        ], queue='rollups')
+        self.assertEqual(Job.objects.filter(dedup_key='rollup:many').count(), 1)
+
+        # Once claimed, the same work can be queued again
+        job = claim_job(['rollups'])
+        self.assertIsNone(job.pending_dedup_key)
+        again = enqueue('events.rollups.build_rollup_for_event_id', args=[self.event.pk], queue='rollups',
+                        dedup_key='rollup:many')
+        self.assertNotEqual(again.pk, job.pk)
+        self.assertEqual(again.pending_dedup_key, 'rollup:many')
+
+    def test_long_running_jobs_keep_their_claim(self):
+        enqueue(failing_task, args=[self.event.pk])
+        job = claim_job(['default'])
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(started_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'pending')
+
+        with patch('events.tasks.Job') as model:
+            with heartbeat(job, interval=0.01):
+                time.sleep(0.1)
+        model.objects.filter.assert_called_with(pk=job.pk, status='running')
+        model.objects.filter.return_value.update.assert_called()
+
+    def test_supervisor_starts_workers_through_django(self):
+        with patch('events.management.commands.run_workers.subprocess.Popen') as popen:
+            RunWorkersCommand().spawn('email', 2.0)
+        command, env = popen.call_args.args[0], popen.call_args.kwargs['env']
+        self.assertEqual(command[:4], [sys.executable, '-m', 'django', 'run_workers'])
+        self.assertEqual(command[4:], ['--worker', '--queues', 'email', '--poll-interval', '2.0'])
+        self.assertEqual(env['DJANGO_SETTINGS_MODULE'], settings.SETTINGS_MODULE)
+        self.assertEqual(env['PYTHONPATH'].split(os.pathsep)[0], str(settings.BASE_DIR))
+
+
+class SinkEmailBackend(LocmemEmailBackend):
+    """Local SMTP sink that counts connections and refuses one domain"""
+    opened = 0
+
+    def open(self):
+        SinkEmailBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].endswith('@refused.test'):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='events.tests.SinkEmailBackend', EVENTS_EMAIL_BATCH_SIZE=4, EVENTS_EMAIL_DOMAIN_RATE=0,
+)
+class OutboxTests(EventDataMixin, TestCase):
+    """Emails are queued with the change they announce and sent in batches"""
+
+    def setUp(self):
+        SinkEmailBackend.opened = 0
+
+    def test_registration_and_promotion_emails(self):
+        participant = self.event.participants.filter(status='waitlisted').first()
+        participant.status = 'registered'
+        participant.save()
+        email = OutboundEmail.objects.get(participant=participant)
+        self.assertEqual((email.kind, email.domain), ('promoted', 'example.com'))
+        self.assertIn(self.event.title, email.subject)
+        self.assertTrue(Job.objects.filter(queue='email', dedup_key='outbox', status='pending').exists())
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(drain_outbox(), {'sent': 1})
+        self.assertEqual(mail.outbox[0].to, [participant.email])
+        self.assertIn(participant.first_name, mail.outbox[0].body)
+
+    def test_reminders_reuse_one_connection_per_drain(self):
+        registered = self.event.participants.filter(status='registered')
+        self.assertEqual(queue_event_reminders(self.event.pk), registered.count())
+        self.assertEqual(queue_event_reminders(self.event.pk), 0)
+        refused = self.event.participants.filter(status='waitlisted').first()
+        refused.email = 'someone@refused.test'
+        queue_email(refused, 'reminder')
+        queue_email(refused, 'reminder')
+
+        self.assertEqual(drain_outbox(), {'sent': registered.count(), 'failed': 1})
+        self.assertEqual(SinkEmailBackend.opened, 1)
+        self.assertEqual(OutboundEmail.objects.get(to_email='someone@refused.test').status, 'failed')
+
+    def test_failed_reminder_job_is_retried_without_duplicates(self):
+        registered = self.event.participants.filter(status='registered').count()
+        job = enqueue(queue_event_reminders, args=[self.event.pk], queue='email')
+        real_build_email = build_email
+        built = []
+
+        def build_then_fail(participant, kind, event=None):
+            built.append(participant.pk)
+            if len(built) > 2:
+                raise smtplib.SMTPServerDisconnected('Template server went away')
+            return real_build_email(participant, kind, event)
+
+        with patch('events.outbox.REMINDER_CHUNK_SIZE', 2), \
+                patch('events.outbox.build_email', side_effect=build_then_fail), \
+                self.assertLogs('events.tasks', 'WARNING'):
+            work(['email'], once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        # The first chunk was committed before the failure
+        self.assertEqual(OutboundEmail.objects.filter(kind='reminder').count(), 2)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with patch('events.outbox.REMINDER_CHUNK_SIZE', 2):
+            work(['email'], once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        reminders = OutboundEmail.objects.filter(kind='reminder')
+        self.assertEqual(reminders.count(), registered)
+        self.assertEqual(reminders.values('participant').distinct().count(), registered)
+
+    @override_settings(EVENTS_EMAIL_DOMAIN_RATE=2)
+    def test_domains_are_throttled(self):
+        queued = queue_event_reminders(self.event.pk)
+        self.assertEqual(drain_outbox(), {'sent': 2, 'deferred': queued - 2})
+        deferred = OutboundEmail.objects.filter(status='pending')
+        self.assertGreater(deferred.earliest('send_after').send_after, timezone.now())
+        self.assertEqual(drain_outbox(), {})
+
+
+class EventCloningTests(EventDataMixin, QueryBudgetMixin, TestCase):
+    """Events are copied, singly or as a series, with a fixed number of queries"""
+
+    def test_weekly_series_is_created_in_bulk(self):
+        PublicQuestion.objects.create(event=self.event, question_text='What should we cover next time?')
+        questions = list(self.event.onboarding_questions.values_list('question_text', flat=True))
+        start = self.event.date + timedelta(days=7)
+        with self.assertMaxQueries(13, label='clone 52 events'):
+            clones = clone_event(self.event, series_dates(start, 52), include_qa=True)
+
+        self.assertEqual(len(clones), 52)
+        last = Event.objects.select_related('stats').get(pk=clones[-1].pk)
+        self.assertEqual((last.status, last.date), ('draft', start + timedelta(weeks=51)))
+        self.assertEqual(list(last.onboarding_questions.values_list('question_text', flat=True)), questions)
+        self.assertEqual(list(last.public_questions.values_list('question_text', flat=True)),
+                         ['What should we cover next time?'])
+        self.assertEqual((last.stats.question_count, last.stats.registered_count), (1, 0))
+        self.assertEqual(last.participants.count(), 0)
+        self.assertTrue(Job.objects.filter(queue='qr', dedup_key=f'qr:{last.pk}').exists())
+
+    def test_clone_view(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('clone_event', args=[self.event.pk]), {
+            'title': 'Meetup (encore)',
+            'date': (self.event.date + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M'),
+            'count': 1,
+            'interval_days': 7,
+        })
+        clone = Event.objects.get(title='Meetup (encore)')
+        self.assertRedirects(response, reverse('edit_event', args=[clone.pk]))
+        self.assertEqual(clone.onboarding_questions.count(), self.event.onboarding_questions.count())
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class EventArchiveTests(EventDataMixin, TestCase):
+    """Completed events are archived to a file, then purged in resumable batches"""
+
+    def test_archive_then_resume_an_interrupted_purge(self):
+        event = self.event
+        Event.objects.filter(pk=event.pk).update(status='completed')
+        event.refresh_from_db()
+        other_participants = Participant.objects.exclude(event=event).count()
+
+        archive = archive_event(event)
+        with gzip.open(archive.archive_file.path) as archived:
+            lines = [json.loads(line) for line in archived]
+        self.assertEqual(lines[1]['fields']['title'], event.title)
+        participants = [line for line in lines if line.get('model') == 'events.participant']
+        self.assertEqual(len(participants), self.PARTICIPANTS_PER_EVENT)
+        self.assertEqual(archive.row_counts['events.questionresponse'], QuestionResponse.objects.filter(
+            participant__event=event).count())
+
+        def interrupt(action, label, count):
+            if label == 'events.participant':
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            purge_event(archive, batch_size=4, progress=interrupt)
+        archive.refresh_from_db()
+        self.assertEqual((archive.status, archive.deleted_counts['events.participant']), ('purging', 4))
+
+        purge_event(archive, batch_size=4)
+        archive.refresh_from_db()
+        self.assertEqual(archive.status, 'purged')
+        self.assertEqual(archive.deleted_counts['events.participant'], self.PARTICIPANTS_PER_EVENT)
+        self.assertFalse(Event.objects.filter(pk=event.pk).exists())
+        self.assertFalse(QuestionResponse.objects.filter(participant__event_id=event.pk).exists())
+        self.assertEqual(Participant.objects.count(), other_participants)
+        rollup = EventRollup.objects.get(event_title=event.title, host=self.host)
+        self.assertIsNone(rollup.event_id)
+
+    def test_interrupted_archive_is_rewritten_in_place(self):
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=TEST_MEDIA_ROOT))
+        media.enable()
+        self.addCleanup(media.disable)
+        Event.objects.filter(pk=self.event.pk).update(status='completed')
+        self.event.refresh_from_db()
+
+        def crash(action, label, count):
+            if label == 'events.chatquery':
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            archive_event(self.event, progress=crash)
+        self.assertEqual(EventArchive.objects.get(original_event_id=self.event.pk).status, 'archiving')
+        # As if the crash came after the file was written
+        default_storage.save(f'archives/event-{self.event.pk}.jsonl.gz', ContentFile(b'partial'))
+
+        output = StringIO()
+        call_command('archive_events', event_id=self.event.pk, no_purge=True, stdout=output)
+        self.assertIn('Archived 1 events', output.getvalue())
+        archive = EventArchive.objects.get(original_event_id=self.event.pk)
+        self.assertEqual(archive.status, 'archived')
+        self.assertEqual(archive.archive_file.name, f'archives/event-{self.event.pk}.jsonl.gz')
+        self.assertEqual(default_storage.listdir('archives')[1], [f'event-{self.event.pk}.jsonl.gz'])
+        with gzip.open(archive.archive_file.path) as archived:
+            self.assertEqual(json.loads(archived.readline()), {'format': 1})
+        self.assertEqual(archive_event(self.event).pk, archive.pk)
+
+
+class PackedAnswerTests(EventDataMixin, TestCase):
+    """Answers read the same packed or as rows, and convert both ways"""
+
+    def test_pack_and_unpack_keep_exports_and_admin_working(self):
+        event = self.event
+        rows = QuestionResponse.objects.filter(participant__event=event)
+        expected = {participant.pk: participant.get_answers() for participant in event.participants.all()}
+        export = ''.join(stream_participant_export(event, 'csv'))
+        response_count = rows.count()
+
+        self.assertEqual(pack_answers(event.participants.all(), chunk_size=4), response_count)
+        self.assertFalse(rows.exists())
+        self.assertTrue(QuestionResponse.objects.exclude(participant__event=event).exists())
+        for participant in event.participants.all():
+            self.assertEqual(participant.get_answers(), expected[participant.pk])
+        self.assertEqual(''.join(stream_participant_export(event, 'csv')), export)
+
+        self.client.force_login(self.staff)
+        participant = event.participants.first()
+        change_page = self.client.get(reverse('admin:events_participant_change', args=[participant.pk]))
+        self.assertContains(change_page, next(iter(expected[participant.pk].values())))
+
+        self.assertEqual(unpack_answers(event.participants.all(), chunk_size=4), response_count)
+        self.assertEqual(rows.count(), response_count)
+        self.assertFalse(event.participants.exclude(answers={}).exists())
+
+
+class NumericAnswerTests(EventDataMixin, TestCase):
+    """Rating and number answers are stored as numbers and summarized in SQL"""
+
+    def test_values_are_stored_backfilled_and_summarized(self):
+        event = self.events[0]
+        rating = OnboardingQuestion.objects.create(event=event, question_text='Rate us', question_type='rating_scale')
+        number = OnboardingQuestion.objects.create(event=event, question_text='Team size', question_type='number')
+        participants = list(event.participants.all())
+        # Answered before the column existed, as a row or packed
+        QuestionResponse.objects.bulk_create([
+            QuestionResponse(participant=participant, question=rating, answer=answer)
+            for participant, answer in zip(participants, ['2', '5', '5', 'n/a'])
+        ])
+        Participant.objects.filter(pk=participants[0].pk).update(answers={str(number.pk): '30'})
+
+        with self.settings(EVENTS_PACKED_ANSWERS=True):
+            data = self.registration_data(event)
+            data.update({f'question_{rating.pk}': '4', f'question_{number.pk}': '12'})
+            form = DynamicParticipantForm(event, data=data)
+            self.assertTrue(form.is_valid(), form.errors)
+            registered = form.save()
+        self.assertEqual(registered.get_answers()[rating.pk], '4')
+        self.assertEqual(
+            dict(registered.responses.values_list('question_id', 'value')), {rating.pk: 4.0, number.pk: 12.0},
+        )
+
+        self.assertEqual(backfill_values(event.onboarding_questions.all()), 4)
+        self.assertEqual(backfill_values(event.onboarding_questions.all()), 0)
+        self.assertEqual(QuestionResponse.objects.get(participant=participants[0], question=number).value, 30)
+
+        with self.assertNumQueries(6):
+            summary = question_summary(rating)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['mean'], 4.0)
+        self.assertEqual(summary['percentiles']['p50'], 4.0)
+        self.assertEqual(
+            [(item['label'], item['count']) for item in summary['items']], [('2', 1), ('4', 1), ('5', 2)],
+        )
+
+        generate_event_insights(event)
+        statistics = event.insights.get(insight_type='answer_statistics').get_data()
+        self.assertEqual([question['count'] for question in statistics['questions']], [4, 2])
+        self.assertTrue(pack_answers(event.participants.all()))
+        self.assertEqual(question_summary(number)['count'], 2)
+
+    def test_fractional_answers_are_bucketed(self):
+        event = self.events[0]
+        share = OnboardingQuestion.objects.create(event=event, question_text='Remote share', question_type='number')
+        participants = Participant.objects.bulk_create([
+            Participant(event=event, first_name='Remote', last_name=str(i), email=f'remote{i}@example.com')
+            for i in range(41)
+        ])
+        QuestionResponse.objects.bulk_create([
+            QuestionResponse(participant=participant, question=share, answer=str(i / 40), value=i / 40)
+            for i, participant in enumerate(participants)
+        ])
+
+        items = question_summary(share)['items']
+        self.assertEqual(len(items), MAX_DISTRIBUTION_BUCKETS)
+        self.assertEqual(sum(item['count'] for item in items), 41)
+        self.assertEqual(items[0]['label'], '0-0.05')
+        self.assertEqual(items[-1]['label'], '0.95-1')
+        self.assertGreaterEqual(items[-1]['count'], 2)
@@ -9,6 +9,8 @@ urlpatterns = [
     path('events/<int:event_id>/', views.event_public_detail, name='event_public_detail'),
     path('register/<int:event_id>/', views.event_registration, name='event_registration'),
     path('qa/<int:event_id>/', views.event_qa, name='event_qa'),
+    path('events/<int:event_id>/qr.<str:qr_format>', views.event_qr, name='event_qr'),
+    path('checkin/<str:token>/qr.<str:qr_format>', views.participant_qr, name='participant_qr'),
     
     # Authentication
     path('register/host/', views.host_register, name='host_register'),
@@ -17,12 +19,26 @@ urlpatterns = [
     
     # Host dashboard and management
     path('dashboard/', views.host_dashboard, name='host_dashboard'),
+    path('analytics/', views.host_analytics, name='host_analytics'),
+    path('jobs/', views.host_jobs, name='host_jobs'),
     path('profile/', views.host_profile, name='host_profile'),
     path('create-event/', views.create_event, name='create_event'),
     path('event/<int:event_id>/', views.event_detail, name='event_detail'),
     path('event/<int:event_id>/edit/', views.edit_event, name='edit_event'),
+    path('event/<int:event_id>/clone/', views.clone_event, name='clone_event'),
     path('event/<int:event_id>/questions/', views.manage_questions, name='manage_questions'),
+    path('event/<int:event_id>/attendees/', views.event_attendees, name='event_attendees'),
+    path('event/<int:event_id>/chat/', views.event_chat, name='event_chat'),
+    path('event/<int:event_id>/badges/', views.event_badges, name='event_badges'),
+    path('event/<int:event_id>/export/', views.export_participants, name='export_participants'),
+    path('checkin/<str:token>/', views.participant_checkin, name='participant_checkin'),
     
     # AJAX endpoints
     path('vote/<int:question_id>/', views.vote_question, name='vote_question'),
+    
+    # Operations
+    path('metrics/rate-limits/', views.rate_limit_metrics, name='rate_limit_metrics'),
+    path('metrics', views.metrics, name='metrics'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>', views.profile_download, name='profile_download'),
 ]
@@ -1,30 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.crypto import constant_time_compare
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition, require_POST
 from django.utils import timezone
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 from .models import (
-    Host, Event, EventTemplate, OnboardingQuestion, Participant, 
-    PublicQuestion, QuestionVote, ParticipantMatch, EventInsight
+    Host, Event, EventCapacity, EventStats, EventTemplate, Participant, 
+    PublicQuestion, QuestionVote, ParticipantMatch, EventInsight, Job
 )
 from .forms import (
     HostRegistrationForm, HostProfileForm, EventCreationForm, 
-    OnboardingQuestionForm, DynamicParticipantForm, PublicQuestionForm
+    OnboardingQuestionForm, DynamicParticipantForm, PublicQuestionForm, ChatQueryForm, EventCloneForm
+)
+from .badges import BADGE_EXTENSIONS, BADGE_FORMATS, badge_file_name, badge_fingerprint, build_badge_file
+from .caching import cached_event_page, render_event_fragments, upcoming_event_ids
+from .chat import answer_query
+from .cloning import clone_event as clone_events, instantiate_template, series_dates
+from .exports import EXPORT_FORMATS, export_filename, export_participants as stream_participant_export
+from .facets import AttendeeFilter, facet_counts, filter_attendees
+from .insights import schedule_event_insights
+from .qr import (
+    DEFAULT_SCALE, MAX_SCALE, QR_FORMATS, checkin_token, checkin_url, participant_id_from_token,
+    qr_code_url, qr_etag, registration_url, render_qr
 )
+from .rollups import summarize_rollups
+from .search import DEFAULT_PAGE_SIZE as SEARCH_PAGE_SIZE, format_cursor, parse_cursor, search_events
+from .metrics import render_prometheus
+from .outbox import queue_email, queue_event_reminders
+from .profiling import PROFILE_HEADER, list_profiles, profile_path, profile_token
+from .ratelimit import rate_limit, get_metrics as get_rate_limit_metrics
+from .tasks import enqueue
 
 
 def home(request):
     """Home page"""
-    recent_events = Event.objects.filter(
-        status='published',
-        date__gte=timezone.now()
-    ).order_by('date')[:6]
+    event_ids, _ = upcoming_event_ids(6)
     
     context = {
-        'recent_events': recent_events
+        'recent_event_cards': render_event_fragments('events/partials/home_event_card.html', event_ids=event_ids)
     }
     return render(request, 'events/home.html', context)
 
@@ -53,25 +78,65 @@ def host_dashboard(request):
         messages.error(request, 'Please complete your host profile.')
         return redirect('host_profile')
     
-    events = host.events.all().order_by('-created_at')
+    events = host.events.select_related('stats').order_by('-created_at')
     
-    # Get basic stats
-    total_events = events.count()
-    total_participants = sum(event.participant_count for event in events)
-    upcoming_events = events.filter(date__gte=timezone.now(), status='published').count()
+    # Get basic stats in a single aggregate query
+    stats = host.events.aggregate(
+        total_events=Count('id'),
+        total_participants=Sum('stats__registered_count'),
+        upcoming_events=Count('id', filter=Q(date__gte=timezone.now(), status='published')),
+    )
     
     context = {
         'host': host,
         'events': events[:10],  # Latest 10 events
         'stats': {
-            'total_events': total_events,
-            'total_participants': total_participants,
-            'upcoming_events': upcoming_events,
+            'total_events': stats['total_events'],
+            'total_participants': stats['total_participants'] or 0,
+            'upcoming_events': stats['upcoming_events'],
         }
     }
     return render(request, 'events/host/dashboard.html', context)
 
 
+@login_required
+def host_analytics(request):
+    """Trends across a host's completed events, read from precomputed rollups"""
+    try:
+        host = request.user.host_profile
+    except Host.DoesNotExist:
+        messages.error(request, 'Please complete your host profile.')
+        return redirect('host_profile')
+    
+    rollups = list(host.event_rollups.order_by('event_date'))
+    
+    context = {
+        'host': host,
+        'rollups': rollups,
+        'summary': summarize_rollups(rollups),
+    }
+    return render(request, 'events/host/analytics.html', context)
+
+
+@login_required
+def host_jobs(request):
+    """Background work queued for the host's events: QR codes, insights and rollups"""
+    try:
+        host = request.user.host_profile
+    except Host.DoesNotExist:
+        messages.error(request, 'Please complete your host profile.')
+        return redirect('host_profile')
+    
+    jobs = Job.objects.filter(event__host=host)
+    status_counts = dict(jobs.order_by().values_list('status').annotate(count=Count('id')))
+    
+    context = {
+        'jobs': jobs.select_related('event').defer('args', 'kwargs')[:100],
+        'status_counts': {status: status_counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+    }
+    return render(request, 'events/host/jobs.html', context)
+
+
 @login_required
 def host_profile(request):
     """Host profile management"""
@@ -118,18 +183,7 @@ def create_event(request):
                 return render(request, 'events/host/create_event.html', {'form': form})
             
             # Copy questions from template if selected
-            if event.template:
-                template_questions = event.template.template_questions.all()
-                for template_q in template_questions:
-                    OnboardingQuestion.objects.create(
-                        event=event,
-                        question_text=template_q.question_text,
-                        question_type=template_q.question_type,
-                        is_mandatory=template_q.is_mandatory,
-                        order=template_q.order,
-                        choices=template_q.choices,
-                        maps_to_field=template_q.maps_to_field
-                    )
+            instantiate_template(event)
             
             messages.success(request, 'Event created successfully!')
             return redirect('event_detail', event_id=event.id)
@@ -139,10 +193,35 @@ def create_event(request):
     return render(request, 'events/host/create_event.html', {'form': form})
 
 
+@login_required
+def clone_event(request, event_id):
+    """Copy an event, or turn it into a recurring series"""
+    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    
+    if request.method == 'POST':
+        form = EventCloneForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            dates = series_dates(data['date'], data['count'], timedelta(days=data['interval_days']))
+            clones = clone_events(event, dates, title=data['title'], include_qa=data['include_qa'])
+            if len(clones) == 1:
+                messages.success(request, f'"{clones[0].title}" was created as a draft.')
+                return redirect('edit_event', event_id=clones[0].id)
+            messages.success(request, f'{len(clones)} draft events were created from "{event.title}".')
+            return redirect('host_dashboard')
+    else:
+        form = EventCloneForm(initial={
+            'title': event.title,
+            'date': event.date + timedelta(days=7),
+        })
+    
+    return render(request, 'events/host/clone_event.html', {'event': event, 'form': form})
+
+
 @login_required
 def event_detail(request, event_id):
     """Event detail view for hosts"""
-    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    event = get_object_or_404(Event.objects.select_related('stats'), id=event_id, host__user=request.user)
     
     # Handle publish action
     if request.method == 'POST' and request.POST.get('action') == 'publish':
@@ -154,23 +233,183 @@ def event_detail(request, event_id):
             messages.warning(request, 'This event is already published.')
         return redirect('event_detail', event_id=event.id)
     
-    participants = event.participants.all().order_by('-registered_at')
+    if request.method == 'POST' and request.POST.get('action') == 'refresh_insights':
+        schedule_event_insights(event.id, force=True)
+        messages.success(request, 'Insights are being refreshed and will update shortly.')
+        return redirect('event_detail', event_id=event.id)
+    
+    if request.method == 'POST' and request.POST.get('action') == 'send_reminders':
+        enqueue(
+            queue_event_reminders, args=[event.id], queue='email',
+            dedup_key=f'reminders:{event.id}', event_id=event.id,
+        )
+        messages.success(request, f'Reminders are being sent to {event.participant_count} registered attendees.')
+        return redirect('event_detail', event_id=event.id)
+    
+    participants = event.participants.only(
+        'event_id', 'first_name', 'last_name', 'email', 'role', 'company', 'status', 'registered_at'
+    ).order_by('-registered_at')[:10]
     questions = event.onboarding_questions.all().order_by('order')
     public_questions = event.public_questions.all()[:10]
+    insights = {insight.insight_type: insight for insight in event.insights.all()}
+    insight_data = {insight_type: insight.get_data() for insight_type, insight in insights.items()}
+    insight_charts = [
+        {'title': insights[insight_type].title, 'data': insight_data[insight_type]}
+        for insight_type in ('skill_distribution', 'industry_spread', 'experience_levels', 'interests_analysis')
+        if insight_type in insights
+    ]
     
     context = {
         'event': event,
         'participants': participants,
         'questions': questions,
         'public_questions': public_questions,
+        'insights': insights,
+        'insight_data': insight_data,
+        'insight_charts': insight_charts,
+        'qr_code_pending': event.qr_code_pending,
+        'qr_code_url': qr_code_url(event),
     }
     return render(request, 'events/host/event_detail.html', context)
 
 
+@login_required
+def event_attendees(request, event_id):
+    """Faceted attendee search for hosts, as a page or JSON"""
+    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    
+    attendee_filter = AttendeeFilter.from_query(request.GET)
+    attendees = filter_attendees(event, attendee_filter).only(
+        'event_id', 'first_name', 'last_name', 'email', 'role', 'company', 'industry',
+        'experience_years', 'skills', 'interests', 'status'
+    ).order_by('-registered_at', '-pk')
+    page = Paginator(attendees, 50).get_page(request.GET.get('page'))
+    facets = facet_counts(event, attendees)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'count': page.paginator.count,
+            'page': page.number,
+            'pages': page.paginator.num_pages,
+            'filters': attendee_filter.as_dict(),
+            'facets': facets,
+            'results': [
+                {
+                    'id': participant.pk,
+                    'name': participant.full_name,
+                    'email': participant.email,
+                    'role': participant.role,
+                    'company': participant.company,
+                    'industry': participant.industry,
+                    'experience_years': participant.experience_years,
+                    'skills': participant.get_skills_list(),
+                    'interests': participant.get_interests_list(),
+                    'status': participant.status,
+                }
+                for participant in page
+            ],
+        })
+    
+    context = {
+        'event': event,
+        'page': page,
+        'facets': facets,
+        'filters': attendee_filter,
+    }
+    return render(request, 'events/host/attendees.html', context)
+
+
+@login_required
+@rate_limit('event_chat')
+def event_chat(request, event_id):
+    """Ask questions about an event's attendees"""
+    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    
+    if request.method == 'POST':
+        form = ChatQueryForm(request.POST)
+        if form.is_valid():
+            chat_query = answer_query(event, request.user, form.cleaned_data['query'])
+            if request.GET.get('format') == 'json':
+                return JsonResponse({
+                    'query': chat_query.query,
+                    'response': chat_query.response,
+                    'query_type': chat_query.query_type,
+                    'cached': chat_query.cached,
+                })
+            return redirect('event_chat', event_id=event.id)
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'errors': form.errors}, status=400)
+    else:
+        form = ChatQueryForm()
+    
+    context = {
+        'event': event,
+        'form': form,
+        'chat_queries': event.chat_queries.filter(user=request.user)[:20],
+    }
+    return render(request, 'events/host/chat.html', context)
+
+
+@login_required
+def export_participants(request, event_id):
+    """Stream every registrant with their answers as CSV or JSONL"""
+    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Unsupported export format'}, status=400)
+    compress = request.GET.get('gzip') == '1'
+    content_type, _ = EXPORT_FORMATS[export_format]
+    
+    response = StreamingHttpResponse(
+        stream_participant_export(event, export_format, compress=compress),
+        content_type='application/gzip' if compress else content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(event, export_format, compress)}"'
+    return response
+
+
+@login_required
+def event_badges(request, event_id):
+    """Printable badge sheets for registered participants, as a PDF or a zip of PNGs"""
+    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    
+    badge_format = request.GET.get('format', 'pdf')
+    if badge_format not in BADGE_FORMATS:
+        return JsonResponse({'error': 'Unsupported badge format'}, status=400)
+    
+    registered, fingerprint = badge_fingerprint(event, badge_format)
+    if not registered:
+        messages.warning(request, 'There are no registered participants to print badges for.')
+        return redirect('event_detail', event_id=event.id)
+    
+    # Sheets are rendered by a background job; this page waits for the file
+    name = badge_file_name(event.pk, badge_format, fingerprint)
+    if not default_storage.exists(name):
+        enqueue(
+            build_badge_file, args=[event.pk, badge_format, fingerprint],
+            dedup_key=f'badges:{event.pk}:{fingerprint}', event_id=event.pk,
+        )
+    # Eager background tasks have already written it
+    if default_storage.exists(name):
+        return FileResponse(
+            default_storage.open(name, 'rb'),
+            as_attachment=True,
+            filename=f'event-{event.pk}-badges.{BADGE_EXTENSIONS[badge_format]}',
+        )
+    
+    context = {
+        'event': event,
+        'registered': registered,
+        'badge_format': badge_format,
+    }
+    return render(request, 'events/host/badges_pending.html', context, status=202)
+
+
 @login_required
 def edit_event(request, event_id):
     """Edit an existing event"""
-    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    event = get_object_or_404(Event.objects.select_related('stats'), id=event_id, host__user=request.user)
     
     if request.method == 'POST':
         form = EventCreationForm(request.POST, instance=event)
@@ -187,7 +426,7 @@ def edit_event(request, event_id):
 @login_required
 def manage_questions(request, event_id):
     """Manage onboarding questions for an event"""
-    event = get_object_or_404(Event, id=event_id, host__user=request.user)
+    event = get_object_or_404(Event.objects.select_related('template'), id=event_id, host__user=request.user)
     questions = event.onboarding_questions.all().order_by('order')
     
     if request.method == 'POST':
@@ -209,9 +448,12 @@ def manage_questions(request, event_id):
     return render(request, 'events/host/manage_questions.html', context)
 
 
+@rate_limit('event_registration')
 def event_registration(request, event_id):
     """Public event registration page"""
-    event = get_object_or_404(Event, id=event_id, status='published')
+    event = get_object_or_404(
+        Event.objects.select_related('host', 'stats', 'template'), id=event_id, status='published'
+    )
     
     # Check if registration is still open
     if event.registration_deadline and timezone.now() > event.registration_deadline:
@@ -219,7 +461,7 @@ def event_registration(request, event_id):
         return render(request, 'events/registration_closed.html', {'event': event})
     
     # Check if event is full
-    is_full = event.max_participants and event.participant_count >= event.max_participants
+    is_full = event.is_full
     
     if request.method == 'POST':
         form = DynamicParticipantForm(event, request.POST)
@@ -228,31 +470,41 @@ def event_registration(request, event_id):
             existing = Participant.objects.filter(
                 event=event, 
                 email=form.cleaned_data['email']
-            ).first()
+            ).exists()
             
             if existing:
                 messages.error(request, 'This email is already registered for this event.')
             else:
-                participant = form.save(commit=False)
-                
-                # Determine status based on availability
-                if is_full and event.allow_waitlist:
-                    participant.status = 'waitlisted'
-                    status_message = 'You have been added to the waitlist.'
-                elif is_full:
-                    messages.error(request, 'This event is full and waitlist is not available.')
-                    return render(request, 'events/register.html', {'form': form, 'event': event})
-                else:
-                    participant.status = 'registered'
-                    status_message = 'Registration successful!'
-                
-                participant.save()
-                form.save_m2m()  # Save many-to-many relationships
+                with transaction.atomic():
+                    # Re-check capacity against the locked stats row so concurrent
+                    # registrations cannot overfill the event
+                    stats = EventStats.objects.select_for_update().filter(event=event).first()
+                    if stats:
+                        is_full = EventCapacity(
+                            event.max_participants, stats.registered_count, stats.waitlisted_count
+                        ).is_full
+                    
+                    # Determine status based on availability
+                    if is_full and event.allow_waitlist:
+                        form.instance.status = 'waitlisted'
+                        status_message = 'You have been added to the waitlist.'
+                    elif is_full:
+                        messages.error(request, 'This event is full and waitlist is not available.')
+                        return render(request, 'events/register.html', {'form': form, 'event': event})
+                    else:
+                        form.instance.status = 'registered'
+                        status_message = 'Registration successful!'
+                    
+                    # Saves the participant, their answers and denormalized fields
+                    participant = form.save()
+                    queue_email(participant, 'waitlisted' if participant.status == 'waitlisted' else 'confirmation')
+                schedule_event_insights(event.id)
                 
                 messages.success(request, status_message)
                 return render(request, 'events/registration_success.html', {
                     'participant': participant,
-                    'event': event
+                    'event': event,
+                    'checkin_token': checkin_token(participant.pk),
                 })
     else:
         form = DynamicParticipantForm(event)
@@ -265,10 +517,11 @@ def event_registration(request, event_id):
     return render(request, 'events/register.html', context)
 
 
+@rate_limit('event_qa')
 def event_qa(request, event_id):
     """Public Q&A page for events"""
     event = get_object_or_404(Event, id=event_id, enable_qa=True)
-    questions = event.public_questions.all()
+    questions = event.public_questions.select_related('participant', 'answered_by')
     
     # Check if user is a registered participant
     participant = None
@@ -300,9 +553,10 @@ def event_qa(request, event_id):
 
 
 @require_POST
+@rate_limit('vote_question')
 def vote_question(request, question_id):
     """Vote on a public question"""
-    question = get_object_or_404(PublicQuestion, id=question_id)
+    question = get_object_or_404(PublicQuestion.objects.select_related('event'), id=question_id)
     
     # Get participant email from request
     email = request.POST.get('email')
@@ -321,46 +575,174 @@ def vote_question(request, question_id):
         participant=participant
     )
     
-    if created:
-        question.votes += 1
-        question.save()
-        return JsonResponse({'votes': question.votes, 'voted': True})
-    else:
-        # Remove vote
-        vote.delete()
-        question.votes -= 1
-        question.save()
-        return JsonResponse({'votes': question.votes, 'voted': False})
+    # Update the tally in SQL so concurrent votes are not lost, and read it
+    # back while the updated row is still locked so the total is current
+    with transaction.atomic():
+        if created:
+            PublicQuestion.objects.filter(pk=question.pk).update(votes=F('votes') + 1)
+        else:
+            # Remove vote
+            vote.delete()
+            PublicQuestion.objects.filter(pk=question.pk).update(votes=F('votes') - 1)
+        votes = PublicQuestion.objects.filter(pk=question.pk).values_list('votes', flat=True).get()
+    return JsonResponse({'votes': votes, 'voted': created})
 
 
 def event_list(request):
     """Public list of available events"""
-    events = Event.objects.filter(
-        status='published',
-        date__gte=timezone.now()
-    ).order_by('date')
+    after = request.GET.get('after')
     
-    # Filter by search query
-    search = request.GET.get('search')
+    # Ranked full-text search, or date order from the cached catalog when browsing
+    search = request.GET.get('search', '').strip()
     if search:
-        events = events.filter(
-            Q(title__icontains=search) |
-            Q(description__icontains=search) |
-            Q(location__icontains=search)
-        )
+        events = Event.objects.filter(
+            status='published',
+            date__gte=timezone.now()
+        ).select_related('host', 'template', 'stats')
+        events, next_cursor = search_events(events, search, after=after)
+        cards = render_event_fragments('events/partials/event_card.html', events=events)
+    else:
+        event_ids, next_page = upcoming_event_ids(SEARCH_PAGE_SIZE, after=parse_cursor(after))
+        cards = render_event_fragments('events/partials/event_card.html', event_ids=event_ids)
+        next_cursor = format_cursor(*next_page) if next_page else None
     
     context = {
-        'events': events,
-        'search': search
+        'event_cards': cards,
+        'search': search,
+        'next_cursor': next_cursor,
     }
     return render(request, 'events/event_list.html', context)
 
 
 def event_public_detail(request, event_id):
     """Public event detail page"""
-    event = get_object_or_404(Event, id=event_id, status='published')
+    page = cached_event_page(event_id, build_public_detail)
+    if page is None:
+        raise Http404('No published event matches the given query.')
     
     context = {
-        'event': event
+        'title': page['title'],
+        'body': mark_safe(page['body']),
     }
     return render(request, 'events/event_public_detail.html', context)
+
+
+def build_public_detail(event_id):
+    event = Event.objects.select_related('host', 'stats', 'template').filter(
+        id=event_id, status='published'
+    ).first()
+    if event is None:
+        return None
+    return {
+        'title': event.title,
+        'body': render_to_string('events/partials/event_public_detail_body.html', {'event': event}),
+    }
+
+
+def _qr_scale(request, qr_format):
+    # SVGs scale themselves, so every scale shares one SVG, ETag and cache entry
+    if qr_format == 'svg':
+        return DEFAULT_SCALE
+    try:
+        return min(max(int(request.GET.get('scale', DEFAULT_SCALE)), 1), MAX_SCALE)
+    except ValueError:
+        return DEFAULT_SCALE
+
+
+def _qr_response(request, payload, qr_format, cache_control):
+    if qr_format not in QR_FORMATS:
+        raise Http404('Unsupported QR format.')
+    response = HttpResponse(
+        render_qr(payload, qr_format, _qr_scale(request, qr_format)), content_type=QR_FORMATS[qr_format]
+    )
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _event_qr_etag(request, event_id, qr_format):
+    return qr_etag(registration_url(event_id), qr_format, _qr_scale(request, qr_format))
+
+
+def _participant_qr_etag(request, token, qr_format):
+    return qr_etag(checkin_url(token), qr_format, _qr_scale(request, qr_format))
+
+
+@condition(etag_func=_event_qr_etag)
+def event_qr(request, event_id, qr_format):
+    """Registration QR code for an event, rendered on demand"""
+    if not Event.objects.filter(pk=event_id).exists():
+        raise Http404('No event matches the given query.')
+    return _qr_response(request, registration_url(event_id), qr_format, 'public, max-age=86400')
+
+
+@condition(etag_func=_participant_qr_etag)
+def participant_qr(request, token, qr_format):
+    """Check-in QR code for a participant, addressed by their signed token"""
+    if participant_id_from_token(token) is None:
+        raise Http404('Invalid check-in code.')
+    return _qr_response(request, checkin_url(token), qr_format, 'private, max-age=86400')
+
+
+@login_required
+def participant_checkin(request, token):
+    """Host scans a participant's QR code to check them in"""
+    participant = get_object_or_404(
+        Participant.objects.select_related('event'),
+        pk=participant_id_from_token(token) or 0,
+        event__host__user=request.user,
+    )
+    
+    if request.method == 'POST':
+        # Only people holding a place can attend; waitlisted ones must be promoted first
+        if participant.status == 'registered':
+            participant.status = 'attended'
+            participant.save()
+            messages.success(request, f'{participant.full_name} is checked in.')
+        else:
+            messages.error(
+                request, f'{participant.full_name} is {participant.get_status_display().lower()} and cannot be checked in.'
+            )
+        return redirect('participant_checkin', token=token)
+    
+    context = {
+        'participant': participant,
+        'event': participant.event,
+    }
+    return render(request, 'events/host/checkin.html', context)
+
+
+@staff_member_required
+def rate_limit_metrics(request):
+    """Allowed and shed request counts from the public endpoint rate limiter"""
+    return JsonResponse({'endpoints': get_rate_limit_metrics()})
+
+
+@staff_member_required
+def profile_list(request):
+    """Recently captured request profiles, and a token for profiling from outside a browser"""
+    context = {
+        'profiles': list_profiles(limit=100),
+        'profile_header': PROFILE_HEADER,
+        'profile_token': profile_token(),
+    }
+    return render(request, 'events/staff/profiles.html', context)
+
+
+@staff_member_required
+def profile_download(request, name):
+    """One stored profile, an HTML flame graph"""
+    path = profile_path(name)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), content_type='text/html')
+
+
+def metrics(request):
+    """Request, database, template and cache metrics in the Prometheus text format"""
+    token = getattr(settings, 'EVENTS_METRICS_TOKEN', '')
+    authorized = request.user.is_active and request.user.is_staff
+    if token and not authorized:
+        authorized = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')